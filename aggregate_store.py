@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量统计结果存储
+持久化保存 年份×技术标签、各标签、各年份的图书数量，
+分类数据更新后只合并新增、变化或删除的图书，不再对全部数据重新分组统计
+"""
+
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+
+def parse_publish_year(date_str: str) -> Optional[int]:
+    """解析出版日期（只取日期部分），返回年份，无法解析时返回None"""
+    if not date_str or not isinstance(date_str, str):
+        return None
+    try:
+        return datetime.strptime(date_str.split('T')[0], '%Y-%m-%d').year
+    except ValueError:
+        return None
+
+
+def book_key(book: Dict[str, Any]) -> str:
+    """图书的唯一标识：优先使用图书ID，没有ID时使用ISBN或书名"""
+    for field in ('id', 'isbn', 'name'):
+        value = book.get(field)
+        if value not in (None, ''):
+            return f"{field}:{value}"
+    return ''
+
+
+class AggregateStore:
+    def __init__(self, filepath: str):
+        """
+        打开（或创建）统计结果数据库（SQLite）
+
+        年份×技术标签的计数很小，打开时整体读入内存；每本图书的出版日期和技术标签（用于判断图书是否变化）
+        只保存在数据库中，合并时按图书标识查询，只写入有变化的图书
+
+        Args:
+            filepath: 统计结果数据库路径
+        """
+        self.filepath = filepath
+        self.source: Optional[Dict[str, Any]] = None
+        self.counts: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.tag_totals: Dict[str, int] = defaultdict(int)
+        self.year_totals: Dict[int, int] = defaultdict(int)
+
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(filepath)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS books (
+                key TEXT PRIMARY KEY,
+                publish_date TEXT NOT NULL,
+                tech_tag TEXT
+            );
+            CREATE TABLE IF NOT EXISTS counts (
+                year INTEGER NOT NULL,
+                tag TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (year, tag)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self._load()
+
+    def _load(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'source'").fetchone()
+        self.source = json.loads(row[0]) if row else None
+        for year, tag, count in self._conn.execute("SELECT year, tag, count FROM counts"):
+            self._add(year, tag, count)
+
+    def save(self):
+        """
+        在一个事务中提交统计结果
+
+        合并时已写入的图书变化与计数、来源文件状态一起提交，中断时数据库保持上次保存的状态
+        """
+        with self._conn:
+            self._conn.execute("DELETE FROM counts")
+            self._conn.executemany("INSERT INTO counts (year, tag, count) VALUES (?, ?, ?)",
+                                   [(year, tag, count) for year, tags in self.counts.items()
+                                    for tag, count in tags.items()])
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('source', ?)",
+                               (json.dumps(self.source, ensure_ascii=False),))
+
+    def _add(self, year: int, tag: str, count: int):
+        self.counts[year][tag] += count
+        self.tag_totals[tag] += count
+        self.year_totals[year] += count
+
+        # 计数归零的条目直接删除，保持各统计表中只有实际存在的年份和标签
+        if not self.counts[year][tag]:
+            del self.counts[year][tag]
+            if not self.counts[year]:
+                del self.counts[year]
+        if not self.tag_totals[tag]:
+            del self.tag_totals[tag]
+        if not self.year_totals[year]:
+            del self.year_totals[year]
+
+    @staticmethod
+    def _counted(publish_date: str, tech_tag: str) -> Optional[Tuple[int, str]]:
+        """与数据准备阶段相同的规则：跳过"其他"、分类失败和没有出版日期的图书"""
+        if not tech_tag or tech_tag == '其他':
+            return None
+        year = parse_publish_year(publish_date)
+        return (year, tech_tag) if year else None
+
+    def _signature(self, key: str) -> Optional[Tuple[str, str]]:
+        """已保存的图书 (出版日期原文, 技术标签)，不存在时返回None"""
+        return self._conn.execute("SELECT publish_date, tech_tag FROM books WHERE key = ?", (key,)).fetchone()
+
+    def _apply(self, key: str, publish_date: str, tech_tag: str, previous: Optional[Tuple[str, str]]) -> bool:
+        """更新一本图书，previous为它已保存的出版日期和技术标签，返回它是否有变化"""
+        signature = (publish_date, tech_tag)
+        if previous == signature:
+            return False
+
+        if previous is not None:
+            old = self._counted(*previous)
+            if old:
+                self._add(old[0], old[1], -1)
+        new = self._counted(publish_date, tech_tag)
+        if new:
+            self._add(new[0], new[1], 1)
+        self._conn.execute("INSERT OR REPLACE INTO books (key, publish_date, tech_tag) VALUES (?, ?, ?)",
+                           (key,) + signature)
+        return True
+
+    def _remove(self, key: str, previous: Tuple[str, str]):
+        old = self._counted(*previous)
+        if old:
+            self._add(old[0], old[1], -1)
+        self._conn.execute("DELETE FROM books WHERE key = ?", (key,))
+
+    def merge(self, books: Iterable[Dict[str, Any]]) -> int:
+        """
+        合并新增或变化的图书，未出现的已有图书保持不变
+
+        只查询和写入给定的图书，耗时与已统计的图书总数无关
+
+        Returns:
+            有变化的图书数量
+        """
+        changed = 0
+        for book in books:
+            key = book_key(book)
+            if key:
+                changed += self._apply(key, book.get('publishDate') or '', book.get('tech_tag'),
+                                       self._signature(key))
+        return changed
+
+    def remove(self, books: Iterable[Dict[str, Any]]) -> int:
+        """
+        删除已不存在的图书
+
+        Returns:
+            实际删除的图书数量
+        """
+        removed = 0
+        for book in books:
+            key = book_key(book)
+            previous = self._signature(key) if key else None
+            if previous is not None:
+                self._remove(key, previous)
+                removed += 1
+        return removed
+
+    def sync(self, books: Iterable[Dict[str, Any]], source: Dict[str, Any] = None) -> int:
+        """
+        与完整的分类数据同步：合并新增和变化的图书，并删除数据中已不存在的图书
+
+        只比较每本图书的出版日期和技术标签，未变化的图书不会重新解析和统计，也不会写入数据库
+
+        Args:
+            books: 全部已分类图书
+            source: 分类数据文件状态，见storage.file_state
+
+        Returns:
+            新增、变化和删除的图书数量
+        """
+        # 已保存的图书一次读出，避免逐本查询
+        known = {key: (publish_date, tech_tag)
+                 for key, publish_date, tech_tag in self._conn.execute("SELECT key, publish_date, tech_tag FROM books")}
+        changed = 0
+        seen = set()
+        for book in books:
+            key = book_key(book)
+            if not key:
+                continue
+            seen.add(key)
+            signature = (book.get('publishDate') or '', book.get('tech_tag'))
+            changed += self._apply(key, *signature, known.get(key))
+            known[key] = signature
+
+        for key in [key for key in known if key not in seen]:
+            self._remove(key, known[key])
+            changed += 1
+
+        self.source = source
+        return changed
+
+    def is_current(self, source: Dict[str, Any]) -> bool:
+        """统计结果是否由该状态的分类数据文件生成"""
+        return self.source is not None and self.source == source
+
+    def pivot(self, start_year: int = None, end_year: int = None) -> 'pd.DataFrame':
+        """
+        年度统计透视表，行为年份，列为技术标签，与DataAnalyzer.analyze_publications_by_year的结果相同
+        """
+        # 抓取阶段经由storage导入本模块，pandas只在需要统计表时导入
+        import pandas as pd
+
+        counts = {year: dict(tags) for year, tags in self.counts.items()
+                  if (start_year is None or year >= start_year) and (end_year is None or year <= end_year)}
+        if not counts:
+            return pd.DataFrame()
+
+        pivot_table = pd.DataFrame.from_dict(counts, orient='index').fillna(0).sort_index()
+        pivot_table = pivot_table[sorted(pivot_table.columns)]
+        pivot_table.index.name = 'publish_year'
+        pivot_table.columns.name = 'tech_tag'
+        return pivot_table
+
+    def close(self):
+        """关闭数据库，未保存的变化会被丢弃"""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
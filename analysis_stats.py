@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+年度统计表的汇总统计
+各标签总数、各年份总数和各标签的最活跃年份由年度统计表一次算出，
+图表和分析报告共用同一份结果
+"""
+
+import pandas as pd
+
+
+class AnalysisStats:
+    def __init__(self, pivot_table: pd.DataFrame, top_n: int = 10):
+        """
+        由年度统计表计算汇总统计
+
+        Args:
+            pivot_table: 年度统计表，行为年份，列为技术标签
+            top_n: 报告和趋势图中显示的技术标签数量
+        """
+        self.pivot_table = pivot_table
+        self.top_n = top_n
+
+        # 各标签总数按数量从高到低排列，数量相同时保持标签顺序
+        self.tag_counts = pivot_table.sum(axis=0).astype('int64').sort_values(ascending=False, kind='stable')
+        self.yearly_totals = pivot_table.sum(axis=1).astype('int64')
+        self.total = int(self.yearly_totals.sum())
+        # 每个标签出版数量最多的年份（相同时取最早的年份）及当年数量
+        self.peak_years = pivot_table.idxmax(axis=0)
+        self.peak_counts = pivot_table.max(axis=0).astype('int64')
+
+    @property
+    def top_tags(self) -> pd.Index:
+        """出版数量最多的前top_n个技术标签"""
+        return self.tag_counts.head(self.top_n).index
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试脚本
+- 使用合成的图书数据，对比数据准备阶段逐行解析与按列批量解析的耗时
+- 离线基准测试套件（--catalog）：本地模拟图灵API服务器和模拟AI服务，
+  测量抓取、分类、分析各阶段和端到端的吞吐量，并与保存的基线比较
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import List, Dict, Any
+
+import pandas as pd
+import config
+import storage
+from book_record import Book
+from data_analyzer import DataAnalyzer
+from data_scraper import IturingScraper
+from book_classifier import BookClassifier
+from mock_llm import MockLLM
+from mock_server import MockIturingServer
+from rate_limiter import AIMDRateLimiter
+
+# 合成图书目录规模
+CATALOG_SIZES = {'1k': 1000, '10k': 10000, '100k': 100000}
+# 模拟服务下不希望限流器成为瓶颈，请求速率上限设得足够高
+BENCH_REQUEST_RATE = 10000
+
+
+def generate_synthetic_books(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """生成合成的已分类图书数据，包含一定比例的"其他"标签、缺失和无效日期"""
+    rng = random.Random(seed)
+    tags = [tag for tag in config.TECH_CATEGORIES]
+    books = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            publish_date = ''
+        elif roll < 0.07:
+            publish_date = '未知'
+        else:
+            publish_date = f"{rng.randint(2000, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00"
+
+        books.append({
+            "id": i,
+            "name": f"合成图书{i}",
+            "tech_tag": rng.choice(tags),
+            "publishDate": publish_date,
+            "authorNameString": f"作者{rng.randint(1, 5000)}",
+            "isbn": f"978-7-115-{i % 100000:05d}-{i % 10}",
+            "abstract": "本书介绍相关技术的原理与实践。" * 5,
+            "tags": [{"name": rng.choice(tags)}],
+            "categories": [[{"name": "计算机"}]]
+        })
+    return books
+
+
+def legacy_prepare_data(books: List[Dict[str, Any]]) -> pd.DataFrame:
+    """逐行解析的旧实现，作为对比基线"""
+    data = []
+    for book in books:
+        tech_tag = book.get('tech_tag', '其他')
+        if not tech_tag or tech_tag == '其他':
+            continue
+
+        publish_date = book.get('publishDate', '')
+        try:
+            year = datetime.strptime(publish_date.split('T')[0], '%Y-%m-%d').year if publish_date else None
+        except ValueError:
+            year = None
+
+        if year:
+            data.append({
+                'name': book.get('name', ''),
+                'tech_tag': tech_tag,
+                'publish_year': year,
+                'author': book.get('authorNameString', ''),
+                'isbn': book.get('isbn', ''),
+                'publish_date': publish_date
+            })
+    return pd.DataFrame(data)
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_prepare_data(count: int, repeat: int = 3) -> Dict[str, float]:
+    """对比两种数据准备实现的耗时，并校验结果一致"""
+    books = generate_synthetic_books(count)
+    analyzer = DataAnalyzer()
+
+    expected = legacy_prepare_data(books)
+    actual = analyzer.prepare_data(books)
+    pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+    legacy = _best_of(lambda: legacy_prepare_data(books), repeat)
+    vectorised = _best_of(lambda: analyzer.prepare_data(books), repeat)
+    return {
+        'books': count,
+        'rows': len(actual),
+        'legacy_seconds': legacy,
+        'vectorised_seconds': vectorised,
+        'speedup': legacy / vectorised
+    }
+
+
+def _traced_bytes(build) -> int:
+    """build()返回的对象在内存中占用的字节数"""
+    tracemalloc.start()
+    try:
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        del result
+    finally:
+        tracemalloc.stop()
+    return size
+
+
+def bench_book_memory(count: int) -> Dict[str, float]:
+    """对比从JSONL读入的原始dict和Book记录每本图书的内存占用"""
+    lines = [json.dumps(book, ensure_ascii=False) for book in generate_synthetic_books(count)]
+
+    dict_bytes = _traced_bytes(lambda: [json.loads(line) for line in lines])
+    book_bytes = _traced_bytes(lambda: [Book(json.loads(line)) for line in lines])
+    return {
+        'books': count,
+        'dict_bytes_per_book': dict_bytes / count,
+        'book_bytes_per_book': book_bytes / count,
+        'ratio': book_bytes / dict_bytes
+    }
+
+
+def _throughput(books: int, seconds: float, **extra) -> Dict[str, Any]:
+    result = {'books': books, 'seconds': seconds, 'books_per_second': books / seconds if seconds > 0 else 0.0}
+    result.update(extra)
+    return result
+
+
+@contextlib.contextmanager
+def isolated_config(tmp_dir: str, **overrides):
+    """数据文件都写入临时目录，并覆盖指定的配置项，退出时恢复原配置"""
+    settings = {
+        'BOOKS_DIR': os.path.join(tmp_dir, 'books'),
+        'CHECKPOINT_FILE': os.path.join(tmp_dir, 'books', 'scrape_checkpoint.jsonl'),
+        'ANALYSIS_DIR': os.path.join(tmp_dir, 'analysis'),
+        'ANALYSIS_DATASET_DIR': os.path.join(tmp_dir, 'analysis', 'books_dataset'),
+        'AGGREGATE_STORE_FILE': os.path.join(tmp_dir, 'analysis', 'aggregates.db'),
+        'PIPELINE_MANIFEST_FILE': os.path.join(tmp_dir, 'pipeline_manifest.json'),
+        'CLASSIFY_CACHE_FILE': os.path.join(tmp_dir, 'classification_cache.db'),
+        'HTTP_CACHE_ENABLED': False,
+        'CLASSIFY_CACHE_ENABLED': False,
+        'RULE_CLASSIFIER_ENABLED': False,
+        'REQUEST_RATE': BENCH_REQUEST_RATE,
+        'HTTP_RETRY_BACKOFF': 0,
+        'CLASSIFY_RATE': BENCH_REQUEST_RATE,
+        'CLASSIFY_MAX_RATE': BENCH_REQUEST_RATE,
+        'CLASSIFY_RETRY_BACKOFF': 0.01
+    }
+    settings.update(overrides)
+    saved = {name: getattr(config, name) for name in settings}
+    try:
+        for name, value in settings.items():
+            setattr(config, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+
+def unclassified(books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """去掉合成图书的分类结果，作为分类阶段的输入"""
+    return [{key: value for key, value in book.items() if key != 'tech_tag'} for book in books]
+
+
+def bench_scrape(server: MockIturingServer, workers: int = None) -> Dict[str, Any]:
+    """从模拟服务器抓取完整目录"""
+    scraper = IturingScraper(base_url=server.base_url, request_rate=BENCH_REQUEST_RATE, workers=workers,
+                             use_cache=False)
+    start_requests = server.request_count
+    start_errors = server.error_count
+    start = time.perf_counter()
+    books = scraper.scrape_all_books(resume=False)
+    seconds = time.perf_counter() - start
+    scraper.clear_checkpoint()
+    return _throughput(len(books), seconds, expected_books=server.total_books,
+                       requests=server.request_count - start_requests,
+                       server_errors=server.error_count - start_errors)
+
+
+def bench_classify(books: List[Dict[str, Any]], llm: MockLLM, workers: int = None) -> Dict[str, Any]:
+    """用模拟AI服务分类图书（批量请求、限流和重试流程与真实服务相同）"""
+    classifier = BookClassifier(ai_service='mock', use_cache=False, workers=workers, use_rules=False)
+    classifier.mock_llm = llm
+    classifier.rate_limiter = AIMDRateLimiter(BENCH_REQUEST_RATE, 1, BENCH_REQUEST_RATE)
+    start = time.perf_counter()
+    classified = classifier.classify_books_batch(unclassified(books))
+    seconds = time.perf_counter() - start
+    return _throughput(len(classified), seconds, requests=classifier.last_run_stats['requests'],
+                       failed_books=classifier.last_run_stats['failed_books'])
+
+
+def bench_analyze(books: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """分析已分类的图书（数据准备、统计、图表和报告）"""
+    storage.write_records(os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE), books)
+    start = time.perf_counter()
+    DataAnalyzer().run_analysis()
+    return _throughput(len(books), time.perf_counter() - start)
+
+
+def bench_end_to_end(server: MockIturingServer, workers: int = None) -> Dict[str, Any]:
+    """通过main.py的完整流程运行：抓取、分类、分析"""
+    import main as pipeline
+    start = time.perf_counter()
+    pipeline.run_full_pipeline(ai_service='mock', policy=pipeline.POLICY_REFRESH, workers=workers)
+    seconds = time.perf_counter() - start
+    return _throughput(len(DataAnalyzer().load_classified_books()), seconds)
+
+
+def run_suite(catalog: str, scrape_books: int = 1000, latency: float = 0.0, error_rate: float = 0.0,
+              llm_latency: float = 0.0, llm_error_rate: float = 0.0, workers: int = None) -> Dict[str, Any]:
+    """
+    运行离线基准测试套件
+
+    分类和分析阶段使用完整的合成目录；抓取和端到端测试经过本地HTTP服务器，
+    使用其中前scrape_books本图书
+
+    Returns:
+        {'settings': 测试参数, 'stages': {阶段: 吞吐量}}
+    """
+    count = CATALOG_SIZES[catalog]
+    scrape_books = min(scrape_books, count)
+    settings = {'catalog': catalog, 'scrape_books': scrape_books, 'latency': latency, 'error_rate': error_rate,
+                'llm_latency': llm_latency, 'llm_error_rate': llm_error_rate, 'workers': workers}
+    books = generate_synthetic_books(count)
+    stages = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            MockIturingServer(total_books=scrape_books, page_size=20, latency=latency, error_rate=error_rate,
+                              tag_names=config.TECH_CATEGORIES) as server, \
+            isolated_config(tmp_dir, ITURING_BASE_URL=server.base_url, MOCK_LLM_LATENCY=llm_latency,
+                            MOCK_LLM_ERROR_RATE=llm_error_rate):
+        # 各阶段的逐本输出不计入测量，也不刷屏（tqdm进度条输出到stderr，仍然可见）
+        with contextlib.redirect_stdout(io.StringIO()):
+            stages['scrape'] = bench_scrape(server, workers)
+            stages['classify'] = bench_classify(books, MockLLM(llm_latency, llm_error_rate), workers)
+            stages['analyze'] = bench_analyze(books)
+            stages['end_to_end'] = bench_end_to_end(server, workers)
+
+    return {'settings': settings, 'stages': stages}
+
+
+def compare_to_baseline(result: Dict[str, Any], baseline: Dict[str, Any],
+                        tolerance: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    与基线比较各阶段的吞吐量
+
+    Returns:
+        吞吐量低于基线 (1 - tolerance) 倍的阶段
+    """
+    regressions = []
+    for stage, current in result['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if not previous or not previous.get('books_per_second'):
+            continue
+        ratio = current['books_per_second'] / previous['books_per_second']
+        if ratio < 1 - tolerance:
+            regressions.append({'stage': stage, 'books_per_second': current['books_per_second'],
+                                'baseline_books_per_second': previous['books_per_second'], 'ratio': ratio})
+    return regressions
+
+
+def load_baseline(filepath: str) -> Dict[str, Any]:
+    """读取基线文件，{目录规模: 测试结果}"""
+    if not os.path.exists(filepath):
+        return {}
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(filepath: str, result: Dict[str, Any]):
+    """把本次结果写入基线文件（按目录规模分别保存）"""
+    baselines = load_baseline(filepath)
+    baselines[result['settings']['catalog']] = result
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, ensure_ascii=False, indent=2)
+
+
+def _run_suite_command(args) -> int:
+    print("=" * 60)
+    print(f"离线基准测试，合成目录 {args.catalog}，抓取 {min(args.scrape_books, CATALOG_SIZES[args.catalog])} 本")
+    print("=" * 60)
+    result = run_suite(args.catalog, args.scrape_books, args.latency, args.error_rate,
+                       args.llm_latency, args.llm_error_rate, args.workers)
+
+    for stage, stats in result['stages'].items():
+        line = f"{stage:<12} {stats['books']:>7} 本  {stats['seconds']:>8.2f} 秒  {stats['books_per_second']:>10.1f} 本/秒"
+        if 'expected_books' in stats:
+            line += f"  (目录 {stats['expected_books']} 本，服务器错误 {stats['server_errors']} 次)"
+        if stats.get('failed_books'):
+            line += f"  (分类失败 {stats['failed_books']} 本)"
+        print(line)
+
+    baseline = load_baseline(args.baseline).get(args.catalog)
+    status = 0
+    if baseline:
+        if baseline['settings'] != result['settings']:
+            print(f"注意: 基线的测试参数不同，比较结果仅供参考: {baseline['settings']}")
+        regressions = compare_to_baseline(result, baseline, args.tolerance)
+        for item in regressions:
+            print(f"✗ 性能回退: {item['stage']} {item['books_per_second']:.1f} 本/秒，"
+                  f"基线 {item['baseline_books_per_second']:.1f} 本/秒 ({item['ratio']:.0%})")
+        if regressions:
+            status = 1
+        else:
+            print(f"✓ 各阶段吞吐量均不低于基线的 {1 - args.tolerance:.0%}")
+    elif not args.save_baseline:
+        print(f"没有 {args.catalog} 的基线，可加 --save-baseline 保存本次结果")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, result)
+        print(f"基线已保存到: {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='图灵图书数据分析系统 - 性能基准测试')
+    parser.add_argument('--books', type=int, default=100000, help='合成图书数量（默认: 100000）')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测试重复次数，取最快一次（默认: 3）')
+
+    suite = parser.add_argument_group('离线基准测试套件')
+    suite.add_argument('--catalog', choices=list(CATALOG_SIZES),
+                       help='运行离线基准测试套件，使用指定规模的合成图书目录')
+    suite.add_argument('--scrape-books', type=int, default=1000,
+                       help='抓取和端到端测试经过模拟服务器的图书数量（默认: 1000）')
+    suite.add_argument('--latency', type=float, default=0.0, help='模拟服务器每个请求的延迟，秒（默认: 0）')
+    suite.add_argument('--error-rate', type=float, default=0.0, help='模拟服务器返回500错误的比例（默认: 0）')
+    suite.add_argument('--llm-latency', type=float, default=0.0, help='模拟AI服务每次调用的延迟，秒（默认: 0）')
+    suite.add_argument('--llm-error-rate', type=float, default=0.0, help='模拟AI服务返回限流错误的比例（默认: 0）')
+    suite.add_argument('--workers', type=int, default=None, help='抓取和分类的并发数（默认使用配置）')
+    suite.add_argument('--baseline', default=config.BENCHMARK_BASELINE_FILE,
+                       help=f'基线文件（默认: {config.BENCHMARK_BASELINE_FILE}）')
+    suite.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    suite.add_argument('--tolerance', type=float, default=0.2,
+                       help='吞吐量低于基线的比例超过该值时视为回退，退出码为1（默认: 0.2）')
+    args = parser.parse_args()
+
+    if args.catalog:
+        sys.exit(_run_suite_command(args))
+
+    print("=" * 60)
+    print(f"数据准备 (prepare_data)，{args.books} 本合成图书")
+    print("=" * 60)
+    result = bench_prepare_data(args.books, args.repeat)
+    print(f"有效记录: {result['rows']}")
+    print(f"逐行解析: {result['legacy_seconds']:.3f} 秒")
+    print(f"按列解析: {result['vectorised_seconds']:.3f} 秒")
+    print(f"加速比: {result['speedup']:.1f}x")
+
+    print("=" * 60)
+    print(f"图书记录内存占用，{args.books} 本合成图书")
+    print("=" * 60)
+    memory = bench_book_memory(args.books)
+    print(f"原始dict: {memory['dict_bytes_per_book']:.0f} 字节/本")
+    print(f"Book记录: {memory['book_bytes_per_book']:.0f} 字节/本 ({memory['ratio']:.0%})")
@@ -1,60 +1,153 @@
-import openai
 import json
 import os
+import random
+import re
+import threading
 import time
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterable, Iterator
 from tqdm import tqdm
 import config
+import storage
+from classification_cache import ClassificationCache
+from metrics import metrics
+from rate_limiter import AIMDRateLimiter
+from rule_classifier import RuleClassifier
+from mock_llm import MockLLM
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    print("警告: 未安装google-generativeai库，Gemini功能将不可用")
-    genai = None
+SYSTEM_PROMPT = "你是一个专业的图书分类助手，擅长为技术类图书分配准确的技术标签。"
+
+# 按异常类名识别OpenAI和Gemini的错误类型，无需导入各自的异常模块
+_RATE_LIMIT_ERRORS = {'RateLimitError', 'ResourceExhausted', 'TooManyRequests'}
+_TRANSIENT_ERRORS = {'APIConnectionError', 'APITimeoutError', 'InternalServerError', 'ServiceUnavailable',
+                     'DeadlineExceeded', 'Timeout', 'ConnectionError'}
+
+def build_classification_text(book: Dict[str, Any]) -> str:
+    """提取图书的关键信息，构建用于分类的文本"""
+    # 提取图书的关键信息
+    name = book.get('name', '')
+    abstract = book.get('abstract', '')
+    brief_intro = book.get('briefIntro') or {}
+    highlight = brief_intro.get('highlight', '')
+    author_info = brief_intro.get('authorInfo', '')
+    tags = book.get('tags') or []
+    categories = book.get('categories') or []
+    
+    # 构建用于分类的文本
+    classification_text = f"""
+书名: {name}
+简介: {abstract}
+亮点: {highlight}
+作者信息: {author_info}
+标签: {', '.join([tag.get('name', '') for tag in tags])}
+分类: {', '.join([cat.get('name', '') for cat_list in categories for cat in cat_list])}
+    """.strip()
+    
+    return classification_text
+
+class ClassificationError(Exception):
+    """AI服务调用在重试后仍然失败"""
+
+def _status_code(error: Exception):
+    return getattr(error, 'status_code', None) or getattr(error, 'code', None)
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return type(error).__name__ in _RATE_LIMIT_ERRORS or _status_code(error) == 429
+
+def is_transient_error(error: Exception) -> bool:
+    code = _status_code(error)
+    return type(error).__name__ in _TRANSIENT_ERRORS or (isinstance(code, int) and code >= 500)
 
 class BookClassifier:
-    def __init__(self, ai_service: str = None):
+    def __init__(self, ai_service: str = None, use_cache: bool = None, workers: int = None,
+                 use_rules: bool = None):
         """
         初始化图书分类器
         
         Args:
-            ai_service: AI服务选择，'openai' 或 'gemini'，默认为config.DEFAULT_AI_SERVICE
+            ai_service: AI服务选择，'openai'、'gemini'、'local'（离线模型）或 'mock'（模拟AI服务），
+                默认为config.DEFAULT_AI_SERVICE
+            use_cache: 是否使用持久化分类缓存，默认为config.CLASSIFY_CACHE_ENABLED
+            workers: 并发分类请求数，默认为config.CLASSIFY_WORKERS
+            use_rules: 是否先用本地关键词规则预分类，默认为config.RULE_CLASSIFIER_ENABLED
         """
         self.ai_service = ai_service or config.DEFAULT_AI_SERVICE
         
+        # 各AI服务的SDK导入较慢，只在选用该服务时导入
         if self.ai_service == 'openai':
+            import openai
+            self.model_name = config.OPENAI_MODEL
             self.client = openai.OpenAI(api_key=config.OPENAI_API_KEY)
         elif self.ai_service == 'gemini':
-            if genai is None:
+            try:
+                import google.generativeai as genai
+            except ImportError:
                 raise ImportError("请安装google-generativeai库: pip install google-generativeai")
+            self.model_name = config.GEMINI_MODEL
             genai.configure(api_key=config.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+            self.model = genai.GenerativeModel(self.model_name)
+        elif self.ai_service == 'local':
+            from local_classifier import LocalClassifier, train_and_save
+            # 离线模型用已分类图书训练，首次使用时自动训练并保存
+            self.model_name = 'local'
+            if os.path.exists(config.LOCAL_MODEL_FILE):
+                self.local_model = LocalClassifier.load(config.LOCAL_MODEL_FILE)
+            else:
+                self.local_model = train_and_save()
+            # 离线预测无需缓存
+            use_cache = False
+        elif self.ai_service == 'mock':
+            # 本地模拟AI服务，经过与真实服务相同的限流、重试和缓存流程
+            self.model_name = 'mock'
+            self.mock_llm = MockLLM()
         else:
-            raise ValueError(f"不支持的AI服务: {self.ai_service}，请选择 'openai' 或 'gemini'")
+            raise ValueError(f"不支持的AI服务: {self.ai_service}，请选择 'openai'、'gemini'、'local' 或 'mock'")
+        
+        self.workers = max(1, workers or config.CLASSIFY_WORKERS)
+        self.last_run_stats = {}
+        self.api_calls = 0
+        self._stats_lock = threading.Lock()
+        
+        # 所有并发请求共享一个自适应限流器：成功时加速，遇到限流错误时减速
+        self.rate_limiter = AIMDRateLimiter(config.CLASSIFY_RATE, config.CLASSIFY_MIN_RATE, config.CLASSIFY_MAX_RATE)
+        
+        # 关键词规则能确定标签的图书不调用AI服务
+        self.rule_classifier = None
+        if config.RULE_CLASSIFIER_ENABLED if use_rules is None else use_rules:
+            self.rule_classifier = RuleClassifier()
+        
+        # 内容未变化的图书直接使用缓存结果，不再调用AI服务
+        self.cache = None
+        if config.CLASSIFY_CACHE_ENABLED if use_cache is None else use_cache:
+            self.cache = ClassificationCache(config.CLASSIFY_CACHE_FILE)
     
-    def classify_book(self, book: Dict[str, Any]) -> str:
-        """为单本图书分配技术标签"""
-        # 提取图书的关键信息
-        name = book.get('name', '')
-        abstract = book.get('abstract', '')
-        brief_intro = book.get('briefIntro', {})
-        highlight = brief_intro.get('highlight', '')
-        author_info = brief_intro.get('authorInfo', '')
-        tags = book.get('tags', [])
-        categories = book.get('categories', [])
-        
-        # 构建用于分类的文本
-        classification_text = f"""
-书名: {name}
-简介: {abstract}
-亮点: {highlight}
-作者信息: {author_info}
-标签: {', '.join([tag.get('name', '') for tag in tags])}
-分类: {', '.join([cat.get('name', '') for cat_list in categories for cat in cat_list])}
-        """.strip()
+    def build_classification_text(self, book: Dict[str, Any]) -> str:
+        """提取图书的关键信息，构建用于分类的文本"""
+        return build_classification_text(book)
+    
+    def _call_llm(self, prompt: str, max_tokens: int = 50) -> str:
+        """调用AI服务，返回模型输出的文本"""
+        if self.ai_service == 'openai':
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.1
+            )
+            return response.choices[0].message.content.strip()
+        
+        if self.ai_service == 'mock':
+            return self.mock_llm(prompt, max_tokens=max_tokens)
         
-        # 构建提示词
-        prompt = f"""
+        response = self.model.generate_content(f"{SYSTEM_PROMPT}\n\n{prompt}")
+        return response.text.strip()
+    
+    def build_prompt(self, classification_text: str) -> str:
+        """构建单本图书的分类提示词"""
+        return f"""
 请根据以下图书信息，从以下技术标签中选择最合适的一个标签：
 
 技术标签列表：
@@ -65,74 +158,304 @@ class BookClassifier:
 
 请只返回一个标签名称，不要包含任何其他文字。如果以上标签都不合适，请返回"其他"。
         """
+    
+    def build_batch_prompt(self, classification_texts: List[str]) -> str:
+        """构建多本图书的分类提示词，图书按 [1]、[2]... 编号"""
+        entries = "\n\n".join(f"[{i}]\n{text}" for i, text in enumerate(classification_texts, 1))
+        return f"""
+请根据以下{len(classification_texts)}本图书的信息，分别为每本图书从以下技术标签中选择最合适的一个标签：
+
+技术标签列表：
+{', '.join(config.TECH_CATEGORIES)}
+
+图书信息：
+{entries}
+
+请只返回一个JSON对象，键为图书编号，值为标签名称，例如 {{"1": "Python", "2": "其他"}}，不要包含任何其他文字。如果以上标签都不合适，请使用"其他"。
+        """
+    
+    @staticmethod
+    def parse_batch_reply(reply: str, count: int) -> Dict[int, str]:
+        """解析批量分类的JSON回复，返回 {图书编号: 标签}，无法解析或不在标签列表中的条目被忽略"""
+        match = re.search(r'\{.*\}', reply, re.S)
+        if not match:
+            return {}
         
         try:
-            if self.ai_service == 'openai':
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "你是一个专业的图书分类助手，擅长为技术类图书分配准确的技术标签。"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=50,
-                    temperature=0.1
-                )
-                classification = response.choices[0].message.content.strip()
-                
-            elif self.ai_service == 'gemini':
-                response = self.model.generate_content(
-                    f"你是一个专业的图书分类助手，擅长为技术类图书分配准确的技术标签。\n\n{prompt}"
-                )
-                classification = response.text.strip()
+            data = json.loads(match.group(0))
+        except ValueError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        
+        tags = {}
+        for key, tag in data.items():
+            try:
+                index = int(str(key).strip().strip('[]'))
+            except ValueError:
+                continue
+            if 1 <= index <= count and isinstance(tag, str) and tag.strip() in config.TECH_CATEGORIES:
+                tags[index] = tag.strip()
+        return tags
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """粗略估算token数：中文约每字1个token，ASCII字符约每4个1个token"""
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return (len(text) - ascii_chars) + ascii_chars // 4
+    
+    def _cache_key(self, classification_text: str) -> str:
+        return ClassificationCache.make_key(classification_text, config.TECH_CATEGORIES, self.model_name)
+    
+    def _lookup_cache(self, classification_text: str) -> str:
+        if self.cache is None:
+            return None
+        return self.cache.get(self._cache_key(classification_text))
+    
+    def _store_cache(self, classification_text: str, classification: str):
+        if self.cache is not None:
+            self.cache.set(self._cache_key(classification_text), classification, self.model_name)
+    
+    def _call_with_retry(self, prompt: str, max_tokens: int = 50) -> str:
+        """经过限流器调用AI服务，限流和临时错误按带随机抖动的指数退避重试"""
+        for attempt in range(config.CLASSIFY_MAX_RETRIES + 1):
+            self.rate_limiter.acquire()
+            with self._stats_lock:
+                self.api_calls += 1
             
-            # 验证返回的标签是否在预定义列表中
-            if classification not in config.TECH_CATEGORIES:
-                classification = "其他"
+            metrics.increment('classifier.requests')
             
-            return classification
+            try:
+                with metrics.timer('classifier.llm_call'):
+                    result = self._call_llm(prompt, max_tokens=max_tokens)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                if rate_limited:
+                    self.rate_limiter.on_rate_limited()
+                    metrics.increment('classifier.rate_limited')
+                
+                if attempt >= config.CLASSIFY_MAX_RETRIES or not (rate_limited or is_transient_error(e)):
+                    metrics.increment('classifier.errors')
+                    raise ClassificationError(f"{type(e).__name__}: {e}") from e
+                
+                # 随机抖动避免多个线程在同一时刻重试
+                metrics.increment('classifier.retries')
+                time.sleep(random.uniform(0, config.CLASSIFY_RETRY_BACKOFF * 2 ** attempt))
+                continue
             
-        except Exception as e:
+            self.rate_limiter.on_success()
+            return result
+    
+    def _classify_text(self, classification_text: str) -> str:
+        """调用AI服务为单本图书分类（不查缓存），失败时抛出ClassificationError"""
+        if self.ai_service == 'local':
+            return self.local_model.predict([classification_text])[0]
+        
+        classification = self._call_with_retry(self.build_prompt(classification_text))
+        
+        # 验证返回的标签是否在预定义列表中
+        if classification not in config.TECH_CATEGORIES:
+            classification = "其他"
+        
+        self._store_cache(classification_text, classification)
+        return classification
+    
+    def _classify_batch(self, classification_texts: List[str]) -> Dict[int, str]:
+        """一次请求为多本图书分类，返回成功解析的 {图书编号: 标签}"""
+        # 每本书约需十几个token的回复
+        max_tokens = 20 * len(classification_texts) + 50
+        try:
+            with metrics.timer('classifier.classify_batch'):
+                reply = self._call_with_retry(self.build_batch_prompt(classification_texts), max_tokens=max_tokens)
+        except ClassificationError as e:
+            print(f"批量分类失败: {e}")
+            return {}
+        
+        tags = self.parse_batch_reply(reply, len(classification_texts))
+        for index, tag in tags.items():
+            self._store_cache(classification_texts[index - 1], tag)
+        return tags
+    
+    @metrics.timed('classifier.classify_book')
+    def classify_book(self, book: Dict[str, Any]) -> str:
+        """为单本图书分配技术标签，AI服务调用失败时返回None"""
+        if self.rule_classifier is not None:
+            rule_tag = self.rule_classifier.classify(book)
+            if rule_tag is not None:
+                return rule_tag
+        
+        classification_text = self.build_classification_text(book)
+        
+        cached = self._lookup_cache(classification_text)
+        if cached is not None:
+            return cached
+        
+        try:
+            return self._classify_text(classification_text)
+        except ClassificationError as e:
             print(f"分类失败: {e}")
-            return "其他"
+            return None
     
-    def classify_books_batch(self, books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """批量分类图书"""
-        classified_books = []
+    @staticmethod
+    def _mark_classified(book: Dict[str, Any], tech_tag: str, source: str = 'llm'):
+        """记录分类结果及来源（'rule' 规则预分类，'llm' AI服务或其缓存结果，'local' 离线模型）"""
+        book['tech_tag'] = tech_tag
+        book['classify_source'] = source
+        book.pop('classify_error', None)
+    
+    def classify_books_batch(self, books: List[Dict[str, Any]], batch_size: int = None,
+                             workers: int = None) -> List[Dict[str, Any]]:
+        """
+        批量分类图书
+        
+        Args:
+            books: 图书列表
+            batch_size: 每次请求打包的图书数量，默认为config.CLASSIFY_BATCH_SIZE；
+                批量回复中无法解析的图书会退回单本分类
+            workers: 并发请求数，默认为初始化时的设置
+        
+        重试后仍然失败的图书 tech_tag 为None，并在 classify_error 中记录原因，不会被误标为"其他"
+        """
+        batch_size = max(1, batch_size or config.CLASSIFY_BATCH_SIZE)
+        workers = max(1, workers or self.workers)
+        books = list(books)
+        start_calls = self.api_calls
         
-        print(f"开始为图书分配技术标签 (使用 {self.ai_service.upper()} API)...")
+        print(f"开始为图书分配技术标签 (使用 {self.ai_service.upper()} API，"
+              f"每次请求 {batch_size} 本，并发数 {workers})...")
         
-        for i, book in enumerate(tqdm(books, desc="分类图书")):
-            # 为图书添加技术标签
-            tech_tag = self.classify_book(book)
-            book['tech_tag'] = tech_tag
+        # 先用关键词规则预分类，再查缓存，两者都能确定标签的图书不再调用API
+        pending = []
+        rule_hits = 0
+        cache_hits = 0
+        for book in books:
+            if self.rule_classifier is not None:
+                rule_tag = self.rule_classifier.classify(book)
+                if rule_tag is not None:
+                    self._mark_classified(book, rule_tag, source='rule')
+                    rule_hits += 1
+                    continue
             
-            classified_books.append(book)
+            classification_text = self.build_classification_text(book)
+            cached = self._lookup_cache(classification_text)
+            if cached is not None:
+                self._mark_classified(book, cached)
+                cache_hits += 1
+            else:
+                pending.append((book, classification_text))
+        
+        # 离线模型一次性向量化预测全部图书
+        if self.ai_service == 'local':
+            start = time.perf_counter()
+            tags = self.local_model.predict([text for _, text in pending])
+            elapsed = time.perf_counter() - start
+            for (book, _), tag in zip(pending, tags):
+                self._mark_classified(book, tag, source='local')
             
-            # 添加延迟以避免API限制
-            if i < len(books) - 1:  # 不是最后一本书
-                time.sleep(1)
+            self.last_run_stats = {"books": len(books), "rule_hits": rule_hits, "local_books": len(pending),
+                                   "elapsed": elapsed}
+            print(f"离线模型分类 {len(pending)} 本，规则预分类 {rule_hits} 本，耗时 {elapsed:.2f} 秒")
+            return books
+        
+        batch_requests = 0
+        batched_books = 0
+        tokens_saved = 0
+        failed = 0
+        fallback = []
         
-        return classified_books
+        with ThreadPoolExecutor(max_workers=workers) as executor, \
+                tqdm(total=len(pending), desc="分类图书") as progress:
+            if batch_size > 1:
+                batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+                futures = {}
+                for batch in batches:
+                    if len(batch) == 1:
+                        fallback.extend(batch)
+                    else:
+                        futures[executor.submit(self._classify_batch, [text for _, text in batch])] = batch
+                
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    tags = future.result()
+                    batch_requests += 1
+                    
+                    for index, (book, text) in enumerate(batch, 1):
+                        if index in tags:
+                            self._mark_classified(book, tags[index])
+                            batched_books += 1
+                            tokens_saved += self.estimate_tokens(SYSTEM_PROMPT + self.build_prompt(text))
+                            progress.update(1)
+                        else:
+                            fallback.append((book, text))
+                    tokens_saved -= self.estimate_tokens(SYSTEM_PROMPT + self.build_batch_prompt([t for _, t in batch]))
+            else:
+                fallback = pending
+            
+            # 单本分类（batch_size为1，或批量回复中无法解析的图书）
+            futures = {executor.submit(self._classify_text, text): book for book, text in fallback}
+            for future in as_completed(futures):
+                book = futures[future]
+                try:
+                    self._mark_classified(book, future.result())
+                except ClassificationError as e:
+                    book['tech_tag'] = None
+                    book['classify_error'] = str(e)
+                    failed += 1
+                progress.update(1)
+        
+        self.last_run_stats = {
+            "books": len(books),
+            "rule_hits": rule_hits,
+            "cache_hits": cache_hits,
+            "requests": self.api_calls - start_calls,
+            "batched_books": batched_books,
+            "fallback_books": len(fallback),
+            "failed_books": failed,
+            "requests_saved": batched_books - batch_requests,
+            "tokens_saved": tokens_saved,
+            "final_rate": self.rate_limiter.rate
+        }
+        
+        if self.rule_classifier is not None:
+            hit_rate = rule_hits / len(books) if books else 0.0
+            print(f"规则预分类: 命中 {rule_hits} 本 ({hit_rate:.1%})")
+        if self.cache is not None:
+            print(f"分类缓存: 命中 {cache_hits} 本")
+        if batch_size > 1:
+            print(f"批量分类: {batched_books} 本由批量请求完成，{len(fallback)} 本退回单本分类，"
+                  f"节省约 {self.last_run_stats['requests_saved']} 次请求、{tokens_saved} 个token")
+        print(f"共调用API {self.last_run_stats['requests']} 次（含重试），"
+              f"当前请求速率 {self.rate_limiter.rate:.2f} 请求/秒")
+        if failed:
+            print(f"⚠️  {failed} 本图书分类失败（已标记，未计入\"其他\"），可稍后重新运行分类")
+        
+        return books
     
-    def save_classified_books(self, books: List[Dict[str, Any]], filename: str = "classified_books.json"):
+    def save_classified_books(self, books: Iterable[Dict[str, Any]], filename: str = None):
         """保存已分类的图书数据"""
-        filepath = os.path.join(config.BOOKS_DIR, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(books, f, ensure_ascii=False, indent=2)
+        filepath = os.path.join(config.BOOKS_DIR, filename or config.CLASSIFIED_BOOKS_FILE)
+        storage.write_records(filepath, books)
         
         print(f"已分类的图书数据已保存到: {filepath}")
     
-    def load_classified_books(self, filename: str = "classified_books.json") -> List[Dict[str, Any]]:
-        """加载已分类的图书数据"""
-        filepath = os.path.join(config.BOOKS_DIR, filename)
+    def append_classified_books(self, books: Iterable[Dict[str, Any]], filename: str = None) -> int:
+        """向JSONL数据文件追加已分类的图书（SQLite数据库中新增或更新）"""
+        filepath = os.path.join(config.BOOKS_DIR, filename or config.CLASSIFIED_BOOKS_FILE)
+        return storage.append_records(filepath, books)
+    
+    def iter_classified_books(self, filename: str = None) -> Iterator[Dict[str, Any]]:
+        """逐条读取已分类的图书数据"""
+        filepath = os.path.join(config.BOOKS_DIR, filename or config.CLASSIFIED_BOOKS_FILE)
         
-        if not os.path.exists(filepath):
+        if not storage.exists(filepath):
             print(f"分类数据文件不存在: {filepath}")
-            return []
+            return iter([])
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return storage.iter_records(filepath)
+    
+    def load_classified_books(self, filename: str = None) -> List[Dict[str, Any]]:
+        """加载已分类的图书数据"""
+        return list(self.iter_classified_books(filename))
 
 if __name__ == "__main__":
     # 测试分类器
@@ -155,13 +478,12 @@ if __name__ == "__main__":
     print(f"OpenAI测试图书分类结果: {tag}")
     
     # 测试Gemini分类器（如果可用）
-    if genai is not None:
-        print("\n测试Gemini分类器...")
-        try:
-            classifier_gemini = BookClassifier(ai_service='gemini')
-            tag = classifier_gemini.classify_book(test_book)
-            print(f"Gemini测试图书分类结果: {tag}")
-        except Exception as e:
-            print(f"Gemini测试失败: {e}")
-    else:
-        print("\nGemini不可用，跳过测试") 
\ No newline at end of file
+    print("\n测试Gemini分类器...")
+    try:
+        classifier_gemini = BookClassifier(ai_service='gemini')
+        tag = classifier_gemini.classify_book(test_book)
+        print(f"Gemini测试图书分类结果: {tag}")
+    except ImportError:
+        print("Gemini不可用，跳过测试")
+    except Exception as e:
+        print(f"Gemini测试失败: {e}") 
\ No newline at end of file
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的图书记录
+Book只保留各阶段实际用到的字段：分类用的书名、简介、亮点、作者信息、标签和分类，
+分析用的出版日期、作者和ISBN，以及分类结果。字段保存在__slots__中，
+标签和分类只保存名称（重复出现的字符串共用同一个对象），每本图书的内存占用比原始接口数据小得多
+
+Book按接口字段名（'name'、'publishDate'、'tags'等）提供与dict相同的读写方式，
+各阶段的代码不需要区分原始数据和Book；dict(book)即为只含这些字段的记录，可直接保存
+"""
+
+import sys
+from collections.abc import MutableMapping
+from typing import Dict, Any, Iterator, Tuple
+
+# 接口字段名 -> Book属性名
+FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'publishDate': 'publish_date',
+    'authorNameString': 'author',
+    'isbn': 'isbn',
+    'abstract': 'abstract',
+    'briefIntro': 'brief_intro',
+    'tags': 'tags',
+    'categories': 'categories',
+    'tech_tag': 'tech_tag',
+    'classify_source': 'classify_source',
+    'classify_error': 'classify_error'
+}
+
+# 简介中保留的字段
+BRIEF_INTRO_FIELDS = ('highlight', 'authorInfo')
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _tag_names(tags) -> Tuple[str, ...]:
+    return tuple(_intern(tag.get('name', '')) for tag in tags)
+
+
+def _category_names(categories) -> Tuple[Tuple[str, ...], ...]:
+    return tuple(_tag_names(cat_list) for cat_list in categories)
+
+
+class Book(MutableMapping):
+    """
+    图书记录，没有出现在原始数据中的字段同样不出现在记录中（book.get返回默认值）
+
+    tags和categories保存为名称元组，读取时还原为接口的格式 [{'name': ...}]
+    """
+
+    __slots__ = tuple(FIELDS.values())
+
+    def __init__(self, record: Dict[str, Any] = None, **fields):
+        for key, value in dict(record or {}, **fields).items():
+            if key in FIELDS:
+                self[key] = value
+
+    @classmethod
+    def from_payload(cls, *payloads: Dict[str, Any]) -> 'Book':
+        """由图书列表和图书详情等原始接口数据合并投影出Book，后面的数据覆盖前面的同名字段"""
+        book = cls()
+        for payload in payloads:
+            for key, value in payload.items():
+                if key in FIELDS:
+                    book[key] = value
+        return book
+
+    def __getitem__(self, key: str):
+        try:
+            value = getattr(self, FIELDS[key])
+        except (KeyError, AttributeError):
+            raise KeyError(key) from None
+        if value is None:
+            return None
+        if key == 'tags':
+            return [{'name': name} for name in value]
+        if key == 'categories':
+            return [[{'name': name} for name in cat_list] for cat_list in value]
+        if key == 'briefIntro':
+            return dict(value)
+        return value
+
+    def __setitem__(self, key: str, value):
+        if key not in FIELDS:
+            raise KeyError(f"Book没有字段: {key}")
+        if value is None:
+            pass
+        elif key == 'tags':
+            value = _tag_names(value)
+        elif key == 'categories':
+            value = _category_names(value)
+        elif key == 'briefIntro':
+            value = {field: value[field] for field in BRIEF_INTRO_FIELDS if field in value}
+        elif key in ('tech_tag', 'classify_source'):
+            value = _intern(value)
+        setattr(self, FIELDS[key], value)
+
+    def __delitem__(self, key: str):
+        try:
+            delattr(self, FIELDS[key])
+        except (KeyError, AttributeError):
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        for key, attr in FIELDS.items():
+            if hasattr(self, attr):
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"Book({dict(self)!r})"
+
+
+def project_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留Book字段的记录（可直接保存为JSON）"""
+    return dict(Book(record))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite图书数据存储
+每本图书一行，完整记录以JSON保存，图书ID、出版年份和技术标签单独成列并建立索引，
+可以按ID读取或更新单本图书、按年份和标签查询，统计分组直接在SQL中完成
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from aggregate_store import book_key, parse_publish_year
+
+# 批量写入时每个事务内一次executemany的记录数
+WRITE_BATCH_SIZE = 1000
+# 逐条读取时每次从数据库取出的记录数
+READ_BATCH_SIZE = 1000
+
+
+class BookStore:
+    def __init__(self, db_path: str):
+        """
+        打开（或创建）图书数据库
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS books (
+                key TEXT PRIMARY KEY,
+                id INTEGER,
+                position INTEGER NOT NULL,
+                publish_year INTEGER,
+                tech_tag TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_books_id ON books (id);
+            CREATE INDEX IF NOT EXISTS idx_books_position ON books (position);
+            CREATE INDEX IF NOT EXISTS idx_books_year_tag ON books (publish_year, tech_tag);
+            CREATE INDEX IF NOT EXISTS idx_books_tag ON books (tech_tag);
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _row(book: Dict[str, Any], position: int) -> Tuple:
+        book_id = book.get('id')
+        return (
+            book_key(book) or f"position:{position}",
+            book_id if isinstance(book_id, int) else None,
+            position,
+            parse_publish_year(book.get('publishDate')),
+            book.get('tech_tag'),
+            json.dumps(book, ensure_ascii=False, default=dict)
+        )
+
+    def _insert(self, books: Iterable[Dict[str, Any]], start: int, upsert: bool) -> int:
+        """在当前事务中分批写入，upsert时已有图书保留原来的位置"""
+        sql = "INSERT INTO books (key, id, position, publish_year, tech_tag, data) VALUES (?, ?, ?, ?, ?, ?)"
+        if upsert:
+            sql += (" ON CONFLICT(key) DO UPDATE SET id = excluded.id, publish_year = excluded.publish_year,"
+                    " tech_tag = excluded.tech_tag, data = excluded.data")
+        else:
+            sql = sql.replace("INSERT", "INSERT OR REPLACE", 1)
+
+        rows = (self._row(book, position) for position, book in enumerate(books, start))
+        count = 0
+        while True:
+            batch = list(islice(rows, WRITE_BATCH_SIZE))
+            if not batch:
+                return count
+            self._conn.executemany(sql, batch)
+            count += len(batch)
+
+    def write(self, books: Iterable[Dict[str, Any]]) -> int:
+        """用给定的图书替换全部数据（单个事务），返回写入的图书数"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM books")
+            return self._insert(books, 0, upsert=False)
+
+    def upsert(self, books: Iterable[Dict[str, Any]]) -> int:
+        """
+        新增或更新图书（单个事务），返回处理的图书数
+
+        已有的图书（按图书ID，没有ID时按ISBN或书名）原地更新，新图书排在最后
+        """
+        with self._lock, self._conn:
+            start = self._conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM books").fetchone()[0]
+            return self._insert(books, start, upsert=True)
+
+    def set_tech_tag(self, book_id: int, tech_tag: str) -> bool:
+        """更新单本图书的技术标签，返回图书是否存在"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT key, data FROM books WHERE id = ?", (book_id,)).fetchone()
+            if row is None:
+                return False
+            book = json.loads(row[1])
+            book['tech_tag'] = tech_tag
+            self._conn.execute("UPDATE books SET tech_tag = ?, data = ? WHERE key = ?",
+                               (tech_tag, json.dumps(book, ensure_ascii=False), row[0]))
+            return True
+
+    def get(self, book_id: int) -> Optional[Dict[str, Any]]:
+        """按图书ID读取单本图书"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM books WHERE id = ?", (book_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_books(self, publish_year: int = None, tech_tag: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        按保存顺序逐条读取图书，可按出版年份和技术标签筛选（使用索引）
+
+        使用单独的连接分批读取，内存中只保留一批记录，迭代期间不占用本对象的锁
+        """
+        conditions, params = [], []
+        if publish_year is not None:
+            conditions.append("publish_year = ?")
+            params.append(publish_year)
+        if tech_tag is not None:
+            conditions.append("tech_tag = ?")
+            params.append(tech_tag)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(f"SELECT data FROM books{where} ORDER BY position", params)
+            while True:
+                rows = cursor.fetchmany(READ_BATCH_SIZE)
+                if not rows:
+                    return
+                for row in rows:
+                    yield json.loads(row[0])
+        finally:
+            conn.close()
+
+    def year_tag_counts(self, start_year: int = None, end_year: int = None) -> List[Tuple[int, str, int]]:
+        """
+        各年份各技术标签的图书数量 [(年份, 标签, 数量)]
+
+        与数据准备阶段相同的规则：跳过"其他"、分类失败和没有出版日期的图书
+        """
+        sql = ("SELECT publish_year, tech_tag, COUNT(*) FROM books"
+               " WHERE publish_year IS NOT NULL AND tech_tag IS NOT NULL AND tech_tag NOT IN ('', '其他')")
+        params = []
+        if start_year is not None:
+            sql += " AND publish_year >= ?"
+            params.append(start_year)
+        if end_year is not None:
+            sql += " AND publish_year <= ?"
+            params.append(end_year)
+        sql += " GROUP BY publish_year, tech_tag"
+
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
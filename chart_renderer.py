@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析图表渲染模块
+每张图表在独立的工作进程中用无界面的Agg后端绘制，
+输入数据未变化的图表直接跳过
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+import pandas as pd
+
+from analysis_stats import AnalysisStats
+from metrics import metrics
+
+# 设置中文字体
+plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
+plt.rcParams['axes.unicode_minus'] = False
+
+# 记录每张图表输入数据指纹的文件
+CHART_MANIFEST_FILE = 'chart_manifest.json'
+
+
+def plot_tag_distribution(tech_counts: pd.Series, path: str, dpi: int):
+    """总体技术标签分布饼图"""
+    plt.figure(figsize=(12, 8))
+    plt.pie(tech_counts.values, labels=tech_counts.index, autopct='%1.1f%%')
+    plt.title('图灵图书技术标签分布', fontsize=16, fontweight='bold')
+    plt.axis('equal')
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_yearly_trend(pivot_for_plot: pd.DataFrame, path: str, dpi: int):
+    """每年各技术标签出版数量堆叠柱状图"""
+    pivot_for_plot.plot(kind='bar', stacked=True, figsize=(16, 10))
+    plt.title('图灵图书各技术标签年度出版数量趋势', fontsize=16, fontweight='bold')
+    plt.xlabel('出版年份', fontsize=12)
+    plt.ylabel('图书数量', fontsize=12)
+    plt.legend(title='技术标签', bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_heatmap(pivot_table: pd.DataFrame, path: str, dpi: int):
+    """技术标签年度出版热力图"""
+    plt.figure(figsize=(14, 10))
+    sns.heatmap(pivot_table, annot=True, fmt='.0f', cmap='YlOrRd',
+                cbar_kws={'label': '图书数量'})
+    plt.title('图灵图书技术标签年度出版热力图', fontsize=16, fontweight='bold')
+    plt.xlabel('技术标签', fontsize=12)
+    plt.ylabel('出版年份', fontsize=12)
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_yearly_total(yearly_total: pd.Series, path: str, dpi: int):
+    """年度出版总量趋势"""
+    plt.figure(figsize=(12, 8))
+    plt.plot(yearly_total.index, yearly_total.values, marker='o', linewidth=2, markersize=8)
+    plt.title('图灵图书年度出版总量趋势', fontsize=16, fontweight='bold')
+    plt.xlabel('出版年份', fontsize=12)
+    plt.ylabel('图书数量', fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+# 图表文件名（不含扩展名） -> 绘制函数
+CHARTS = {
+    'tech_tag_distribution': plot_tag_distribution,
+    'yearly_tech_tag_trend': plot_yearly_trend,
+    'tech_tag_year_heatmap': plot_heatmap,
+    'yearly_total_publications': plot_yearly_total
+}
+
+
+def chart_inputs(stats: AnalysisStats) -> Dict[str, Any]:
+    """由汇总统计得到每张图表的输入数据"""
+    # 堆叠柱状图只显示出版数量最多的前top_n个技术标签，去掉没有这些标签图书的年份
+    pivot_for_plot = stats.pivot_table[sorted(stats.top_tags)]
+    pivot_for_plot = pivot_for_plot[pivot_for_plot.sum(axis=1) > 0]
+
+    return {
+        'tech_tag_distribution': stats.tag_counts,
+        'yearly_tech_tag_trend': pivot_for_plot,
+        'tech_tag_year_heatmap': stats.pivot_table,
+        'yearly_total_publications': stats.yearly_totals
+    }
+
+
+def fingerprint(data, image_format: str, dpi: int) -> str:
+    """图表输入数据和输出设置的指纹，任一变化都需要重新绘制"""
+    digest = hashlib.sha256()
+    digest.update(data.to_json(orient='split', force_ascii=False).encode('utf-8'))
+    digest.update(f"\0{image_format}\0{dpi}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _load_manifest(path: str) -> Dict[str, str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _render(name: str, data, path: str, dpi: int) -> float:
+    """绘制一张图表，返回耗时（秒）；在工作进程中运行时由主进程记录指标"""
+    start = time.perf_counter()
+    CHARTS[name](data, path, dpi)
+    return time.perf_counter() - start
+
+
+def render_charts(pivot_table: pd.DataFrame, output_dir: str, image_format: str = 'png',
+                  dpi: int = 300, workers: int = 4, skip_unchanged: bool = True,
+                  stats: AnalysisStats = None) -> Dict[str, List[str]]:
+    """
+    绘制全部分析图表
+
+    Args:
+        pivot_table: 年度统计表，行为年份，列为技术标签
+        output_dir: 输出目录
+        image_format: 图片格式，'png' 或 'svg'
+        dpi: 位图分辨率
+        workers: 绘图进程数（不超过CPU核数），为1时在当前进程中依次绘制
+        skip_unchanged: 跳过输入数据和输出设置都未变化、且文件仍存在的图表
+        stats: 已由该统计表算出的汇总统计，为None时在这里计算
+
+    Returns:
+        {'rendered': 重新绘制的图表, 'skipped': 跳过的图表}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, CHART_MANIFEST_FILE)
+    manifest = _load_manifest(manifest_path) if skip_unchanged else {}
+
+    todo = {}
+    skipped = []
+    for name, data in chart_inputs(stats or AnalysisStats(pivot_table)).items():
+        filename = f"{name}.{image_format}"
+        digest = fingerprint(data, image_format, dpi)
+        if manifest.get(filename) == digest and os.path.exists(os.path.join(output_dir, filename)):
+            skipped.append(name)
+            continue
+        manifest[filename] = digest
+        todo[name] = (data, os.path.join(output_dir, filename))
+
+    # 每张图表一个进程，总耗时取决于最慢的一张；进程数不超过CPU核数
+    workers = min(workers, len(todo), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(_render, name, data, path, dpi) for name, (data, path) in todo.items()}
+            for name, future in futures.items():
+                metrics.observe(f'chart.{name}', future.result())
+    else:
+        for name, (data, path) in todo.items():
+            metrics.observe(f'chart.{name}', _render(name, data, path, dpi))
+
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    return {'rendered': list(todo), 'skipped': skipped}
@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+from typing import List, Dict, Any
+
+
+class CrawlCheckpoint:
+    """
+    抓取断点文件（JSONL格式，只追加写入）
+
+    每获取一本图书详情写入一行 {"type": "book", ...}，
+    每完成一页写入一行 {"type": "page", ...}，
+    程序中断后重新运行时据此跳过已完成的页面和已获取的图书。
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.books: Dict[Any, Dict[str, Any]] = {}
+        self.pages: Dict[int, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """读取已有的断点记录"""
+        if not os.path.exists(self.filepath):
+            return
+
+        with open(self.filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时可能留下写了一半的最后一行，直接忽略
+                    continue
+
+                if record.get("type") == "book":
+                    book = record["book"]
+                    self.books[book.get("id")] = book
+                elif record.get("type") == "page":
+                    self.pages[record["page"]] = record.get("ids", [])
+
+    def _append(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, default=dict)
+        with self._lock:
+            with open(self.filepath, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record_book(self, page: int, book: Dict[str, Any]):
+        """记录一本已获取详情的图书"""
+        self._append({"type": "book", "page": page, "book": book})
+        self.books[book.get("id")] = book
+
+    def record_page(self, page: int, book_ids: List[Any]):
+        """记录一个已完成的页面及其包含的图书ID"""
+        self._append({"type": "page", "page": page, "ids": book_ids})
+        self.pages[page] = book_ids
+
+    def has_book(self, book_id) -> bool:
+        return book_id in self.books
+
+    def is_page_done(self, page: int) -> bool:
+        return page in self.pages
+
+    def page_books(self, page: int) -> List[Dict[str, Any]]:
+        """返回已完成页面中的图书（按页面内顺序）"""
+        return [self.books[book_id] for book_id in self.pages.get(page, []) if book_id in self.books]
+
+    def exists(self) -> bool:
+        return os.path.exists(self.filepath)
+
+    def clear(self):
+        """删除断点文件（数据完整保存后调用）"""
+        with self._lock:
+            if os.path.exists(self.filepath):
+                os.remove(self.filepath)
+            self.books = {}
+            self.pages = {}
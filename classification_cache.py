@@ -0,0 +1,72 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from metrics import metrics
+
+
+class ClassificationCache:
+    """
+    持久化的图书分类结果缓存（SQLite）
+
+    键为分类文本、技术标签列表和模型名称的哈希，
+    图书内容、标签列表或模型任一变化都会重新调用AI服务
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS classifications (
+                key TEXT PRIMARY KEY,
+                tech_tag TEXT NOT NULL,
+                model TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(classification_text: str, categories: List[str], model: str) -> str:
+        digest = hashlib.sha256()
+        for part in (classification_text, '\x1f'.join(categories), model):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tech_tag FROM classifications WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self.hits += 1
+                metrics.increment('classify_cache.hits')
+                return row[0]
+            self.misses += 1
+            metrics.increment('classify_cache.misses')
+            return None
+
+    def set(self, key: str, tech_tag: str, model: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classifications (key, tech_tag, model, created_at) VALUES (?, ?, ?, ?)",
+                (key, tech_tag, model, time.time())
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
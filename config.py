@@ -8,10 +8,28 @@ load_dotenv()
 OPENAI_API_KEY = ''
 GEMINI_API_KEY = ''
 
-# 默认AI服务选择 ('openai' 或 'gemini')
+# 默认AI服务选择 ('openai'、'gemini' 或 'local'，local为用已分类图书训练的离线模型；
+# 'mock'为本地模拟AI服务，只用于离线测试和基准测试)
 # DEFAULT_AI_SERVICE = 'openai'
 DEFAULT_AI_SERVICE = 'gemini'
 
+# AI模型名称
+OPENAI_MODEL = "gpt-3.5-turbo"
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# 模拟AI服务（ai_service='mock'）的响应延迟（秒）和限流错误比例
+MOCK_LLM_LATENCY = 0.0
+MOCK_LLM_ERROR_RATE = 0.0
+
+# 分类请求配置
+CLASSIFY_BATCH_SIZE = 10  # 每次请求打包分类的图书数量，1表示逐本分类
+CLASSIFY_WORKERS = 4  # 并发分类请求数
+CLASSIFY_RATE = 1.0  # 初始请求速率（请求/秒），成功时线性加速，遇到限流错误时减半
+CLASSIFY_MIN_RATE = 0.1  # 请求速率下限
+CLASSIFY_MAX_RATE = 10.0  # 请求速率上限
+CLASSIFY_MAX_RETRIES = 4  # 限流或临时错误的最大重试次数
+CLASSIFY_RETRY_BACKOFF = 2  # 重试退避基数（秒），第n次重试最多等待 基数*2^n 秒
+
 # 图灵网站API配置
 ITURING_BASE_URL = "https://api.ituring.com.cn/api"
 SEARCH_URL = f"{ITURING_BASE_URL}/Search/Advanced"
@@ -19,11 +37,73 @@ BOOK_DETAIL_URL = f"{ITURING_BASE_URL}/Book"
 
 # 请求配置
 REQUEST_DELAY = 5  # 请求间隔时间（秒）
+REQUEST_RATE = 1 / REQUEST_DELAY  # 全局请求速率（请求/秒），由令牌桶限流器控制
+REQUEST_BURST = 1  # 令牌桶容量，即允许的最大突发请求数
+SCRAPE_WORKERS = 4  # 并发获取图书详情的线程数
+# 抓取和读取图书数据时只保留各阶段用到的字段（book_record.Book），
+# 每本图书的内存占用和数据文件都小得多，但不再保存接口返回的其他字段
+BOOK_PROJECTION_ENABLED = False
+
+# HTTP连接配置
+HTTP_CONNECT_TIMEOUT = 5  # 建立连接的超时时间（秒）
+HTTP_READ_TIMEOUT = 30  # 等待响应数据的超时时间（秒）
+HTTP_MAX_RETRIES = 3  # 5xx、429响应和连接错误的最大重试次数
+HTTP_RETRY_BACKOFF = REQUEST_DELAY  # 重试退避基数（秒），重试不经过令牌桶，第n次重试前等待 基数*2^(n-1) 秒
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)  # 需要重试的响应状态码
+HTTP_POOL_CONNECTIONS = 4  # 缓存连接池的主机数，每个主机的连接池大小与抓取并发数相同
+
+# HTTP缓存配置
+HTTP_CACHE_ENABLED = True  # 是否将接口响应缓存到磁盘
+HTTP_CACHE_TTL = 6 * 3600  # 缓存有效期（秒），过期后如有ETag/Last-Modified则发送条件请求
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 缓存总大小上限（字节），超出后淘汰最久未使用的条目
 
 # 数据存储配置
 DATA_DIR = "data"
 BOOKS_DIR = os.path.join(DATA_DIR, "books")
 ANALYSIS_DIR = os.path.join(DATA_DIR, "analysis")
+CHECKPOINT_FILE = os.path.join(BOOKS_DIR, "scrape_checkpoint.jsonl")  # 抓取断点文件
+HTTP_CACHE_DIR = os.path.join(DATA_DIR, "http_cache")  # HTTP响应缓存目录
+PIPELINE_MANIFEST_FILE = os.path.join(DATA_DIR, "pipeline_manifest.json")  # 各阶段输入输出哈希，输入未变化的阶段会被跳过
+PIPELINE_QUEUE_SIZE = 100  # 流式流水线（--streaming）阶段之间队列的容量
+
+# 运行指标（各类调用的耗时分布、请求次数、缓存命中率等），每次运行main.py后写入
+METRICS_FILE = os.path.join(ANALYSIS_DIR, "metrics.json")
+# --profile 的输出文件（cProfile统计数据；使用pyinstrument时为同名的.html文件）
+PROFILE_FILE = os.path.join(ANALYSIS_DIR, "profile.prof")
+
+# 离线基准测试（python benchmark.py --catalog ...）的基线结果
+BENCHMARK_BASELINE_FILE = os.path.join(DATA_DIR, "benchmark_baseline.json")
+
+# 分类结果缓存（按分类文本、标签列表和模型名称的哈希索引，内容未变化的图书不再调用AI服务）
+CLASSIFY_CACHE_ENABLED = True
+CLASSIFY_CACHE_FILE = os.path.join(DATA_DIR, "classification_cache.db")
+
+# 离线分类模型（ai_service='local'）
+LOCAL_MODEL_FILE = os.path.join(DATA_DIR, "local_classifier.npz")
+LOCAL_MODEL_FEATURES = 2 ** 16  # 字符n-gram哈希特征维度
+
+# 数据文件格式: 'jsonl'（逐行存储，支持流式读取和追加写入）、'json'（整体存储）
+# 或 'db'（SQLite，按图书ID、出版年份和技术标签建立索引，分析时直接在SQL中分组统计）
+# 切换格式后仍可读取旧格式的同名文件，也可运行 python storage.py <文件> --to <格式> 进行转换
+STORAGE_FORMAT = 'jsonl'
+BOOKS_DATA_FILE = f"books_data.{STORAGE_FORMAT}"
+CLASSIFIED_BOOKS_FILE = f"classified_books.{STORAGE_FORMAT}"
+
+# 分析数据集（Parquet，按出版年份分区，需要安装pyarrow）
+# 分类数据未变化时直接读取数据集中需要的列和年份分区，不再重新解析分类数据
+ANALYSIS_DATASET_ENABLED = True
+ANALYSIS_DATASET_DIR = os.path.join(ANALYSIS_DIR, "books_dataset")
+# 增量统计结果（年份×技术标签计数），分类数据更新后只合并有变化的图书
+AGGREGATE_STORE_FILE = os.path.join(ANALYSIS_DIR, "aggregates.db")
+
+# 分析报告和年度趋势图中显示的技术标签数量（按出版数量排名）
+REPORT_TOP_N = 10
+
+# 图表输出配置
+CHART_FORMAT = 'png'  # 'png' 或 'svg'
+CHART_DPI = 300  # 位图分辨率
+CHART_WORKERS = 4  # 绘图进程数，每张图表在独立进程中绘制，设为1则依次绘制
+CHART_SKIP_UNCHANGED = True  # 输入数据和输出设置都未变化的图表不再重新绘制
 
 # 技术标签分类
 TECH_CATEGORIES = [
@@ -33,4 +113,49 @@ TECH_CATEGORIES = [
     "前端开发", "后端开发", "移动开发", "DevOps", "云计算",
     "数据结构", "算法", "系统设计", "网络编程", "安全",
     "其他"
-] 
\ No newline at end of file
+] 
+# 规则预分类配置：书名、标签、分类中出现以下关键词时，置信度足够高的图书直接分配标签，不调用AI服务
+RULE_CLASSIFIER_ENABLED = True
+RULE_MIN_SCORE = 3  # 最高得分标签的最低得分（标签命中3分，书名命中2分，分类命中1分）
+RULE_MIN_CONFIDENCE = 0.75  # 最高得分占全部得分的最低比例
+
+# 技术标签的关键词（标签名本身总会参与匹配，英文关键词不区分大小写且要求完整单词匹配）
+TECH_KEYWORDS = {
+    "JavaScript": ["JS", "Node.js", "NodeJS", "TypeScript", "ECMAScript"],
+    "Python": ["Django", "Flask"],
+    "Java": ["JVM", "Spring Boot", "Spring Cloud"],
+    "C++": ["STL"],
+    "C#": [".NET", "ASP.NET"],
+    "Go": ["Golang", "Go语言"],
+    "Rust": [],
+    "PHP": ["Laravel"],
+    "Ruby": ["Rails"],
+    "Swift": ["SwiftUI"],
+    "AI": ["人工智能", "AIGC"],
+    "机器学习": ["Machine Learning", "scikit-learn"],
+    "深度学习": ["神经网络", "PyTorch", "TensorFlow", "Keras"],
+    "大模型": ["LLM", "ChatGPT", "GPT", "大语言模型", "提示工程"],
+    "自然语言处理": ["NLP"],
+    "计算机视觉": ["OpenCV", "图像识别"],
+    "数据库": ["SQL"],
+    "MySQL": [],
+    "PostgreSQL": ["Postgres"],
+    "MongoDB": [],
+    "Redis": [],
+    "前端开发": ["前端", "CSS", "HTML", "React", "Vue"],
+    "后端开发": ["后端", "微服务"],
+    "移动开发": ["Android", "iOS", "小程序"],
+    "DevOps": ["Docker", "Kubernetes", "K8s", "持续集成", "持续交付"],
+    "云计算": ["云原生", "AWS", "Serverless"],
+    "数据结构": [],
+    "算法": [],
+    "系统设计": ["架构设计", "分布式系统"],
+    "网络编程": ["TCP/IP", "网络协议"],
+    "安全": ["网络安全", "渗透测试", "密码学"],
+}
+
+# 同时命中时只保留更具体的标签（具体标签: 上级标签）
+RULE_PARENT_TAGS = {
+    "MySQL": "数据库", "PostgreSQL": "数据库", "MongoDB": "数据库", "Redis": "数据库",
+    "机器学习": "AI", "深度学习": "AI", "大模型": "AI", "自然语言处理": "AI", "计算机视觉": "AI",
+}
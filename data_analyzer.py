@@ -1,30 +1,49 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import json
+import importlib.util
 import os
-from typing import List, Dict, Any
+import json
+import shutil
+import hashlib
+from itertools import islice
+from typing import Callable, List, Dict, Any, Iterable, Iterator
 from datetime import datetime
 import config
+import storage
+from aggregate_store import AggregateStore
+from analysis_stats import AnalysisStats
+from book_store import BookStore
+
+# 原始图书记录中分析需要的字段，以及分析数据表的列
+SOURCE_COLUMNS = ['name', 'tech_tag', 'publishDate', 'authorNameString', 'isbn']
+ANALYSIS_COLUMNS = ['name', 'tech_tag', 'publish_year', 'author', 'isbn', 'publish_date']
+PREPARE_CHUNK_SIZE = 50000
+# 数据集目录中记录来源文件状态和各年份分区哈希的元数据文件（以下划线开头，读取数据集时会被忽略）
+DATASET_SOURCE_FILE = '_source.json'
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
-plt.rcParams['axes.unicode_minus'] = False
+# pandas读写Parquet数据集需要pyarrow，这里只检查是否安装，不在导入本模块时加载
+if importlib.util.find_spec('pyarrow') is None:
+    print("警告: pyarrow 未安装，分析数据集不可用，每次分析都会重新解析分类数据")
+    pyarrow_available = False
+else:
+    pyarrow_available = True
 
 class DataAnalyzer:
     def __init__(self):
         self.books_data = []
         
-    def load_classified_books(self, filename: str = "classified_books.json") -> List[Dict[str, Any]]:
-        """加载已分类的图书数据"""
-        filepath = os.path.join(config.BOOKS_DIR, filename)
+    def iter_classified_books(self, filename: str = None) -> Iterator[Dict[str, Any]]:
+        """逐条读取已分类的图书数据"""
+        filepath = os.path.join(config.BOOKS_DIR, filename or config.CLASSIFIED_BOOKS_FILE)
         
-        if not os.path.exists(filepath):
+        if not storage.exists(filepath):
             print(f"分类数据文件不存在: {filepath}")
-            return []
+            return iter([])
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return storage.iter_records(filepath)
+    
+    def load_classified_books(self, filename: str = None) -> List[Dict[str, Any]]:
+        """加载已分类的图书数据"""
+        return list(self.iter_classified_books(filename))
     
     def parse_publish_date(self, date_str: str) -> int:
         """解析出版日期，返回年份"""
@@ -40,36 +59,39 @@ class DataAnalyzer:
         except:
             return None
     
-    def prepare_data(self, books: List[Dict[str, Any]]) -> pd.DataFrame:
-        """准备分析数据"""
-        data = []
-        
-        for book in books:
-            # 提取关键信息
-            name = book.get('name', '')
-            tech_tag = book.get('tech_tag', '其他')
-            publish_date = book.get('publishDate', '')
-            author = book.get('authorNameString', '')
-            isbn = book.get('isbn', '')
-            
-            # 跳过"其他"标签的图书
-            if tech_tag == '其他':
-                continue
-            
-            # 解析出版年份
-            year = self.parse_publish_date(publish_date)
-            
-            if year:
-                data.append({
-                    'name': name,
-                    'tech_tag': tech_tag,
-                    'publish_year': year,
-                    'author': author,
-                    'isbn': isbn,
-                    'publish_date': publish_date
-                })
-        
-        return pd.DataFrame(data)
+    def prepare_data(self, books: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+        """准备分析数据（按列批量解析）"""
+        # 分块把原始记录投影成只含所需字段的DataFrame，流式输入时内存占用与块大小相关
+        chunks = []
+        books = iter(books)
+        while True:
+            chunk = list(islice(books, PREPARE_CHUNK_SIZE))
+            if not chunk:
+                break
+            chunks.append(pd.DataFrame(chunk, columns=SOURCE_COLUMNS))
+        
+        if not chunks:
+            return pd.DataFrame(columns=ANALYSIS_COLUMNS)
+        raw = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+        
+        # 一次性解析全部出版日期（只取日期部分），无法解析的为NaT
+        publish_date = raw['publishDate'].fillna('').astype(str)
+        parsed = pd.to_datetime(publish_date.str.split('T', n=1, regex=False).str[0],
+                                format='%Y-%m-%d', errors='coerce')
+        
+        # 跳过"其他"标签、分类失败（tech_tag为空）和没有出版日期的图书
+        tech_tag = raw['tech_tag']
+        mask = tech_tag.notna() & (tech_tag != '') & (tech_tag != '其他') & parsed.notna()
+        
+        df = pd.DataFrame({
+            'name': raw['name'].fillna('')[mask],
+            'tech_tag': tech_tag[mask],
+            'publish_year': parsed[mask].dt.year.astype('int64'),
+            'author': raw['authorNameString'].fillna('')[mask],
+            'isbn': raw['isbn'].fillna('')[mask],
+            'publish_date': publish_date[mask]
+        })
+        return df.reset_index(drop=True)
     
     def analyze_publications_by_year(self, df: pd.DataFrame) -> pd.DataFrame:
         """分析每年各技术标签的出版数量"""
@@ -81,74 +103,25 @@ class DataAnalyzer:
         
         return pivot_table
     
-    def create_visualizations(self, df: pd.DataFrame, pivot_table: pd.DataFrame):
-        """创建可视化图表"""
-        # 确保分析目录存在
-        os.makedirs(config.ANALYSIS_DIR, exist_ok=True)
+    def create_visualizations(self, pivot_table: pd.DataFrame, stats: AnalysisStats = None):
+        """创建可视化图表（全部由年度统计表计算，不需要逐本图书的数据）"""
+        # matplotlib和seaborn导入较慢，只在绘制图表时导入
+        from chart_renderer import render_charts
+        result = render_charts(pivot_table, config.ANALYSIS_DIR,
+                               image_format=config.CHART_FORMAT,
+                               dpi=config.CHART_DPI,
+                               workers=config.CHART_WORKERS,
+                               skip_unchanged=config.CHART_SKIP_UNCHANGED,
+                               stats=stats or AnalysisStats(pivot_table, config.REPORT_TOP_N))
+        if result['skipped']:
+            print(f"图表数据未变化，跳过 {len(result['skipped'])} 张图表: {', '.join(result['skipped'])}")
+        print(f"已生成 {len(result['rendered'])} 张图表")
+    
+    def generate_statistics_report(self, pivot_table: pd.DataFrame, stats: AnalysisStats = None) -> str:
+        """生成统计报告（由年度统计表的汇总统计生成，耗时只与标签和年份数量有关）"""
+        stats = stats or AnalysisStats(pivot_table, config.REPORT_TOP_N)
+        top_counts = stats.tag_counts.head(stats.top_n)
         
-        # 1. 总体技术标签分布饼图
-        plt.figure(figsize=(12, 8))
-        tech_counts = df['tech_tag'].value_counts()
-        plt.pie(tech_counts.values, labels=tech_counts.index, autopct='%1.1f%%')
-        plt.title('图灵图书技术标签分布', fontsize=16, fontweight='bold')
-        plt.axis('equal')
-        plt.savefig(os.path.join(config.ANALYSIS_DIR, 'tech_tag_distribution.png'), 
-                   dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # 2. 每年各技术标签出版数量堆叠柱状图
-        plt.figure(figsize=(16, 10))
-        
-        # 选择出版数量最多的前10个技术标签
-        top_tags = df['tech_tag'].value_counts().head(10).index
-        
-        # 筛选数据
-        filtered_df = df[df['tech_tag'].isin(top_tags)]
-        filtered_pivot = filtered_df.groupby(['publish_year', 'tech_tag']).size().reset_index(name='count')
-        
-        # 创建堆叠柱状图
-        pivot_for_plot = filtered_pivot.pivot(index='publish_year', columns='tech_tag', values='count').fillna(0)
-        
-        ax = pivot_for_plot.plot(kind='bar', stacked=True, figsize=(16, 10))
-        plt.title('图灵图书各技术标签年度出版数量趋势', fontsize=16, fontweight='bold')
-        plt.xlabel('出版年份', fontsize=12)
-        plt.ylabel('图书数量', fontsize=12)
-        plt.legend(title='技术标签', bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(config.ANALYSIS_DIR, 'yearly_tech_tag_trend.png'), 
-                   dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # 3. 热力图
-        plt.figure(figsize=(14, 10))
-        sns.heatmap(pivot_table, annot=True, fmt='.0f', cmap='YlOrRd', 
-                   cbar_kws={'label': '图书数量'})
-        plt.title('图灵图书技术标签年度出版热力图', fontsize=16, fontweight='bold')
-        plt.xlabel('技术标签', fontsize=12)
-        plt.ylabel('出版年份', fontsize=12)
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        plt.savefig(os.path.join(config.ANALYSIS_DIR, 'tech_tag_year_heatmap.png'), 
-                   dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # 4. 年度出版总量趋势
-        plt.figure(figsize=(12, 8))
-        yearly_total = df.groupby('publish_year').size()
-        plt.plot(yearly_total.index, yearly_total.values, marker='o', linewidth=2, markersize=8)
-        plt.title('图灵图书年度出版总量趋势', fontsize=16, fontweight='bold')
-        plt.xlabel('出版年份', fontsize=12)
-        plt.ylabel('图书数量', fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(config.ANALYSIS_DIR, 'yearly_total_publications.png'), 
-                   dpi=300, bbox_inches='tight')
-        plt.close()
-    
-    def generate_statistics_report(self, df: pd.DataFrame, pivot_table: pd.DataFrame) -> str:
-        """生成统计报告"""
         report = []
         report.append("=" * 60)
         report.append("图灵图书数据分析报告")
@@ -158,47 +131,39 @@ class DataAnalyzer:
         # 基本统计信息
         report.append("1. 基本统计信息")
         report.append("-" * 30)
-        report.append(f"总图书数量: {len(df)}")
-        report.append(f"数据年份范围: {df['publish_year'].min()} - {df['publish_year'].max()}")
-        report.append(f"技术标签数量: {df['tech_tag'].nunique()}")
+        report.append(f"总图书数量: {stats.total}")
+        report.append(f"数据年份范围: {stats.yearly_totals.index.min()} - {stats.yearly_totals.index.max()}")
+        report.append(f"技术标签数量: {(stats.tag_counts > 0).sum()}")
         report.append("")
         
         # 技术标签分布
-        report.append("2. 技术标签分布 (前10名)")
+        report.append(f"2. 技术标签分布 (前{stats.top_n}名)")
         report.append("-" * 30)
-        tech_counts = df['tech_tag'].value_counts()
-        for i, (tag, count) in enumerate(tech_counts.head(10).items(), 1):
-            percentage = (count / len(df)) * 100
+        for i, (tag, count) in enumerate(top_counts.items(), 1):
+            percentage = (count / stats.total) * 100
             report.append(f"{i:2d}. {tag:<15} {count:4d} 本 ({percentage:5.1f}%)")
         report.append("")
         
         # 年度趋势
         report.append("3. 年度出版趋势")
         report.append("-" * 30)
-        yearly_total = df.groupby('publish_year').size()
-        for year, count in yearly_total.items():
+        for year, count in stats.yearly_totals.items():
             report.append(f"{year}: {count} 本")
         report.append("")
         
         # 最活跃的技术标签年度
         report.append("4. 各技术标签最活跃年份")
         report.append("-" * 30)
-        for tag in tech_counts.head(10).index:
-            tag_data = df[df['tech_tag'] == tag]
-            if not tag_data.empty:
-                peak_year = tag_data.groupby('publish_year').size().idxmax()
-                peak_count = tag_data.groupby('publish_year').size().max()
-                report.append(f"{tag:<15}: {peak_year}年 ({peak_count} 本)")
+        for tag, count in top_counts.items():
+            if count > 0:
+                report.append(f"{tag:<15}: {stats.peak_years[tag]}年 ({stats.peak_counts[tag]} 本)")
         report.append("")
         
         return "\n".join(report)
     
-    def save_analysis_results(self, df: pd.DataFrame, pivot_table: pd.DataFrame, report: str):
+    def save_analysis_results(self, pivot_table: pd.DataFrame, report: str):
         """保存分析结果"""
-        # 保存数据到CSV
-        df.to_csv(os.path.join(config.ANALYSIS_DIR, 'books_analysis_data.csv'), 
-                 index=False, encoding='utf-8-sig')
-        
+        os.makedirs(config.ANALYSIS_DIR, exist_ok=True)
         pivot_table.to_csv(os.path.join(config.ANALYSIS_DIR, 'yearly_tech_tag_stats.csv'), 
                           encoding='utf-8-sig')
         
@@ -209,33 +174,227 @@ class DataAnalyzer:
         
         print(f"分析结果已保存到: {config.ANALYSIS_DIR}")
     
-    def run_analysis(self, filename: str = "classified_books.json"):
-        """运行完整的数据分析"""
+    def save_analysis_data(self, df: pd.DataFrame, source_path: str = None):
+        """
+        保存分析数据表：CSV表格，以及（安装了pyarrow时）按出版年份分区的Parquet数据集
+        
+        已有数据集时只重写内容有变化的年份分区，少数图书变化时不必重写整个数据集
+        """
+        os.makedirs(config.ANALYSIS_DIR, exist_ok=True)
+        df.to_csv(os.path.join(config.ANALYSIS_DIR, 'books_analysis_data.csv'), 
+                 index=False, encoding='utf-8-sig')
+        
+        if not pyarrow_available or not config.ANALYSIS_DATASET_ENABLED or df.empty:
+            return
+        
+        dataset_dir = config.ANALYSIS_DATASET_DIR
+        year_hashes = self._year_hashes(df)
+        metadata = self._dataset_metadata()
+        previous = metadata.get('years') if metadata else None
+        meta_path = os.path.join(dataset_dir, DATASET_SOURCE_FILE)
+        
+        if previous is None:
+            # 先写入临时目录再替换，避免中断时留下不完整的数据集
+            tmp_dir = dataset_dir + '.tmp'
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            df.to_parquet(tmp_dir, partition_cols=['publish_year'], index=False)
+            self._write_dataset_metadata(os.path.join(tmp_dir, DATASET_SOURCE_FILE), source_path, year_hashes)
+            shutil.rmtree(dataset_dir, ignore_errors=True)
+            os.replace(tmp_dir, dataset_dir)
+            print(f"分析数据集已保存到: {dataset_dir}")
+            return
+        
+        changed = [year for year, digest in year_hashes.items() if previous.get(year) != digest]
+        removed = [year for year in previous if year not in year_hashes]
+        
+        # 更新分区期间删除元数据，中断时数据集不会被当作最新的（下次运行会整体重写）
+        os.remove(meta_path)
+        for year in changed:
+            partition = df[df['publish_year'] == int(year)].drop(columns='publish_year')
+            partition_dir = os.path.join(dataset_dir, f'publish_year={year}')
+            tmp_dir = partition_dir + '.tmp'
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            partition.to_parquet(os.path.join(tmp_dir, 'part-0.parquet'), index=False)
+            shutil.rmtree(partition_dir, ignore_errors=True)
+            os.replace(tmp_dir, partition_dir)
+        for year in removed:
+            shutil.rmtree(os.path.join(dataset_dir, f'publish_year={year}'), ignore_errors=True)
+        self._write_dataset_metadata(meta_path, source_path, year_hashes)
+        print(f"分析数据集已更新 {len(changed) + len(removed)} 个年份分区: {dataset_dir}")
+    
+    @staticmethod
+    def _year_hashes(df: pd.DataFrame) -> Dict[str, str]:
+        """各出版年份数据的内容哈希，用于判断哪些分区需要重写"""
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        return {str(year): hashlib.sha1(row_hashes[rows].tobytes()).hexdigest()
+                for year, rows in df.groupby('publish_year').indices.items()}
+    
+    @staticmethod
+    def _dataset_metadata() -> Dict[str, Any]:
+        """数据集的元数据（来源文件状态和各年份分区哈希），不存在或无法读取时返回None"""
+        try:
+            with open(os.path.join(config.ANALYSIS_DATASET_DIR, DATASET_SOURCE_FILE), encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return metadata if isinstance(metadata, dict) and 'years' in metadata else None
+    
+    @staticmethod
+    def _write_dataset_metadata(path: str, source_path: str, year_hashes: Dict[str, str]):
+        metadata = {'source': storage.file_state(source_path) if source_path else None, 'years': year_hashes}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+    
+    def dataset_is_current(self, source_path: str) -> bool:
+        """分析数据集是否由当前的分类数据文件生成"""
+        if not pyarrow_available or not config.ANALYSIS_DATASET_ENABLED:
+            return False
+        metadata = self._dataset_metadata()
+        return metadata is not None and metadata['source'] == storage.file_state(source_path)
+    
+    def load_dataset(self, columns: List[str] = None, start_year: int = None,
+                     end_year: int = None) -> pd.DataFrame:
+        """
+        从Parquet数据集读取分析数据
+        
+        只读取指定的列，年份条件下推到分区目录，范围之外的年份文件不会被打开
+        """
+        filters = []
+        if start_year is not None:
+            filters.append(('publish_year', '>=', start_year))
+        if end_year is not None:
+            filters.append(('publish_year', '<=', end_year))
+        
+        columns = columns or ANALYSIS_COLUMNS
+        df = pd.read_parquet(config.ANALYSIS_DATASET_DIR, columns=columns, filters=filters or None)
+        # 分区列读回时是分类类型
+        df['publish_year'] = df['publish_year'].astype('int64')
+        return df[columns].reset_index(drop=True)
+    
+    def load_analysis_data(self, filename: str = None, columns: List[str] = None,
+                           start_year: int = None, end_year: int = None) -> pd.DataFrame:
+        """
+        读取分析数据
+        
+        分类数据文件未变化时直接读取分析数据集，否则重新解析分类数据并更新数据集
+        
+        Returns:
+            分析数据表，分类数据文件不存在时返回None
+        """
+        filepath = storage.resolve_path(os.path.join(config.BOOKS_DIR, filename or config.CLASSIFIED_BOOKS_FILE))
+        if not os.path.exists(filepath):
+            return None
+        
+        if self.dataset_is_current(filepath):
+            print(f"分类数据未变化，读取分析数据集: {config.ANALYSIS_DATASET_DIR}")
+            return self.load_dataset(columns, start_year, end_year)
+        
+        df = self.prepare_data(storage.iter_records(filepath))
+        self.save_analysis_data(df, filepath)
+        
+        if start_year is not None:
+            df = df[df['publish_year'] >= start_year]
+        if end_year is not None:
+            df = df[df['publish_year'] <= end_year]
+        return df[columns or ANALYSIS_COLUMNS].reset_index(drop=True)
+    
+    def export_analysis_data(self, filename: str = None):
+        """导出逐本图书的分析数据（CSV表格和Parquet数据集），分类数据未变化时不重写"""
+        filepath = storage.resolve_path(os.path.join(config.BOOKS_DIR, filename or config.CLASSIFIED_BOOKS_FILE))
+        if not os.path.exists(filepath):
+            return
+        if self.dataset_is_current(filepath):
+            print(f"分析数据集已是最新: {config.ANALYSIS_DATASET_DIR}")
+            return
+        self.save_analysis_data(self.prepare_data(storage.iter_records(filepath)), filepath)
+    
+    def update_aggregates(self, source_path: str) -> AggregateStore:
+        """
+        更新增量统计结果
+        
+        分类数据文件未变化时直接使用已保存的统计结果；否则只合并有变化的图书。
+        逐本图书的分析数据表不在这里写入，需要时由load_analysis_data按需导出
+        """
+        store = AggregateStore(config.AGGREGATE_STORE_FILE)
+        source = storage.file_state(source_path)
+        if store.is_current(source):
+            print("分类数据未变化，使用已保存的统计结果")
+            return store
+        
+        changed = store.sync(storage.iter_records(source_path), source)
+        store.save()
+        print(f"统计结果已更新，{changed} 本图书有变化")
+        return store
+    
+    def run_analysis(self, filename: str = None, start_year: int = None, end_year: int = None,
+                     book_filter: Callable[[Dict[str, Any]], bool] = None):
+        """
+        运行完整的数据分析
+        
+        Args:
+            filename: 分类数据文件名，默认为config.CLASSIFIED_BOOKS_FILE
+            start_year: 只分析该年份及之后出版的图书
+            end_year: 只分析该年份及之前出版的图书
+            book_filter: 只分析该函数返回True的图书（不使用也不更新增量统计结果）
+        """
         print("开始数据分析...")
         
-        # 加载数据
-        books = self.load_classified_books(filename)
-        if not books:
+        filepath = storage.resolve_path(os.path.join(config.BOOKS_DIR, filename or config.CLASSIFIED_BOOKS_FILE))
+        if not os.path.exists(filepath):
             print("没有找到分类数据，请先运行数据抓取和分类")
             return
         
-        # 准备数据
-        df = self.prepare_data(books)
-        if df.empty:
+        if book_filter is not None:
+            # 只分析选定的一部分图书，直接对这些图书分组统计
+            df = self.prepare_data(book for book in storage.iter_records(filepath) if book_filter(book))
+            if start_year is not None:
+                df = df[df['publish_year'] >= start_year]
+            if end_year is not None:
+                df = df[df['publish_year'] <= end_year]
+            self.analyze_pivot_table(self.analyze_publications_by_year(df))
+            return
+        
+        if storage.is_sqlite(filepath):
+            # 分类数据保存在SQLite中时，年度统计直接由数据库按索引分组得到
+            self.analyze_pivot_table(self.query_pivot_table(filepath, start_year, end_year))
+            return
+        
+        # 分析数据：年度统计表由增量统计结果得到
+        self.analyze_aggregates(self.update_aggregates(filepath), start_year, end_year)
+    
+    def query_pivot_table(self, db_path: str, start_year: int = None, end_year: int = None) -> pd.DataFrame:
+        """在SQLite图书数据库中分组统计，得到与analyze_publications_by_year相同的年度统计表"""
+        with BookStore(db_path) as store:
+            counts = store.year_tag_counts(start_year, end_year)
+        if not counts:
+            return pd.DataFrame()
+        
+        df = pd.DataFrame(counts, columns=['publish_year', 'tech_tag', 'count'])
+        pivot_table = df.pivot(index='publish_year', columns='tech_tag', values='count').fillna(0).astype('float64')
+        return pivot_table.sort_index()[sorted(pivot_table.columns)]
+    
+    def analyze_aggregates(self, store: AggregateStore, start_year: int = None, end_year: int = None):
+        """由统计结果生成图表和报告并保存"""
+        self.analyze_pivot_table(store.pivot(start_year, end_year))
+    
+    def analyze_pivot_table(self, pivot_table: pd.DataFrame):
+        """由年度统计表生成图表和报告并保存"""
+        if pivot_table.empty:
             print("没有有效的出版日期数据")
             return
         
-        # 分析数据
-        pivot_table = self.analyze_publications_by_year(df)
+        # 汇总统计只计算一次，图表和报告共用
+        stats = AnalysisStats(pivot_table, config.REPORT_TOP_N)
         
         # 生成可视化
-        self.create_visualizations(df, pivot_table)
+        self.create_visualizations(pivot_table, stats)
         
         # 生成报告
-        report = self.generate_statistics_report(df, pivot_table)
+        report = self.generate_statistics_report(pivot_table, stats)
         
         # 保存结果
-        self.save_analysis_results(df, pivot_table, report)
+        self.save_analysis_results(pivot_table, report)
         
         # 打印报告
         print("\n" + report)
@@ -243,5 +402,16 @@ class DataAnalyzer:
         print("数据分析完成！")
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='图灵图书数据分析')
+    parser.add_argument('--start-year', type=int, default=None, help='只分析该年份及之后出版的图书')
+    parser.add_argument('--end-year', type=int, default=None, help='只分析该年份及之前出版的图书')
+    parser.add_argument('--export', action='store_true',
+                        help='同时导出逐本图书的分析数据（CSV表格和Parquet数据集）')
+    args = parser.parse_args()
+    
     analyzer = DataAnalyzer()
-    analyzer.run_analysis() 
\ No newline at end of file
+    analyzer.run_analysis(start_year=args.start_year, end_year=args.end_year)
+    if args.export:
+        analyzer.export_analysis_data()
@@ -1,26 +1,128 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import time
 import os
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from tqdm import tqdm
 import config
+from rate_limiter import TokenBucket
+from checkpoint import CrawlCheckpoint
+from http_cache import HttpCache, CachingAdapter
+from http_transport import adapter_options, connection_stats
+from pipeline_manifest import hash_value
+from metrics import metrics
+from book_record import Book
+import storage
 
 class IturingScraper:
-    def __init__(self):
+    def __init__(self, base_url: str = None, request_rate: float = None, workers: int = None,
+                 use_cache: bool = None, cache_dir: str = None, project_books: bool = None, retries: int = None):
+        """
+        初始化图书抓取器
+        
+        Args:
+            base_url: API基础地址，默认为config.ITURING_BASE_URL（测试时可指向本地模拟服务器）
+            request_rate: 全局请求速率（请求/秒），默认为config.REQUEST_RATE
+            workers: 并发获取图书详情的线程数，默认为config.SCRAPE_WORKERS
+            use_cache: 是否启用磁盘HTTP缓存，默认为config.HTTP_CACHE_ENABLED
+            cache_dir: HTTP缓存目录，默认为config.HTTP_CACHE_DIR
+            project_books: 是否只保留Book记录的字段（内存中为紧凑的Book对象，保存的数据也只含这些字段），
+                默认为config.BOOK_PROJECTION_ENABLED
+            retries: 5xx、429响应和连接错误的最大重试次数，默认为config.HTTP_MAX_RETRIES
+        """
+        base_url = base_url or config.ITURING_BASE_URL
+        self.search_url = f"{base_url}/Search/Advanced"
+        self.book_detail_url = f"{base_url}/Book"
+        self.workers = max(1, workers or config.SCRAPE_WORKERS)
+        self.project_books = config.BOOK_PROJECTION_ENABLED if project_books is None else project_books
+        
+        # 所有请求共享同一个令牌桶，由它决定全局请求速率
+        self.rate_limiter = TokenBucket(request_rate or config.REQUEST_RATE, config.REQUEST_BURST)
+        # 访问网络的请求数（含条件请求和连接失败的请求）和直接由磁盘缓存返回的请求数
+        self.request_count = 0
+        self.cache_hit_count = 0
+        self._count_lock = threading.Lock()
+        self.last_run_stats = {}
+        self.checkpoint = None
+        self.timeout = (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+        
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Content-Type': 'application/json',
-            'Accept': 'application/json'
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
         })
         
+        # 连接池大小与并发数相同，每个线程都能复用已建立的连接；失败的请求按退避策略自动重试
+        # 磁盘缓存挂载在Session之下，命中缓存的请求不访问网络，也不占用限流令牌
+        options = adapter_options(self.workers, retries)
+        self.cache_adapter = None
+        if config.HTTP_CACHE_ENABLED if use_cache is None else use_cache:
+            cache = HttpCache(cache_dir or config.HTTP_CACHE_DIR, config.HTTP_CACHE_TTL, config.HTTP_CACHE_MAX_BYTES)
+            self.cache_adapter = CachingAdapter(cache, rate_limiter=self.rate_limiter, **options)
+            self.adapter = self.cache_adapter
+        else:
+            self.adapter = HTTPAdapter(**options)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        
         # 确保数据目录存在
         os.makedirs(config.BOOKS_DIR, exist_ok=True)
         os.makedirs(config.ANALYSIS_DIR, exist_ok=True)
     
-    def get_book_list(self, page: int = 1, category_id: int = 0, sort: str = "new") -> Dict[str, Any]:
-        """获取图书列表"""
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """经过限流器发送请求（启用缓存时由缓存适配器在访问网络前限流）"""
+        if not self.cache_adapter:
+            self.rate_limiter.acquire()
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._count_request(from_network=True)
+            metrics.increment('http.errors')
+            raise
+        
+        # 直接由缓存返回的响应不计入网络请求和传输字节数，重新验证（304）的计入网络请求
+        from_network = not getattr(response, 'from_cache', False) or getattr(response, 'revalidated', False)
+        self._count_request(from_network)
+        if from_network:
+            metrics.increment('http.requests')
+        if not getattr(response, 'from_cache', False):
+            # 解压后的响应体大小，以及响应体实际在网络上传输的字节数（gzip压缩时更小，不含响应头）
+            body_bytes = len(response.content)
+            metrics.increment('http.body_bytes', body_bytes)
+            metrics.increment('http.bytes_received', self._wire_bytes(response, body_bytes))
+        if response.status_code >= 400:
+            metrics.increment('http.errors')
+        return response
+    
+    @staticmethod
+    def _wire_bytes(response: requests.Response, default: int) -> int:
+        """响应体在网络上传输的字节数，无法获取时返回default"""
+        try:
+            return response.raw.tell()
+        except (AttributeError, OSError):
+            return default
+    
+    def _count_request(self, from_network: bool):
+        with self._count_lock:
+            if from_network:
+                self.request_count += 1
+            else:
+                self.cache_hit_count += 1
+    
+    def _run_counters(self) -> Tuple[int, int]:
+        """本次抓取开始时的请求计数，传给_record_run_stats计算本次的增量"""
+        return self.request_count, self.cache_hit_count
+    
+    @metrics.timed('scraper.get_book_list')
+    def get_book_list(self, page: int = 1, category_id: int = 0, sort: str = "new") -> Optional[Dict[str, Any]]:
+        """获取图书列表，请求失败时返回None"""
         payload = {
             "categoryId": category_id,
             "sort": sort,
@@ -30,82 +132,336 @@ class IturingScraper:
         }
         
         try:
-            response = self.session.post(config.SEARCH_URL, json=payload)
+            response = self._request('POST', self.search_url, json=payload)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
             print(f"获取图书列表失败 (页面 {page}): {e}")
-            return {"bookItems": [], "pagination": {"pageCount": 0}}
+            return None
     
+    @metrics.timed('scraper.get_book_detail')
     def get_book_detail(self, book_id: int) -> Dict[str, Any]:
         """获取单本图书详细信息"""
-        url = f"{config.BOOK_DETAIL_URL}/{book_id}"
+        url = f"{self.book_detail_url}/{book_id}"
         
         try:
-            response = self.session.get(url)
+            response = self._request('GET', url)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
             print(f"获取图书详情失败 (ID: {book_id}): {e}")
             return {}
     
-    def scrape_all_books(self, max_pages: int = None) -> List[Dict[str, Any]]:
-        """抓取所有图书数据"""
+    def _fetch_book(self, page: int, book: Dict[str, Any]) -> Dict[str, Any]:
+        """获取详细信息并与列表中的基础信息合并，失败时返回None"""
+        book_id = book.get("id")
+        
+        # 断点中已有的图书直接复用
+        if self.checkpoint and self.checkpoint.has_book(book_id):
+            return self.as_record(self.checkpoint.books[book_id])
+        
+        print(f"正在获取图书详情: {book.get('name', 'Unknown')} (ID: {book_id})")
+        
+        detail = self.get_book_detail(book_id)
+        if not detail:
+            return None
+        
+        # 合并基础信息和详细信息
+        if self.project_books:
+            book = Book.from_payload(book, detail)
+        else:
+            book.update(detail)
+        
+        # 每获取一本立即写入断点，避免中断后丢失
+        if self.checkpoint:
+            self.checkpoint.record_book(page, book)
+        return book
+    
+    def as_record(self, book: Dict[str, Any]) -> Dict[str, Any]:
+        """启用字段投影时转换为Book记录"""
+        return Book(book) if self.project_books else book
+    
+    def scrape_all_books(self, max_pages: int = None, workers: int = None,
+                         resume: bool = True, on_book: Callable[[Dict[str, Any]], None] = None) -> List[Dict[str, Any]]:
+        """
+        抓取所有图书数据
+        
+        Args:
+            max_pages: 最大抓取页数
+            workers: 并发获取详情的线程数，默认为初始化时的设置
+            resume: 是否从上次中断的断点继续，False则丢弃已有断点重新抓取
+            on_book: 每获取到一本（去重后的）图书时立即调用，供下游阶段边抓取边处理
+        
+        只有页面中所有图书详情都获取成功才记录该页已完成，获取失败的图书和页面保留在断点之外，
+        重新运行时只请求这些图书（已获取的图书从断点复用），可用last_run_complete判断本次是否完整
+        """
         all_books = []
+        seen_ids = set()
+        failed_pages = []
+        failed_books = 0
+        workers = max(1, workers or self.workers)
+        start_time = time.monotonic()
+        start_counts = self._run_counters()
+        
+        def collect(book):
+            # 新书上架会使后续页面整体后移，按ID去重
+            if book["id"] not in seen_ids:
+                seen_ids.add(book["id"])
+                all_books.append(book)
+                if on_book:
+                    on_book(book)
+        
+        self.checkpoint = CrawlCheckpoint(config.CHECKPOINT_FILE)
+        if not resume:
+            self.checkpoint.clear()
+        elif self.checkpoint.books:
+            print(f"发现抓取断点: 已完成 {len(self.checkpoint.pages)} 页，"
+                  f"已获取 {len(self.checkpoint.books)} 本图书，将从断点继续")
         
-        # 获取第一页来确定总页数
+        # 获取第一页来确定总页数，第一页的图书直接复用，不再重复请求
         first_page = self.get_book_list(page=1)
+        if first_page is None:
+            print("无法获取第一页图书列表，抓取中止（断点已保留，可稍后重新运行）")
+            self._record_run_stats(start_time, start_counts, all_books, failed_pages=[1])
+            return all_books
         total_pages = first_page.get("pagination", {}).get("pageCount", 0)
         
         if max_pages:
             total_pages = min(total_pages, max_pages)
         
-        print(f"开始抓取图书数据，总共 {total_pages} 页")
-        
-        for page in tqdm(range(1, total_pages + 1), desc="抓取图书列表"):
-            page_data = self.get_book_list(page=page)
-            book_items = page_data.get("bookItems", [])
-            
-            for book in book_items:
-                book_id = book.get("id")
-                if book_id:
-                    print(f"正在获取图书详情: {book.get('name', 'Unknown')} (ID: {book_id})")
-                    
-                    # 获取详细信息
-                    detail = self.get_book_detail(book_id)
-                    if detail:
-                        # 合并基础信息和详细信息
-                        book.update(detail)
-                        all_books.append(book)
-                    
-                    # 请求间隔
-                    time.sleep(config.REQUEST_DELAY)
-            
-            # 页面间隔
-            time.sleep(config.REQUEST_DELAY)
+        print(f"开始抓取图书数据，总共 {total_pages} 页 (并发数: {workers})")
         
+        # 请求间隔由共享的令牌桶控制，线程池负责让多个请求并行等待响应
+        futures = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                # 第一阶段：并发获取所有未完成的列表页，得到完整的待获取图书列表
+                pages = [page for page in range(1, total_pages + 1) if not self.checkpoint.is_page_done(page)]
+                listings = {1: first_page}
+                rest = [page for page in pages if page != 1]
+                list_futures = [executor.submit(self.get_book_list, page) for page in rest]
+                futures.extend(list_futures)
+                for page, future in zip(rest, tqdm(list_futures, desc="抓取图书列表")):
+                    listings[page] = future.result()
+                
+                # 新书上架会使后续页面整体后移，已排在前面页面的图书不再重复获取详情
+                queued_ids = set()
+                page_items = {}
+                for page in range(1, total_pages + 1):
+                    if self.checkpoint.is_page_done(page):
+                        queued_ids.update(book.get("id") for book in self.checkpoint.page_books(page))
+                        continue
+                    # 请求失败或响应中没有图书列表的页面都不记入断点
+                    book_items = listings[page].get("bookItems") if listings[page] is not None else None
+                    if book_items is None:
+                        print(f"第 {page} 页图书列表获取失败，跳过该页（重新运行时会再次获取）")
+                        failed_pages.append(page)
+                        continue
+                    page_items[page] = []
+                    for book in book_items:
+                        if book.get("id") and book["id"] not in queued_ids:
+                            queued_ids.add(book["id"])
+                            page_items[page].append(book)
+                
+                # 第二阶段：全部图书详情一次性提交给线程池，按页码顺序收集结果，每页完成后记录断点
+                queue = [(page, book) for page, items in page_items.items() for book in items]
+                detail_futures = [executor.submit(self._fetch_book, page, book) for page, book in queue]
+                futures.extend(detail_futures)
+                results = iter(detail_futures)
+                with tqdm(total=len(queue), desc="获取图书详情") as progress:
+                    for page in range(1, total_pages + 1):
+                        if page not in page_items:
+                            for book in self.checkpoint.page_books(page):
+                                collect(self.as_record(book))
+                            continue
+                        
+                        page_ids = []
+                        for _ in page_items[page]:
+                            book = next(results).result()
+                            progress.update()
+                            if book:
+                                page_ids.append(book["id"])
+                                collect(book)
+                            else:
+                                failed_books += 1
+                        
+                        # 有图书获取失败的页面不记录为已完成，重新运行时再次获取
+                        if len(page_ids) == len(page_items[page]):
+                            self.checkpoint.record_page(page, page_ids)
+                        else:
+                            failed_pages.append(page)
+            except BaseException:
+                # 下游处理出错或Ctrl-C中止时取消还未开始的请求，只等待正在进行的请求结束，不必等整个抓取完成
+                for future in futures:
+                    future.cancel()
+                raise
+        
+        self._record_run_stats(start_time, start_counts, all_books, failed_pages, failed_books)
         return all_books
     
-    def save_books_data(self, books: List[Dict[str, Any]], filename: str = "books_data.json"):
-        """保存图书数据到JSON文件"""
-        filepath = os.path.join(config.BOOKS_DIR, filename)
+    def scrape_new_books(self, known_ids, max_pages: int = None, workers: int = None) -> List[Dict[str, Any]]:
+        """
+        增量抓取：按上架时间从新到旧翻页，遇到整页都是已知图书时停止
+        
+        Args:
+            known_ids: 已有图书的ID集合
+            max_pages: 最大翻页数
+            workers: 并发获取详情的线程数，默认为初始化时的设置
+        
+        Returns:
+            仅包含新图书的列表（从新到旧）
+        """
+        new_books = []
+        known_ids = set(known_ids)
+        workers = max(1, workers or self.workers)
+        start_time = time.monotonic()
+        start_counts = self._run_counters()
+        
+        print(f"开始增量抓取，已有 {len(known_ids)} 本图书 (并发数: {workers})")
+        
+        page = 1
+        pages_read = 0
+        failed_pages = []
+        failed_books = 0
+        total_pages = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while total_pages is None or page <= total_pages:
+                page_data = self.get_book_list(page=page)
+                pages_read += 1
+                if page_data is None or "bookItems" not in page_data:
+                    # 无法确定后面是否还有新书，提前结束，重新运行时会再次检查
+                    print(f"第 {page} 页图书列表获取失败，增量抓取提前结束")
+                    failed_pages.append(page)
+                    break
+                if total_pages is None:
+                    total_pages = page_data.get("pagination", {}).get("pageCount", 0)
+                    if max_pages:
+                        total_pages = min(total_pages, max_pages)
+                
+                book_items = [book for book in page_data["bookItems"] if book.get("id")]
+                new_items = [book for book in book_items if book["id"] not in known_ids]
+                
+                # 列表按上架时间排序，整页都是已知图书说明后面不会再有新书
+                if not new_items:
+                    break
+                
+                for book in executor.map(partial(self._fetch_book, page), new_items):
+                    if book:
+                        new_books.append(book)
+                        known_ids.add(book["id"])
+                    else:
+                        failed_books += 1
+                page += 1
+        
+        print(f"增量抓取完成，翻阅 {pages_read} 页，发现 {len(new_books)} 本新书")
+        self._record_run_stats(start_time, start_counts, new_books, failed_pages, failed_books)
+        return new_books
+    
+    def refresh_books(self, book_ids: Iterable[int], workers: int = None) -> List[Dict[str, Any]]:
+        """
+        并发重新获取指定图书的详情
+        
+        Returns:
+            成功获取的图书详情列表，顺序与book_ids一致
+        """
+        book_ids = list(book_ids)
+        workers = max(1, workers or self.workers)
+        start_time = time.monotonic()
+        start_counts = self._run_counters()
+        
+        print(f"重新获取 {len(book_ids)} 本图书的详情 (并发数: {workers})")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            books = [self.as_record(detail) for detail in executor.map(self.get_book_detail, book_ids) if detail]
+        
+        self._record_run_stats(start_time, start_counts, books)
+        return books
+    
+    def catalog_fingerprint(self) -> Optional[str]:
+        """
+        图书目录的指纹：第一页（最新上架的图书）和总页数的哈希
+
+        新书上架或下架都会改变第一页，指纹不变时可以认为目录没有变化；获取失败时返回None
+        """
+        first_page = self.get_book_list(page=1)
+        if not first_page or not first_page.get("bookItems"):
+            return None
+        return hash_value({
+            "bookItems": first_page["bookItems"],
+            "pageCount": first_page.get("pagination", {}).get("pageCount", 0)
+        })
+
+    @property
+    def last_run_complete(self) -> bool:
+        """最近一次抓取是否没有获取失败的页面和图书"""
+        return not self.last_run_stats.get("failed_pages") and not self.last_run_stats.get("failed_books")
+    
+    def _record_run_stats(self, start_time: float, start_counts: Tuple[int, int], books: List[Dict[str, Any]],
+                          failed_pages: List[int] = (), failed_books: int = 0):
+        """记录并打印本次抓取的请求统计（requests只含访问网络的请求，命中磁盘缓存的单独统计）"""
+        elapsed = time.monotonic() - start_time
+        requests_made = self.request_count - start_counts[0]
+        cache_hits = self.cache_hit_count - start_counts[1]
+        self.last_run_stats = {
+            "requests": requests_made,
+            "cache_hits": cache_hits,
+            "books": len(books),
+            "failed_pages": list(failed_pages),
+            "failed_books": failed_books,
+            "elapsed": elapsed,
+            "requests_per_second": requests_made / elapsed if elapsed > 0 else 0.0
+        }
+        print(f"共发送 {requests_made} 个网络请求，耗时 {elapsed:.1f} 秒，"
+              f"平均 {self.last_run_stats['requests_per_second']:.2f} 请求/秒")
+        if cache_hits:
+            print(f"另有 {cache_hits} 个请求直接由HTTP缓存返回")
+        if failed_pages or failed_books:
+            print(f"获取失败: {len(failed_pages)} 页、{failed_books} 本图书，重新运行时会再次获取")
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(books, f, ensure_ascii=False, indent=2)
+        self.last_run_stats["connections"] = connection_stats(self.adapter)
+        for host, stats in self.last_run_stats["connections"].items():
+            print(f"连接复用 {host}: 请求 {stats['requests']} 次，新建连接 {stats['connections']} 个，"
+                  f"复用 {stats['reused']} 次")
+        
+        if self.cache_adapter:
+            cache_stats = self.cache_adapter.stats()
+            self.last_run_stats["cache"] = cache_stats
+            print(f"HTTP缓存: 命中 {cache_stats['hits']}，重新验证 {cache_stats['revalidated']}，"
+                  f"未命中 {cache_stats['misses']}")
+    
+    def clear_checkpoint(self):
+        """数据完整保存后删除抓取断点"""
+        if self.checkpoint:
+            self.checkpoint.clear()
+        elif os.path.exists(config.CHECKPOINT_FILE):
+            os.remove(config.CHECKPOINT_FILE)
+    
+    def save_books_data(self, books: Iterable[Dict[str, Any]], filename: str = None):
+        """保存图书数据（JSONL逐条写入，JSON整体写入，SQLite单个事务分批写入）"""
+        filepath = os.path.join(config.BOOKS_DIR, filename or config.BOOKS_DATA_FILE)
+        count = storage.write_records(filepath, books)
         
         print(f"图书数据已保存到: {filepath}")
-        print(f"总共保存了 {len(books)} 本图书的数据")
+        print(f"总共保存了 {count} 本图书的数据")
     
-    def load_books_data(self, filename: str = "books_data.json") -> List[Dict[str, Any]]:
-        """从JSON文件加载图书数据"""
-        filepath = os.path.join(config.BOOKS_DIR, filename)
+    def append_books_data(self, books: Iterable[Dict[str, Any]], filename: str = None) -> int:
+        """向JSONL数据文件追加图书数据（SQLite数据库中新增或更新）"""
+        filepath = os.path.join(config.BOOKS_DIR, filename or config.BOOKS_DATA_FILE)
+        return storage.append_records(filepath, books)
+    
+    def iter_books_data(self, filename: str = None) -> Iterator[Dict[str, Any]]:
+        """逐条读取图书数据"""
+        filepath = os.path.join(config.BOOKS_DIR, filename or config.BOOKS_DATA_FILE)
         
-        if not os.path.exists(filepath):
+        if not storage.exists(filepath):
             print(f"数据文件不存在: {filepath}")
-            return []
+            return iter([])
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        records = storage.iter_records(filepath)
+        return map(Book, records) if self.project_books else records
+    
+    def load_books_data(self, filename: str = None) -> List[Dict[str, Any]]:
+        """加载全部图书数据"""
+        return list(self.iter_books_data(filename))
 
 if __name__ == "__main__":
     scraper = IturingScraper()
@@ -114,4 +470,6 @@ if __name__ == "__main__":
     books = scraper.scrape_all_books(max_pages=5)  # 可以调整页数
     
     # 保存数据
-    scraper.save_books_data(books) 
\ No newline at end of file
+    scraper.save_books_data(books)
+    if scraper.last_run_complete:
+        scraper.clear_checkpoint() 
\ No newline at end of file
@@ -0,0 +1,219 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from metrics import metrics
+
+# 缓存的响应内容已经解压，这些头部不能原样返回
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+class HttpCache:
+    """
+    磁盘HTTP响应缓存
+
+    以请求方法、URL和请求体的哈希为键，每个条目保存为一个JSON文件。
+    总大小超过上限时按最近使用时间淘汰最旧的条目。
+    """
+
+    def __init__(self, cache_dir: str, ttl: float, max_bytes: int):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            ttl: 缓存有效期（秒），有效期内直接使用缓存，不访问网络
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(os.path.getsize(path) for path in self._entry_paths())
+
+    def _entry_paths(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                yield os.path.join(self.cache_dir, name)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    @staticmethod
+    def key(request: requests.PreparedRequest) -> str:
+        """根据请求方法、URL和请求体生成缓存键"""
+        body = request.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        digest = hashlib.sha256()
+        digest.update(request.method.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(request.url.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(body)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，不存在或已损坏时返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # 更新修改时间，作为LRU淘汰依据
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get('stored_at', 0) < self.ttl
+
+    def set(self, key: str, response: requests.Response):
+        """保存响应到缓存"""
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in _DROPPED_HEADERS}
+        entry = {
+            'status': response.status_code,
+            'url': response.url,
+            'headers': headers,
+            'stored_at': time.time(),
+            'body': base64.b64encode(response.content).decode('ascii')
+        }
+        self._write(key, entry)
+
+    def refresh(self, key: str, entry: Dict[str, Any]):
+        """条件请求返回304后，重置条目的有效期"""
+        entry['stored_at'] = time.time()
+        self._write(key, entry)
+
+    def _write(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - old_size
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按最近使用时间从旧到新删除条目，直到总大小低于上限"""
+        entries = []
+        for path in self._entry_paths():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+
+    @staticmethod
+    def build_response(request: requests.PreparedRequest, entry: Dict[str, Any]) -> requests.Response:
+        """用缓存条目构造响应对象"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = base64.b64decode(entry['body'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = entry.get('url') or request.url
+        response.request = request
+        response.reason = 'OK'
+        response.from_cache = True
+        return response
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    带磁盘缓存的传输适配器，挂载在requests.Session下
+
+    有效期内的请求直接从磁盘返回；过期条目如有ETag/Last-Modified则发送条件请求，
+    服务器返回304时复用缓存内容，否则重新下载。服务器的Cache-Control不影响缓存策略。
+    只有真正访问网络的请求才会经过限流器。
+    """
+
+    def __init__(self, cache: HttpCache, rate_limiter=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, field: str):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+        metrics.increment(f'http_cache.{field}')
+
+    def _send_network(self, request, **kwargs):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        return super().send(request, **kwargs)
+
+    def send(self, request, **kwargs):
+        if request.method not in ('GET', 'POST'):
+            return self._send_network(request, **kwargs)
+
+        key = self.cache.key(request)
+        entry = self.cache.get(key)
+
+        if entry and self.cache.is_fresh(entry):
+            self._count('hits')
+            return self.cache.build_response(request, entry)
+
+        # 过期条目尝试条件请求
+        if entry:
+            etag = entry['headers'].get('ETag') or entry['headers'].get('etag')
+            last_modified = entry['headers'].get('Last-Modified') or entry['headers'].get('last-modified')
+            if etag:
+                request.headers['If-None-Match'] = etag
+            if last_modified:
+                request.headers['If-Modified-Since'] = last_modified
+
+        response = self._send_network(request, **kwargs)
+
+        if response.status_code == 304 and entry:
+            self._count('revalidated')
+            self.cache.refresh(key, entry)
+            cached = self.cache.build_response(request, entry)
+            # 条件请求访问了网络，只是没有重新下载内容
+            cached.revalidated = True
+            return cached
+
+        self._count('misses')
+        if response.status_code == 200:
+            self.cache.set(key, response)
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses}
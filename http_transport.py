@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓取器的HTTP传输层配置
+连接池大小与并发数匹配（并发请求不会因连接池已满而反复新建、丢弃连接），
+5xx和429响应以及连接、读取错误按指数退避自动重试（遵守Retry-After），
+并按主机统计连接复用情况
+"""
+
+from typing import Dict
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+from metrics import metrics
+
+# 图书列表接口虽然是POST，但只是查询，重试是安全的
+RETRY_METHODS = frozenset({'GET', 'POST'})
+
+
+class CountingRetry(Retry):
+    """每次重试计入 http.retries 指标"""
+
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)
+        metrics.increment('http.retries')
+        return retry
+
+
+def build_retry(retries: int = None, backoff: float = None) -> Retry:
+    """
+    重试策略
+
+    Args:
+        retries: 最大重试次数，默认为config.HTTP_MAX_RETRIES
+        backoff: 退避基数（秒），第n次重试前等待 基数*2^(n-1) 秒，默认为config.HTTP_RETRY_BACKOFF
+    """
+    return CountingRetry(
+        total=config.HTTP_MAX_RETRIES if retries is None else retries,
+        backoff_factor=config.HTTP_RETRY_BACKOFF if backoff is None else backoff,
+        status_forcelist=config.HTTP_RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        # 重试后仍然失败时返回最后一次的响应，由调用方按状态码处理
+        raise_on_status=False
+    )
+
+
+def adapter_options(pool_size: int, retries: int = None) -> Dict:
+    """HTTPAdapter（及其子类CachingAdapter）的连接池和重试参数"""
+    return {
+        'pool_connections': config.HTTP_POOL_CONNECTIONS,
+        'pool_maxsize': max(pool_size, 1),
+        'max_retries': build_retry(retries)
+    }
+
+
+def connection_stats(adapter: HTTPAdapter) -> Dict[str, Dict[str, int]]:
+    """
+    各主机的请求数、新建连接数和复用连接的请求数（适配器创建以来的累计值）
+
+    keep-alive正常时新建连接数接近并发数，远小于请求数
+    """
+    stats = {}
+    pools = adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        host = f"{pool.scheme}://{pool.host}:{pool.port}"
+        entry = stats.setdefault(host, {'requests': 0, 'connections': 0, 'reused': 0})
+        entry['requests'] += pool.num_requests
+        entry['connections'] += pool.num_connections
+        entry['reused'] += max(pool.num_requests - pool.num_connections, 0)
+    return stats
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线图书分类器
+用已由AI服务分类的图书训练：字符n-gram哈希特征 + TF-IDF加权 + 最近质心线性模型，
+全部计算用NumPy向量化完成，不需要调用任何API
+"""
+
+import argparse
+import os
+import time
+from typing import List, Sequence
+
+import numpy as np
+import config
+import storage
+
+_PRIME = np.uint64(1000003)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_SALT = np.uint64(0x5BD1E995)
+
+
+class LocalClassifier:
+    def __init__(self, n_features: int = None, ngram_range=(1, 3)):
+        """
+        初始化离线分类器
+
+        Args:
+            n_features: 哈希特征维度（2的幂），默认为config.LOCAL_MODEL_FEATURES
+            ngram_range: 字符n-gram的长度范围
+        """
+        self.n_features = n_features or config.LOCAL_MODEL_FEATURES
+        if self.n_features & (self.n_features - 1):
+            raise ValueError(f"特征维度必须是2的幂: {self.n_features}")
+
+        self.ngram_range = tuple(ngram_range)
+        self.labels: List[str] = []
+        self.idf = None
+        self.centroids = None
+
+    def _hash_counts(self, texts: Sequence[str]):
+        """
+        一次性计算全部文本的n-gram哈希计数
+
+        所有文本以\\0连接成一个码点数组，对每种n-gram长度整体做滚动哈希，
+        丢弃跨越文本边界的n-gram，最后按 (文本序号, 特征) 聚合计数
+
+        Returns:
+            (rows, cols, counts)，按文本序号排序的稀疏矩阵坐标
+        """
+        joined = '\0'.join(text.lower().replace('\0', ' ') for text in texts) + '\0'
+        codepoints = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        is_sep = codepoints == 0
+        doc_ids = (np.cumsum(is_sep) - is_sep).astype(np.uint64)
+        sep_prefix = np.concatenate(([0], np.cumsum(is_sep)))
+        shift = np.uint64(64 - int(np.log2(self.n_features)))
+
+        keys = []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            m = len(codepoints) - n + 1
+            if m <= 0:
+                continue
+            hashes = np.zeros(m, dtype=np.uint64)
+            for k in range(n):
+                hashes = hashes * _PRIME + codepoints[k:k + m]
+
+            # 窗口内不含分隔符的n-gram才有效
+            valid = sep_prefix[n:n + m] == sep_prefix[:m]
+            features = ((hashes[valid] ^ (_SALT * np.uint64(n))) * _MIX) >> shift
+            keys.append(doc_ids[:m][valid] * np.uint64(self.n_features) + features)
+
+        if not keys:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([], dtype=np.float32)
+
+        unique_keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+        rows = (unique_keys // np.uint64(self.n_features)).astype(np.int64)
+        cols = (unique_keys % np.uint64(self.n_features)).astype(np.int64)
+        return rows, cols, counts.astype(np.float32)
+
+    def _tfidf(self, texts: Sequence[str]):
+        """返回L2归一化后的TF-IDF稀疏矩阵坐标 (rows, cols, values)"""
+        rows, cols, counts = self._hash_counts(texts)
+        values = (1 + np.log(counts)) * self.idf[cols]
+
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(texts)))
+        norms[norms == 0] = 1
+        return rows, cols, (values / norms[rows]).astype(np.float32)
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str]) -> 'LocalClassifier':
+        """用已分类图书的文本和标签训练模型"""
+        if not texts:
+            raise ValueError("没有可用于训练的已分类图书")
+
+        self.labels = sorted(set(labels))
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        y = np.array([label_index[label] for label in labels], dtype=np.int64)
+
+        # 文档频率：每个特征出现在多少本书中
+        rows, cols, _ = self._hash_counts(texts)
+        df = np.bincount(cols, minlength=self.n_features)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+
+        # 每个标签的质心 = 该标签下所有图书向量之和，再做L2归一化
+        rows, cols, values = self._tfidf(texts)
+        centroids = np.bincount(y[rows] * self.n_features + cols, weights=values,
+                                minlength=len(self.labels) * self.n_features)
+        centroids = centroids.reshape(len(self.labels), self.n_features)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.centroids = (centroids / norms).astype(np.float32)
+        return self
+
+    def predict(self, texts: Sequence[str]) -> List[str]:
+        """批量预测技术标签"""
+        if self.centroids is None:
+            raise ValueError("模型尚未训练")
+        if not texts:
+            return []
+
+        rows, cols, values = self._tfidf(texts)
+
+        # 稀疏向量与各标签质心的余弦相似度
+        scores = np.empty((len(texts), len(self.labels)), dtype=np.float32)
+        for i, centroid in enumerate(self.centroids):
+            scores[:, i] = np.bincount(rows, weights=values * centroid[cols], minlength=len(texts))
+
+        return [self.labels[i] for i in scores.argmax(axis=1)]
+
+    def save(self, filepath: str):
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        np.savez_compressed(filepath, labels=np.array(self.labels), idf=self.idf, centroids=self.centroids,
+                            n_features=self.n_features, ngram_range=np.array(self.ngram_range))
+
+    @classmethod
+    def load(cls, filepath: str) -> 'LocalClassifier':
+        with np.load(filepath) as data:
+            model = cls(n_features=int(data['n_features']), ngram_range=tuple(int(n) for n in data['ngram_range']))
+            model.labels = [str(label) for label in data['labels']]
+            model.idf = data['idf']
+            model.centroids = data['centroids']
+        return model
+
+
+def load_training_data(filepath: str = None):
+    """
+    从已分类的图书数据中读取训练样本
+
+    只使用AI服务（及规则）给出的标签，跳过分类失败和本地模型自己预测的图书
+    """
+    from book_classifier import build_classification_text
+
+    filepath = filepath or os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE)
+    texts, labels = [], []
+    for book in storage.iter_records(filepath):
+        if not book.get('tech_tag') or book.get('classify_source') == 'local':
+            continue
+        texts.append(build_classification_text(book))
+        labels.append(book['tech_tag'])
+    return texts, labels
+
+
+def train_and_save(filepath: str = None, model_path: str = None) -> LocalClassifier:
+    """用已分类的图书训练模型并保存到磁盘"""
+    texts, labels = load_training_data(filepath)
+    model = LocalClassifier().fit(texts, labels)
+    model.save(model_path or config.LOCAL_MODEL_FILE)
+    print(f"离线分类模型已用 {len(texts)} 本图书训练，保存到: {model_path or config.LOCAL_MODEL_FILE}")
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='训练离线图书分类模型')
+    parser.add_argument('--data', default=None, help='已分类的图书数据文件（默认使用config中的路径）')
+    parser.add_argument('--holdout', type=float, default=0.2, help='用于评估准确率的样本比例')
+    args = parser.parse_args()
+
+    texts, labels = load_training_data(args.data)
+    if not texts:
+        print("没有可用于训练的已分类图书，请先运行AI分类")
+    else:
+        # 留出一部分样本评估准确率和速度
+        order = np.random.default_rng(0).permutation(len(texts))
+        split = int(len(texts) * (1 - args.holdout))
+        train_idx, test_idx = order[:split], order[split:]
+        if len(test_idx):
+            model = LocalClassifier().fit([texts[i] for i in train_idx], [labels[i] for i in train_idx])
+            start = time.perf_counter()
+            predicted = model.predict([texts[i] for i in test_idx])
+            elapsed = time.perf_counter() - start
+            accuracy = np.mean([p == labels[i] for p, i in zip(predicted, test_idx)])
+            print(f"留出集准确率: {accuracy:.1%} ({len(test_idx)} 本，{len(test_idx) / elapsed:.0f} 本/秒)")
+
+        train_and_save(args.data)
@@ -8,11 +8,17 @@
 import os
 import sys
 import argparse
-from data_scraper import IturingScraper
-from book_classifier import BookClassifier
-from data_analyzer import DataAnalyzer
+from contextlib import contextmanager
+from datetime import date, datetime
+from pipeline_manifest import PipelineManifest, hash_file, hash_value
+from aggregate_store import AggregateStore
+from metrics import metrics
+import storage
 import config
 
+# 各阶段的模块（requests、AI服务SDK、pandas、matplotlib等）导入较慢，
+# 在阶段函数中按需导入，只运行部分阶段（例如定时的增量抓取）时不必加载其他阶段的依赖
+
 def setup_environment():
     """设置运行环境"""
     print("正在设置运行环境...")
@@ -24,20 +30,139 @@ def setup_environment():
     
     print("环境设置完成！")
 
-def scrape_data(max_pages=None):
-    """抓取图书数据"""
+def _books_data_path():
+    return storage.resolve_path(os.path.join(config.BOOKS_DIR, config.BOOKS_DATA_FILE))
+
+def _classified_books_path():
+    return storage.resolve_path(os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE))
+
+# 已有数据时的处理策略（命令行 --reuse / --refresh / --incremental），为None时交互询问
+POLICY_REUSE = 'reuse'
+POLICY_REFRESH = 'refresh'
+POLICY_INCREMENTAL = 'incremental'
+
+class BookSelection:
+    """--ids / --since 选定的一部分图书：ID在列表中，或出版日期不早于since"""
+    
+    def __init__(self, ids=None, since=None):
+        self.ids = set(ids or [])
+        self.since = since
+    
+    def __bool__(self):
+        return bool(self.ids) or self.since is not None
+    
+    def __str__(self):
+        parts = []
+        if self.ids:
+            parts.append(f"ID {', '.join(str(book_id) for book_id in sorted(self.ids))}")
+        if self.since is not None:
+            parts.append(f"{self.since.isoformat()} 及之后出版")
+        return " 或 ".join(parts)
+    
+    def matches(self, book):
+        if book.get("id") in self.ids:
+            return True
+        if self.since is None:
+            return False
+        try:
+            published = datetime.strptime((book.get("publishDate") or "").split('T')[0], '%Y-%m-%d').date()
+        except ValueError:
+            return False
+        return published >= self.since
+
+def _confirm(question):
+    """交互确认；标准输入不是终端（定时任务、脚本）时不等待输入，按"否"处理"""
+    if not sys.stdin.isatty():
+        print(f"{question} 非交互模式，保留现有数据（可用 --refresh 重新执行）")
+        return False
+    return input(f"{question}(y/N): ").strip().lower() == 'y'
+
+def _record_stage(manifest, stage, inputs, outputs):
+    """阶段成功完成后记录输入和输出哈希"""
+    if manifest is not None and inputs is not None:
+        manifest.record(stage, inputs, outputs)
+
+def _scrape_selection(scraper, existing_data, selection, workers=None):
+    """只重新获取选定图书的详情，合并进已有数据"""
+    existing_ids = {book.get("id") for book in existing_data}
+    book_ids = [book["id"] for book in existing_data if selection.matches(book)]
+    book_ids += sorted(book_id for book_id in selection.ids if book_id not in existing_ids)
+    if not book_ids:
+        print(f"没有符合条件的图书: {selection}")
+        return existing_data
+    
+    refreshed = {book["id"]: book for book in scraper.refresh_books(book_ids, workers)}
+    books = [book for book_id, book in refreshed.items() if book_id not in existing_ids]
+    books += [scraper.as_record(dict(book, **refreshed[book["id"]])) if book.get("id") in refreshed else book
+              for book in existing_data]
+    scraper.save_books_data(books)
+    print(f"重新获取了 {len(refreshed)} 本图书 ({selection})，共 {len(books)} 本")
+    return books
+
+@metrics.timed('stage.scrape')
+def scrape_data(max_pages=None, delta=False, manifest=None, policy=None, workers=None, selection=None):
+    """
+    抓取图书数据
+    
+    Args:
+        max_pages: 最大抓取页数
+        delta: 增量抓取，只获取已有数据之后新上架的图书
+        manifest: 流水线清单，目录未变化时跳过抓取
+        policy: 已有数据时的处理策略，None时交互询问
+        workers: 并发获取详情的线程数
+        selection: 只重新获取选定的图书
+    """
     print("=" * 60)
     print("开始抓取图灵图书数据...")
     print("=" * 60)
     
-    scraper = IturingScraper()
+    from data_scraper import IturingScraper
+    scraper = IturingScraper(workers=workers)
     
     # 检查是否已有数据
     existing_data = scraper.load_books_data()
-    if existing_data:
+    
+    if selection:
+        return _scrape_selection(scraper, existing_data, selection, workers)
+    
+    if existing_data and policy == POLICY_REUSE:
+        print(f"使用现有数据继续，包含 {len(existing_data)} 本图书")
+        return existing_data
+    
+    # 图书目录第一页未变化时跳过抓取
+    inputs = None
+    if manifest is not None:
+        fingerprint = scraper.catalog_fingerprint()
+        if fingerprint:
+            inputs = {'catalog': fingerprint, 'max_pages': hash_value(max_pages)}
+            if manifest.is_current('scrape', inputs):
+                print("图书目录未变化，跳过数据抓取")
+                return existing_data
+    
+    # 增量模式：只抓取已有数据之后新上架的图书
+    if (delta or policy == POLICY_INCREMENTAL) and existing_data:
+        print(f"增量模式: 已有 {len(existing_data)} 本图书")
+        new_books = scraper.scrape_new_books({book.get("id") for book in existing_data}, max_pages=max_pages)
+        # 有获取失败的页面或图书时不记录阶段完成，下次运行会再次检查
+        if scraper.last_run_complete:
+            recorded_inputs = inputs
+        else:
+            recorded_inputs = None
+            print("部分数据获取失败，抓取阶段未标记为完成")
+        if not new_books:
+            print("没有发现新图书，使用现有数据继续...")
+            _record_stage(manifest, 'scrape', recorded_inputs, [_books_data_path()])
+            return existing_data
+        
+        books = new_books + existing_data
+        scraper.save_books_data(books)
+        _record_stage(manifest, 'scrape', recorded_inputs, [_books_data_path()])
+        print(f"新增 {len(new_books)} 本图书，共 {len(books)} 本")
+        return books
+    
+    if existing_data and policy != POLICY_REFRESH:
         print(f"发现已有数据文件，包含 {len(existing_data)} 本图书")
-        choice = input("是否重新抓取数据？(y/N): ").strip().lower()
-        if choice != 'y':
+        if not _confirm("是否重新抓取数据？"):
             print("使用现有数据继续...")
             return existing_data
     
@@ -46,26 +171,83 @@ def scrape_data(max_pages=None):
     
     if books:
         scraper.save_books_data(books)
+        # 有获取失败的图书时保留断点且不记录阶段完成，重新运行时只请求失败的页面和图书
+        if scraper.last_run_complete:
+            scraper.clear_checkpoint()
+            _record_stage(manifest, 'scrape', inputs, [_books_data_path()])
+        else:
+            print(f"部分数据获取失败，抓取阶段未标记为完成，已保留抓取断点: {config.CHECKPOINT_FILE}")
         print(f"成功抓取 {len(books)} 本图书的数据")
         return books
     else:
         print("没有抓取到任何数据")
         return []
 
-def classify_books(books, ai_service=None):
-    """为图书分配技术标签"""
+def classification_inputs(ai_service=None):
+    """分类阶段的输入：图书数据、AI服务及模型、技术标签和规则配置"""
+    ai_service = ai_service or config.DEFAULT_AI_SERVICE
+    models = {
+        'openai': config.OPENAI_MODEL,
+        'gemini': config.GEMINI_MODEL,
+        'local': hash_file(config.LOCAL_MODEL_FILE)
+    }
+    return {
+        'books': hash_file(_books_data_path()),
+        'model': hash_value([ai_service, models.get(ai_service)]),
+        'categories': hash_value([config.TECH_CATEGORIES, config.RULE_CLASSIFIER_ENABLED, config.TECH_KEYWORDS,
+                                  config.RULE_PARENT_TAGS, config.RULE_MIN_SCORE, config.RULE_MIN_CONFIDENCE])
+    }
+
+@metrics.timed('stage.classify')
+def classify_books(books, ai_service=None, manifest=None, policy=None, workers=None, selection=None):
+    """
+    为图书分配技术标签
+    
+    Args:
+        books: 图书列表
+        ai_service: AI服务
+        manifest: 流水线清单，图书数据和分类配置未变化时跳过分类
+        policy: 已有分类数据时的处理策略，None时交互询问；
+            incremental只分类新图书和上次分类失败的图书
+        workers: 并发分类请求数
+        selection: 只重新分类选定的图书（以及还没有分类结果的图书）
+    """
     print("=" * 60)
     print("开始为图书分配技术标签...")
     print("=" * 60)
     
-    classifier = BookClassifier(ai_service=ai_service)
+    # 图书数据和分类配置都未变化时跳过分类（incremental总是检查并重试分类失败的图书）
+    inputs = classification_inputs(ai_service) if manifest is not None else None
+    if (not selection and policy != POLICY_INCREMENTAL and inputs is not None
+            and manifest.is_current('classify', inputs)):
+        print("图书数据和分类配置未变化，跳过分类")
+        return list(storage.iter_records(_classified_books_path()))
+    
+    from book_classifier import BookClassifier
+    classifier = BookClassifier(ai_service=ai_service, workers=workers)
+    # 离线模型首次使用时才训练并保存，按训练后的模型文件记录输入，下次运行不会因此重新分类
+    if inputs is not None and classifier.ai_service == 'local':
+        inputs = classification_inputs(ai_service)
     
     # 检查是否已有分类数据
     existing_classified = classifier.load_classified_books()
-    if existing_classified:
+    existing_by_id = {book.get("id"): book for book in existing_classified}
+    to_classify = books
+    if existing_classified and selection:
+        to_classify = [book for book in books if selection.matches(book) or book.get("id") not in existing_by_id]
+        print(f"只分类选定的图书 ({selection}) 和尚未分类的图书，共 {len(to_classify)} 本")
+    elif existing_classified and policy == POLICY_INCREMENTAL:
+        to_classify = [book for book in books
+                       if not existing_by_id.get(book.get("id"), {}).get("tech_tag")]
+        print(f"增量分类: 已有 {len(existing_classified)} 本分类结果，需要分类 {len(to_classify)} 本")
+    elif existing_classified and policy == POLICY_REUSE:
+        print(f"使用现有分类数据继续，包含 {len(existing_classified)} 本图书")
+        return existing_classified
+    elif existing_classified and policy != POLICY_REFRESH:
         print(f"发现已有分类数据，包含 {len(existing_classified)} 本图书")
-        choice = input("是否重新分类？(y/N): ").strip().lower()
-        if choice != 'y':
+        if classifier.cache is not None:
+            print(f"分类缓存中已有 {len(classifier.cache)} 条结果，重新分类时内容未变化的图书不会再调用API")
+        if not _confirm("是否重新分类？"):
             print("使用现有分类数据继续...")
             return existing_classified
     
@@ -73,48 +255,129 @@ def classify_books(books, ai_service=None):
         print("没有图书数据可供分类")
         return []
     
-    # 为图书分配技术标签
-    classified_books = classifier.classify_books_batch(books)
+    # 为图书分配技术标签，只分类一部分时与已有分类结果合并（按图书数据的顺序）
+    classified = {book.get("id"): book for book in classifier.classify_books_batch(to_classify)} if to_classify else {}
+    classified_books = [classified.get(book.get("id")) or existing_by_id.get(book.get("id")) for book in books]
+    classified_books = [book for book in classified_books if book is not None]
     
     if classified_books:
+        previous_source = storage.file_state(_classified_books_path()) if existing_classified else None
         classifier.save_classified_books(classified_books)
-        print(f"成功为 {len(classified_books)} 本图书分配了技术标签")
+        if to_classify is not books:
+            kept = {book.get("id") for book in classified_books}
+            _merge_aggregates(previous_source, classified.values(),
+                              [book for book in existing_classified if book.get("id") not in kept])
+        # 还有分类失败的图书时不记录阶段完成，下次运行不会跳过分类
+        failed = sum(1 for book in classified_books if not book.get('tech_tag') or book.get('classify_error'))
+        if failed:
+            print(f"{failed} 本图书没有分类结果，分类阶段未标记为完成（可用 --incremental 只重新分类这些图书）")
+        else:
+            _record_stage(manifest, 'classify', inputs, [_classified_books_path()])
+        print(f"成功为 {len(classified)} 本图书分配了技术标签，共 {len(classified_books)} 本")
         return classified_books
     else:
         print("分类过程中出现问题")
         return []
 
-def analyze_data():
-    """分析数据并生成报告"""
+def _merge_aggregates(previous_source, changed, removed):
+    """
+    只有部分图书重新分类时，把这些图书合并进增量统计结果
+    
+    统计结果由保存前的分类数据生成时才合并，并记录新的分类数据文件状态，分析时不必再读取全部分类数据；
+    否则保持不变，分析时再与完整的分类数据同步
+    """
+    with AggregateStore(config.AGGREGATE_STORE_FILE) as store:
+        if not store.is_current(previous_source):
+            return
+        count = store.merge(changed) + store.remove(removed)
+        store.source = storage.file_state(_classified_books_path())
+        store.save()
+    print(f"统计结果已合并 {count} 本有变化的图书")
+
+def analysis_inputs(start_year=None, end_year=None):
+    """分析阶段的输入：分类数据文件、年份范围，以及影响报告和图表内容的设置"""
+    return {
+        'classified': hash_file(_classified_books_path()),
+        'options': hash_value([start_year, end_year, config.REPORT_TOP_N, config.CHART_FORMAT, config.CHART_DPI])
+    }
+
+def analysis_outputs():
+    """分析阶段生成的文件"""
+    outputs = [os.path.join(config.ANALYSIS_DIR, name)
+               for name in ('yearly_tech_tag_stats.csv', 'analysis_report.txt')]
+    from chart_renderer import CHARTS
+    outputs += [os.path.join(config.ANALYSIS_DIR, f"{name}.{config.CHART_FORMAT}") for name in CHARTS]
+    return [path for path in outputs if os.path.exists(path)]
+
+@metrics.timed('stage.analyze')
+def analyze_data(start_year=None, end_year=None, manifest=None, selection=None):
+    """分析数据并生成报告，指定selection时只分析选定的图书"""
     print("=" * 60)
     print("开始数据分析...")
     print("=" * 60)
     
+    from data_analyzer import DataAnalyzer
+    if selection:
+        print(f"只分析选定的图书: {selection}")
+        DataAnalyzer().run_analysis(start_year=start_year, end_year=end_year, book_filter=selection.matches)
+        return
+    
+    # 分类数据和分析参数都未变化时跳过分析
+    inputs = None
+    if manifest is not None:
+        inputs = analysis_inputs(start_year, end_year)
+        if manifest.is_current('analyze', inputs):
+            print(f"分类数据和分析参数未变化，跳过分析，结果见: {config.ANALYSIS_DIR}")
+            return
+    
     analyzer = DataAnalyzer()
-    analyzer.run_analysis()
+    analyzer.run_analysis(start_year=start_year, end_year=end_year)
+    if inputs is not None and inputs['classified']:
+        _record_stage(manifest, 'analyze', inputs, analysis_outputs())
 
-def run_full_pipeline(max_pages=None, ai_service=None):
+def run_full_pipeline(max_pages=None, ai_service=None, delta=False, start_year=None, end_year=None,
+                      force=False, policy=None, workers=None, selection=None):
     """运行完整的数据处理流程"""
     print("图灵图书数据抓取与分析系统")
     print("=" * 60)
     
     # 设置环境
     setup_environment()
+    manifest = PipelineManifest(config.PIPELINE_MANIFEST_FILE, force=force or policy == POLICY_REFRESH)
     
     # 1. 抓取数据
-    books = scrape_data(max_pages)
+    books = scrape_data(max_pages, delta, manifest, policy, workers, selection)
     if not books:
         print("数据抓取失败，程序退出")
         return
     
     # 2. 分类图书
-    classified_books = classify_books(books, ai_service)
+    classified_books = classify_books(books, ai_service, manifest, policy, workers, selection)
     if not classified_books:
         print("图书分类失败，程序退出")
         return
     
     # 3. 分析数据
-    analyze_data()
+    analyze_data(start_year, end_year, manifest, selection)
+    
+    print("=" * 60)
+    print("所有任务完成！")
+    print(f"数据文件保存在: {config.BOOKS_DIR}")
+    print(f"分析结果保存在: {config.ANALYSIS_DIR}")
+    print("=" * 60)
+
+def run_streaming_pipeline(max_pages=None, ai_service=None, start_year=None, end_year=None, workers=None):
+    """运行流式处理流程：抓取、分类、统计同时进行"""
+    print("图灵图书数据抓取与分析系统（流式处理）")
+    print("=" * 60)
+    
+    setup_environment()
+    from data_scraper import IturingScraper
+    from book_classifier import BookClassifier
+    from pipeline import StreamingPipeline
+    pipeline = StreamingPipeline(scraper=IturingScraper(workers=workers),
+                                 classifier=BookClassifier(ai_service=ai_service, workers=workers))
+    pipeline.run(max_pages=max_pages, start_year=start_year, end_year=end_year)
     
     print("=" * 60)
     print("所有任务完成！")
@@ -122,12 +385,69 @@ def run_full_pipeline(max_pages=None, ai_service=None):
     print(f"分析结果保存在: {config.ANALYSIS_DIR}")
     print("=" * 60)
 
+@contextmanager
+def profiling(profiler=None):
+    """
+    在性能分析器下运行with语句块
+    
+    Args:
+        profiler: 'cprofile'（结果保存到config.PROFILE_FILE并打印耗时最多的函数）、
+            'pyinstrument'（需要安装pyinstrument，结果保存为同名的.html文件），None时不分析
+    """
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("警告: pyinstrument 未安装，改用 cProfile")
+            profiler = 'cprofile'
+        else:
+            instrument = Profiler()
+            instrument.start()
+            try:
+                yield
+            finally:
+                instrument.stop()
+                html_path = os.path.splitext(config.PROFILE_FILE)[0] + '.html'
+                os.makedirs(os.path.dirname(html_path) or '.', exist_ok=True)
+                with open(html_path, 'w', encoding='utf-8') as f:
+                    f.write(instrument.output_html())
+                print(instrument.output_text(unicode=True))
+                print(f"性能分析结果已保存到: {html_path}")
+            return
+    
+    if profiler != 'cprofile':
+        yield
+        return
+    
+    import cProfile
+    import pstats
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        os.makedirs(os.path.dirname(config.PROFILE_FILE) or '.', exist_ok=True)
+        profile.dump_stats(config.PROFILE_FILE)
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
+        print(f"性能分析结果已保存到: {config.PROFILE_FILE}（可用 python -m pstats 或 snakeviz 查看）")
+
+def write_metrics():
+    """写入本次运行的指标并打印耗时分布"""
+    if not metrics.timings and not metrics.counters:
+        return
+    metrics.write(config.METRICS_FILE)
+    print("=" * 60)
+    print("运行指标（耗时分布）")
+    print(metrics.format_summary())
+    print(f"运行指标已保存到: {config.METRICS_FILE}")
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='图灵图书数据抓取与分析系统')
     parser.add_argument('--max-pages', type=int, default=None, 
                        help='最大抓取页数（默认抓取所有页面）')
-    parser.add_argument('--ai-service', choices=['openai', 'gemini'], 
+    parser.add_argument('--ai-service', choices=['openai', 'gemini', 'local', 'mock'], 
                        default=config.DEFAULT_AI_SERVICE,
                        help=f'选择AI服务 (默认: {config.DEFAULT_AI_SERVICE})')
     parser.add_argument('--scrape-only', action='store_true',
@@ -136,30 +456,70 @@ def main():
                        help='仅进行分类，不进行数据抓取')
     parser.add_argument('--analyze-only', action='store_true',
                        help='仅进行分析，不进行数据抓取和分类')
+    parser.add_argument('--delta', action='store_true',
+                       help='增量抓取：只抓取已有数据之后新上架的图书')
+    parser.add_argument('--start-year', type=int, default=None,
+                       help='只分析该年份及之后出版的图书')
+    parser.add_argument('--end-year', type=int, default=None,
+                       help='只分析该年份及之前出版的图书')
+    parser.add_argument('--force', action='store_true',
+                       help='忽略流水线清单，重新执行所有阶段')
+    parser.add_argument('--streaming', action='store_true',
+                       help='流式处理：抓取、分类、统计同时进行（完整重新抓取，不使用流水线清单）')
+    
+    # 已有数据时的处理策略，不指定时交互询问（非交互运行时保留现有数据）
+    policy_group = parser.add_mutually_exclusive_group()
+    policy_group.add_argument('--reuse', dest='policy', action='store_const', const=POLICY_REUSE,
+                              help='已有数据时直接使用，不询问')
+    policy_group.add_argument('--refresh', dest='policy', action='store_const', const=POLICY_REFRESH,
+                              help='重新抓取和分类全部图书，不询问（同时忽略流水线清单）')
+    policy_group.add_argument('--incremental', dest='policy', action='store_const', const=POLICY_INCREMENTAL,
+                              help='只抓取新上架的图书，只分类新图书和上次分类失败的图书')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='并发线程数，同时用于获取图书详情和发送分类请求')
+    parser.add_argument('--since', type=date.fromisoformat, default=None, metavar='YYYY-MM-DD',
+                       help='只处理该日期及之后出版的图书（重新获取详情、重新分类、只分析这些图书）')
+    parser.add_argument('--ids', type=lambda value: [int(book_id) for book_id in value.split(',') if book_id],
+                       default=None, metavar='ID,ID,...',
+                       help='只处理指定ID的图书，与--since同时指定时处理两者的并集')
+    parser.add_argument('--profile', nargs='?', const='cprofile', default=None,
+                       choices=['cprofile', 'pyinstrument'],
+                       help='在性能分析器下运行（默认cProfile），结果保存到 config.PROFILE_FILE')
     
     args = parser.parse_args()
+    selection = BookSelection(args.ids, args.since)
+    if args.streaming and (selection or args.policy):
+        parser.error('--streaming 总是完整重新抓取，不能与 --since/--ids/--reuse/--refresh/--incremental 同时使用')
     
     try:
-        if args.scrape_only:
-            # 仅抓取数据
-            setup_environment()
-            scrape_data(args.max_pages)
-        elif args.classify_only:
-            # 仅进行分类
-            setup_environment()
-            scraper = IturingScraper()
-            books = scraper.load_books_data()
-            if books:
-                classify_books(books, args.ai_service)
+        with profiling(args.profile):
+            manifest = PipelineManifest(config.PIPELINE_MANIFEST_FILE,
+                                        force=args.force or args.policy == POLICY_REFRESH)
+            if args.scrape_only:
+                # 仅抓取数据
+                setup_environment()
+                scrape_data(args.max_pages, args.delta, manifest, args.policy, args.workers, selection)
+            elif args.classify_only:
+                # 仅进行分类
+                setup_environment()
+                from data_scraper import IturingScraper
+                scraper = IturingScraper()
+                books = scraper.load_books_data()
+                if books:
+                    classify_books(books, args.ai_service, manifest, args.policy, args.workers, selection)
+                else:
+                    print("没有找到图书数据，请先运行数据抓取")
+            elif args.analyze_only:
+                # 仅进行分析
+                setup_environment()
+                analyze_data(args.start_year, args.end_year, manifest, selection)
+            elif args.streaming:
+                # 流式运行完整流程
+                run_streaming_pipeline(args.max_pages, args.ai_service, args.start_year, args.end_year, args.workers)
             else:
-                print("没有找到图书数据，请先运行数据抓取")
-        elif args.analyze_only:
-            # 仅进行分析
-            setup_environment()
-            analyze_data()
-        else:
-            # 运行完整流程
-            run_full_pipeline(args.max_pages, args.ai_service)
+                # 运行完整流程
+                run_full_pipeline(args.max_pages, args.ai_service, args.delta, args.start_year, args.end_year,
+                                  args.force, args.policy, args.workers, selection)
             
     except KeyboardInterrupt:
         print("\n程序被用户中断")
@@ -170,6 +530,8 @@ def main():
         print("详细错误信息:")
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        write_metrics()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标收集
+记录各类调用的耗时分布（p50/p95/p99）、请求次数、重试、缓存命中和传输字节数，
+运行结束后写入JSON文件（默认为config.METRICS_FILE，与分析报告放在同一目录）
+
+各模块通过模块级的 metrics 对象记录指标：
+    @metrics.timed('scraper.get_book_detail')
+    def get_book_detail(...): ...
+
+    with metrics.timer('classifier.llm_call'):
+        ...
+    metrics.increment('http.requests')
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Any, List
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """已排序数据的q分位数（线性插值），q取0~100"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.timings: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+
+    def reset(self):
+        """清空已记录的指标"""
+        with self._lock:
+            self.started_at = time.time()
+            self.timings = {}
+            self.counters = {}
+
+    def observe(self, name: str, seconds: float):
+        """记录一次调用的耗时（秒）"""
+        with self._lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def increment(self, name: str, value: float = 1):
+        """计数器累加"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name: str):
+        """记录with语句块的耗时，块内抛出异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        """装饰器：记录每次函数调用的耗时"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self, name: str) -> Dict[str, float]:
+        """一类调用的次数、总耗时和耗时分布（毫秒）"""
+        with self._lock:
+            values = sorted(self.timings.get(name, []))
+        total = sum(values)
+        return {
+            'count': len(values),
+            'total_seconds': total,
+            'mean_ms': total / len(values) * 1000 if values else 0.0,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000 if values else 0.0
+        }
+
+    def hit_rates(self) -> Dict[str, float]:
+        """由 <前缀>.hits / <前缀>.misses 计数器计算各缓存的命中率"""
+        with self._lock:
+            counters = dict(self.counters)
+        rates = {}
+        for name, hits in counters.items():
+            if not name.endswith('.hits'):
+                continue
+            prefix = name[:-len('.hits')]
+            lookups = hits + counters.get(f'{prefix}.misses', 0) + counters.get(f'{prefix}.revalidated', 0)
+            rates[prefix] = hits / lookups if lookups else 0.0
+        return rates
+
+    def report(self) -> Dict[str, Any]:
+        """全部指标，可直接序列化为JSON"""
+        with self._lock:
+            names = sorted(self.timings)
+            counters = dict(sorted(self.counters.items()))
+        return {
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'elapsed_seconds': time.time() - self.started_at,
+            'timings': {name: self.summary(name) for name in names},
+            'counters': counters,
+            'cache_hit_rates': self.hit_rates()
+        }
+
+    def write(self, filepath: str) -> Dict[str, Any]:
+        """原子地写入指标JSON文件，返回写入的内容"""
+        report = self.report()
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        tmp_path = filepath + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, filepath)
+        return report
+
+    def format_summary(self) -> str:
+        """耗时分布的文本摘要，每类调用一行"""
+        with self._lock:
+            names = sorted(self.timings)
+        lines = []
+        for name in names:
+            s = self.summary(name)
+            lines.append(f"{name:<32} {s['count']:>6} 次  p50 {s['p50_ms']:>8.1f}ms  "
+                         f"p95 {s['p95_ms']:>8.1f}ms  p99 {s['p99_ms']:>8.1f}ms  共 {s['total_seconds']:.1f}s")
+        return "\n".join(lines)
+
+
+# 进程内共享的指标收集器
+metrics = Metrics()
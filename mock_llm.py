@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟AI服务
+按提示词中图书的"标签"行给出分类结果，支持单本和批量（JSON回复）两种提示词，
+可配置响应延迟和限流错误比例，供BookClassifier(ai_service='mock')离线测试和基准测试使用
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from typing import List
+
+import config
+
+_ENTRY_PATTERN = re.compile(r'^\[(\d+)\]$', re.M)
+_TAG_LINE_PATTERN = re.compile(r'^标签:(.*)$', re.M)
+
+
+class RateLimitError(Exception):
+    """模拟的限流错误，BookClassifier会按限流处理并退避重试"""
+    status_code = 429
+
+
+class MockLLM:
+    def __init__(self, latency: float = None, error_rate: float = None, seed: int = 0):
+        """
+        初始化模拟AI服务
+
+        Args:
+            latency: 每次调用的模拟延迟（秒），默认为config.MOCK_LLM_LATENCY
+            error_rate: 调用随机返回限流错误的比例，默认为config.MOCK_LLM_ERROR_RATE
+            seed: 随机错误的种子
+        """
+        self.latency = config.MOCK_LLM_LATENCY if latency is None else latency
+        self.error_rate = config.MOCK_LLM_ERROR_RATE if error_rate is None else error_rate
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify_text(text: str) -> str:
+        """图书"标签"行中第一个属于技术标签列表的标签，没有时为"其他\""""
+        match = _TAG_LINE_PATTERN.search(text)
+        for name in (match.group(1).split(',') if match else []):
+            if name.strip() in config.TECH_CATEGORIES:
+                return name.strip()
+        return "其他"
+
+    def _reply(self, prompt: str) -> str:
+        # 批量提示词中的图书按 [1]、[2]... 编号，回复JSON对象
+        parts = _ENTRY_PATTERN.split(prompt)
+        if len(parts) > 1:
+            entries: List[str] = parts[1:]
+            return json.dumps({number: self.classify_text(text)
+                               for number, text in zip(entries[::2], entries[1::2])}, ensure_ascii=False)
+        return self.classify_text(prompt)
+
+    def __call__(self, prompt: str, max_tokens: int = 50) -> str:
+        with self._lock:
+            self.calls += 1
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise RateLimitError("429 Too Many Requests")
+        return self._reply(prompt)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟图灵API服务器
+实现 Search/Advanced 和 Book/{id} 两个接口，用于离线测试和基准测试抓取器
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List
+
+
+class MockIturingServer:
+    def __init__(self, total_books: int = 50, page_size: int = 10, latency: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0, error_rate: float = 0.0,
+                 tag_names: List[str] = None, seed: int = 0):
+        """
+        初始化模拟服务器
+
+        Args:
+            total_books: 模拟目录中的图书数量
+            page_size: 每页返回的图书数量
+            latency: 每个请求的模拟响应延迟（秒）
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            error_rate: 请求随机返回500错误的比例
+            tag_names: 图书标签轮流取自该列表，出版年份也随之分散（默认所有图书都是"Python"）
+            seed: 随机错误的种子，相同的请求顺序得到相同的错误
+        """
+        self.total_books = total_books
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tag_names = tag_names
+        self.request_count = 0
+        self.error_count = 0
+        # 总是返回500的列表页码和图书ID，测试中可随时修改以模拟单个页面或图书获取失败
+        self.failing_pages = set()
+        self.failing_books = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    @property
+    def page_count(self) -> int:
+        return (self.total_books + self.page_size - 1) // self.page_size
+
+    def book_ids(self):
+        """按出版时间从新到旧排列的图书ID"""
+        return list(range(self.total_books, 0, -1))
+
+    def list_item(self, book_id: int) -> Dict[str, Any]:
+        return {"id": book_id, "name": f"测试图书{book_id}"}
+
+    def book_detail(self, book_id: int) -> Dict[str, Any]:
+        if self.tag_names:
+            tag = self.tag_names[book_id % len(self.tag_names)]
+            year = 2000 + book_id * 7 % 26
+        else:
+            tag = "Python"
+            year = 2010 + book_id % 15
+        return {
+            "id": book_id,
+            "name": f"测试图书{book_id}",
+            "abstract": f"这是测试图书{book_id}的简介",
+            "briefIntro": {"highlight": "", "authorInfo": ""},
+            "tags": [{"name": tag}],
+            "categories": [[{"name": "计算机"}]],
+            "publishDate": f"{year}-01-01T00:00:00",
+            "authorNameString": "测试作者",
+            "isbn": f"978-7-115-{book_id:05d}-0"
+        }
+
+    def search_page(self, page: int) -> Dict[str, Any]:
+        ids = self.book_ids()[(page - 1) * self.page_size:page * self.page_size]
+        return {
+            "bookItems": [self.list_item(book_id) for book_id in ids],
+            "pagination": {"pageCount": self.page_count}
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # 支持keep-alive，客户端可以复用连接
+            protocol_version = 'HTTP/1.1'
+
+            def _send_json(self, status: int, data: Any):
+                body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+                # 支持条件请求，内容未变化时返回304
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(status)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端已超时断开
+                    self.close_connection = True
+
+            def _begin(self) -> bool:
+                """计数并模拟延迟，按错误比例返回500时返回False"""
+                with server._lock:
+                    server.request_count += 1
+                    failed = server.error_rate > 0 and server._rng.random() < server.error_rate
+                    if failed:
+                        server.error_count += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if failed:
+                    self._send_json(500, {"message": "internal server error"})
+                return not failed
+
+            def do_POST(self):
+                # 先读完请求体，返回错误时连接仍可继续使用
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                if not self._begin():
+                    return
+                if not self.path.rstrip('/').endswith('/Search/Advanced'):
+                    self._send_json(404, {"message": "not found"})
+                    return
+
+                payload = json.loads(body or b'{}')
+                page = int(payload.get('page', 1))
+                if page in server.failing_pages:
+                    self._send_json(500, {"message": "internal server error"})
+                    return
+                self._send_json(200, server.search_page(page))
+
+            def do_GET(self):
+                if not self._begin():
+                    return
+                prefix = '/api/Book/'
+                book_id = self.path[len(prefix):] if self.path.startswith(prefix) else ''
+                if not book_id.isdigit() or not 1 <= int(book_id) <= server.total_books:
+                    self._send_json(404, {"message": "not found"})
+                    return
+                if int(book_id) in server.failing_books:
+                    self._send_json(500, {"message": "internal server error"})
+                    return
+
+                self._send_json(200, server.book_detail(int(book_id)))
+
+            def log_message(self, format, *args):
+                # 静默请求日志
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='本地模拟图灵API服务器')
+    parser.add_argument('--books', type=int, default=100, help='模拟目录中的图书数量（默认: 100）')
+    parser.add_argument('--latency', type=float, default=0.05, help='每个请求的响应延迟，秒（默认: 0.05）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='请求返回500错误的比例（默认: 0）')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口（默认: 8000）')
+    args = parser.parse_args()
+
+    server = MockIturingServer(total_books=args.books, latency=args.latency, error_rate=args.error_rate,
+                               port=args.port)
+    print(f"模拟服务器已启动: {server.base_url}（将 config.ITURING_BASE_URL 指向该地址即可离线运行）")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server._server.server_close()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式处理流水线
+抓取、分类、统计三个阶段在各自的线程中同时运行，通过有界队列衔接：
+每获取到一本图书的详情就交给分类器，分类完成立即合并进增量统计，
+端到端耗时约等于最慢的一个阶段，而不是三个阶段之和
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, List
+
+import config
+import storage
+from aggregate_store import AggregateStore
+from metrics import metrics
+
+# 队列结束标记
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    """其他阶段出错，流水线已停止"""
+
+
+class StreamingPipeline:
+    def __init__(self, scraper=None, classifier=None, analyzer=None, queue_size: int = None):
+        """
+        初始化流式流水线
+
+        Args:
+            scraper: 图书抓取器，默认为IturingScraper()
+            classifier: 图书分类器，需提供classify_books_batch方法，默认为BookClassifier()
+            analyzer: 数据分析器，默认为DataAnalyzer()
+            queue_size: 阶段之间队列的容量，默认为config.PIPELINE_QUEUE_SIZE
+        """
+        if scraper is None:
+            from data_scraper import IturingScraper
+            scraper = IturingScraper()
+        if classifier is None:
+            from book_classifier import BookClassifier
+            classifier = BookClassifier()
+        if analyzer is None:
+            from data_analyzer import DataAnalyzer
+            analyzer = DataAnalyzer()
+
+        self.scraper = scraper
+        self.classifier = classifier
+        self.analyzer = analyzer
+        self.queue_size = queue_size or config.PIPELINE_QUEUE_SIZE
+        self.last_run_stats: Dict[str, Any] = {}
+
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _put(self, q: queue.Queue, item):
+        """放入队列，队列已满时等待；其他阶段出错时放弃"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise PipelineAborted()
+
+    def _get(self, q: queue.Queue):
+        """从队列取出一项；其他阶段出错时返回结束标记"""
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    def _run_stage(self, name: str, func, output: queue.Queue = None):
+        """运行一个阶段，出错时通知其他阶段停止，结束时向下游发送结束标记"""
+        start = time.monotonic()
+        try:
+            func()
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            print(f"流水线阶段 {name} 出错: {e}")
+            self._errors.append((name, e))
+            self._stop.set()
+        finally:
+            self.last_run_stats[f'{name}_seconds'] = time.monotonic() - start
+            metrics.observe(f'stage.{name}', self.last_run_stats[f'{name}_seconds'])
+            if output is not None:
+                try:
+                    self._put(output, _DONE)
+                except PipelineAborted:
+                    pass
+
+    def _scrape(self, max_pages: int, books: queue.Queue, results: List[Dict[str, Any]]):
+        results.extend(self.scraper.scrape_all_books(max_pages=max_pages,
+                                                     on_book=lambda book: self._put(books, book)))
+
+    def _classify(self, books: queue.Queue, classified: queue.Queue):
+        # 每次取出队列中已有的图书（至少一本）一起分类，让分类器可以打包请求
+        max_batch = config.CLASSIFY_BATCH_SIZE * max(1, getattr(self.classifier, 'workers', 1))
+        finished = False
+        while not finished:
+            item = self._get(books)
+            if item is _DONE:
+                break
+
+            batch = [item]
+            while len(batch) < max_batch:
+                try:
+                    item = books.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+
+            for book in self.classifier.classify_books_batch(batch):
+                self._put(classified, book)
+
+    def _aggregate(self, classified: queue.Queue, store: AggregateStore, results: List[Dict[str, Any]]):
+        while True:
+            book = self._get(classified)
+            if book is _DONE:
+                break
+            store.merge([book])
+            results.append(book)
+
+    def run(self, max_pages: int = None, start_year: int = None, end_year: int = None) -> List[Dict[str, Any]]:
+        """
+        运行流水线
+
+        Returns:
+            已分类的图书列表，任一阶段出错时抛出该阶段的异常
+        """
+        start_time = time.monotonic()
+        self._stop.clear()
+        self._errors = []
+        self.last_run_stats = {}
+
+        books_queue = queue.Queue(maxsize=self.queue_size)
+        classified_queue = queue.Queue(maxsize=self.queue_size)
+        store = AggregateStore(config.AGGREGATE_STORE_FILE)
+        scraped_books: List[Dict[str, Any]] = []
+        classified_books: List[Dict[str, Any]] = []
+
+        threads = [
+            threading.Thread(target=self._run_stage, name='scrape',
+                             args=('scrape', lambda: self._scrape(max_pages, books_queue, scraped_books),
+                                   books_queue)),
+            threading.Thread(target=self._run_stage, name='classify',
+                             args=('classify', lambda: self._classify(books_queue, classified_queue),
+                                   classified_queue))
+        ]
+        for thread in threads:
+            thread.start()
+        self._run_stage('aggregate', lambda: self._aggregate(classified_queue, store, classified_books))
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0][1]
+
+        # 三个阶段结束后一次性保存数据文件，分类结果按抓取顺序（从新到旧）排列
+        order = {book.get('id'): index for index, book in enumerate(scraped_books)}
+        classified_books.sort(key=lambda book: order.get(book.get('id'), len(order)))
+        self.scraper.save_books_data(self.scraper_books(scraped_books))
+        # 有获取失败的图书时保留断点，重新运行时只请求失败的页面和图书
+        if self.scraper.last_run_complete:
+            self.scraper.clear_checkpoint()
+        self.classifier.save_classified_books(classified_books)
+
+        # 统计结果已随分类逐本更新，这里只需删除本次抓取中已不存在的图书并记录来源文件
+        filepath = storage.resolve_path(os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE))
+        store.sync(classified_books, storage.file_state(filepath))
+        store.save()
+        self.analyzer.analyze_aggregates(store, start_year, end_year)
+        store.close()
+
+        self.last_run_stats['books'] = len(classified_books)
+        self.last_run_stats['total_seconds'] = time.monotonic() - start_time
+        print(f"流水线完成: {len(classified_books)} 本图书，总耗时 {self.last_run_stats['total_seconds']:.1f} 秒"
+              f"（抓取 {self.last_run_stats['scrape_seconds']:.1f} 秒，"
+              f"分类 {self.last_run_stats['classify_seconds']:.1f} 秒）")
+        return classified_books
+
+    @staticmethod
+    def scraper_books(books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """去掉分类器写入的字段，得到抓取阶段的图书数据"""
+        fields = ('tech_tag', 'classify_source', 'classify_error')
+        return [{key: value for key, value in book.items() if key not in fields} for book in books]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线清单
+记录每个阶段（抓取、分类、分析）输入和输出的内容哈希，
+输入未变化且输出文件未被改动的阶段可以直接跳过
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Any, Iterable, Optional
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(filepath: str) -> Optional[str]:
+    """文件内容的SHA-256，文件不存在时返回None"""
+    if not os.path.exists(filepath):
+        return None
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_value(value: Any) -> str:
+    """可JSON序列化的参数或配置的SHA-256"""
+    data = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class PipelineManifest:
+    def __init__(self, filepath: str, force: bool = False):
+        """
+        初始化流水线清单
+
+        Args:
+            filepath: 清单文件路径
+            force: 强制重新执行所有阶段（仍会记录本次结果）
+        """
+        self.filepath = filepath
+        self.force = force
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+        if os.path.exists(filepath):
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    self.stages = json.load(f)
+            except ValueError:
+                print(f"流水线清单已损坏，将重新记录: {filepath}")
+
+    def is_current(self, stage: str, inputs: Dict[str, Optional[str]]) -> bool:
+        """阶段的输入与上次执行时相同，且上次的输出文件都未被改动"""
+        entry = self.stages.get(stage)
+        if self.force or not entry or entry.get('inputs') != inputs:
+            return False
+        return all(hash_file(path) == digest for path, digest in entry.get('outputs', {}).items())
+
+    def record(self, stage: str, inputs: Dict[str, Optional[str]], outputs: Iterable[str]):
+        """记录阶段的输入和输出文件哈希，并立即写入清单"""
+        self.stages[stage] = {
+            'inputs': inputs,
+            'outputs': {path: hash_file(path) for path in outputs},
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        os.makedirs(os.path.dirname(self.filepath) or '.', exist_ok=True)
+        tmp_path = self.filepath + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.stages, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.filepath)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """线程安全的令牌桶限流器，用于控制全局请求速率"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数，即允许的平均请求速率（请求/秒）
+            capacity: 桶容量，即允许的最大突发请求数
+        """
+        if rate <= 0:
+            raise ValueError(f"令牌补充速率必须大于0: {rate}")
+
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        """获取令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                wait = (tokens - self._tokens) / self.rate
+
+            # 在锁外等待，避免阻塞其他线程更新令牌
+            time.sleep(wait)
+
+
+class AIMDRateLimiter(TokenBucket):
+    """
+    加性增、乘性减（AIMD）的自适应限流器
+
+    请求成功时速率线性增加，遇到限流错误时速率按比例下降，
+    使并发请求在配额空闲时尽快完成，在触发限流时迅速退让
+    """
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float,
+                 increase: float = 0.1, decrease_factor: float = 0.5, capacity: float = 1):
+        """
+        初始化限流器
+
+        Args:
+            rate: 初始速率（请求/秒）
+            min_rate: 速率下限
+            max_rate: 速率上限
+            increase: 每次成功后增加的速率
+            decrease_factor: 遇到限流错误时速率乘以的系数
+            capacity: 令牌桶容量
+        """
+        super().__init__(rate, capacity)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self._last_decrease = 0.0
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_rate_limited(self):
+        with self._lock:
+            now = time.monotonic()
+            # 并发请求往往同时收到限流错误，同一时间窗口内只降速一次
+            if now - self._last_decrease < 1 / self.rate:
+                return
+            self._last_decrease = now
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            # 清空令牌，让所有线程一起暂停
+            self._tokens = 0
+            self._last = now
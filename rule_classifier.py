@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于关键词规则的本地预分类器
+用Aho-Corasick自动机一次扫描匹配书名、标签和分类中的全部关键词，
+置信度足够高的图书直接分配标签，其余图书交给AI服务
+"""
+
+import os
+from collections import deque, defaultdict
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import config
+import storage
+
+# 各字段匹配到关键词时的得分权重
+FIELD_WEIGHTS = {
+    'tags': 3.0,
+    'name': 2.0,
+    'categories': 1.0
+}
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机，匹配时间与文本长度成正比，与关键词数量无关"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern)
+
+    def _build(self):
+        """按广度优先顺序计算失败指针"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """依次返回 (匹配起始位置, 关键词)"""
+        state = 0
+        for index, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern in self._output[state]:
+                yield index - len(pattern) + 1, pattern
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class RuleClassifier:
+    def __init__(self, keywords: Dict[str, List[str]] = None, min_score: float = None,
+                 min_confidence: float = None):
+        """
+        初始化规则分类器
+
+        Args:
+            keywords: 技术标签到关键词列表的映射，默认为config.TECH_KEYWORDS
+            min_score: 最高得分标签的最低得分，默认为config.RULE_MIN_SCORE
+            min_confidence: 最高得分占全部得分的最低比例，默认为config.RULE_MIN_CONFIDENCE
+        """
+        keywords = keywords or config.TECH_KEYWORDS
+        self.min_score = config.RULE_MIN_SCORE if min_score is None else min_score
+        self.min_confidence = config.RULE_MIN_CONFIDENCE if min_confidence is None else min_confidence
+
+        # 关键词统一小写，同一关键词可能对应多个标签
+        self._keyword_tags: Dict[str, List[str]] = defaultdict(list)
+        for tag, words in keywords.items():
+            for word in set(words) | {tag}:
+                self._keyword_tags[word.lower()].append(tag)
+        self._matcher = AhoCorasick(self._keyword_tags)
+
+    def match_tags(self, text: str) -> set:
+        """返回文本中匹配到的技术标签，英文关键词要求完整单词匹配（避免Java匹配JavaScript）"""
+        text = text.lower()
+        tags = set()
+        for start, word in self._matcher.iter_matches(text):
+            end = start + len(word)
+            if _is_word_char(word[0]) and start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if _is_word_char(word[-1]) and end < len(text) and _is_word_char(text[end]):
+                continue
+            tags.update(self._keyword_tags[word])
+        return tags
+
+    @staticmethod
+    def _fields(book: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            'name': book.get('name', '') or '',
+            'tags': ' | '.join(tag.get('name', '') for tag in book.get('tags') or []),
+            'categories': ' | '.join(cat.get('name', '') for cat_list in book.get('categories') or []
+                                     for cat in cat_list)
+        }
+
+    def score(self, book: Dict[str, Any]) -> Dict[str, float]:
+        """计算图书在各技术标签上的得分"""
+        scores: Dict[str, float] = defaultdict(float)
+        for field, text in self._fields(book).items():
+            for tag in self.match_tags(text):
+                scores[tag] += FIELD_WEIGHTS[field]
+
+        # 同时匹配到具体标签（如MySQL）和它的上级标签（如数据库）时，只保留具体标签
+        for child, parent in config.RULE_PARENT_TAGS.items():
+            if child in scores and parent in scores:
+                del scores[parent]
+        return dict(scores)
+
+    def classify(self, book: Dict[str, Any]) -> Optional[str]:
+        """置信度足够时返回技术标签，否则返回None交给AI服务"""
+        scores = self.score(book)
+        if not scores:
+            return None
+
+        tag, top = max(scores.items(), key=lambda item: item[1])
+        if top >= self.min_score and top / sum(scores.values()) >= self.min_confidence:
+            return tag
+        return None
+
+    def evaluate(self, labelled_books: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        在已由AI服务分类的图书上评估规则分类器
+
+        Returns:
+            样本数、命中数、命中率，以及命中图书中与AI标签一致的比例
+        """
+        sample = hits = agreed = 0
+        for book in labelled_books:
+            if not book.get('tech_tag') or book.get('classify_source') == 'rule':
+                continue
+            sample += 1
+            tag = self.classify(book)
+            if tag is not None:
+                hits += 1
+                agreed += tag == book['tech_tag']
+
+        return {
+            'sample': sample,
+            'hits': hits,
+            'hit_rate': hits / sample if sample else 0.0,
+            'agreement': agreed / hits if hits else 0.0
+        }
+
+
+if __name__ == "__main__":
+    # 在已分类数据上评估规则分类器
+    filepath = os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE)
+    if not storage.exists(filepath):
+        print(f"分类数据文件不存在: {filepath}")
+    else:
+        result = RuleClassifier().evaluate(storage.iter_records(filepath))
+        print(f"评估样本: {result['sample']} 本（AI服务分类）")
+        print(f"规则命中: {result['hits']} 本 ({result['hit_rate']:.1%})")
+        print(f"与AI标签一致: {result['agreement']:.1%}")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图书数据存储模块
+支持逐行存储的JSONL格式（流式读取、追加写入）、整体存储的JSON格式
+和带索引的SQLite数据库（.db，见book_store.py），按文件扩展名区分
+"""
+
+import argparse
+import json
+import os
+from typing import Iterable, Iterator, Dict, Any, List
+
+from book_record import project_record
+from book_store import BookStore
+
+FORMATS = ('jsonl', 'json', 'db')
+
+
+def is_jsonl(filepath: str) -> bool:
+    return filepath.endswith('.jsonl')
+
+
+def is_sqlite(filepath: str) -> bool:
+    return filepath.endswith('.db')
+
+
+def _alternate_paths(filepath: str) -> List[str]:
+    """同名的其他格式文件路径（books_data.jsonl -> books_data.json, books_data.db）"""
+    base, ext = os.path.splitext(filepath)
+    if ext[1:] not in FORMATS:
+        return []
+    return [f"{base}.{fmt}" for fmt in FORMATS if fmt != ext[1:]]
+
+
+def resolve_path(filepath: str) -> str:
+    """
+    返回实际存在的数据文件路径
+
+    指定格式的文件不存在但其他格式的同名文件存在时（例如切换存储格式前的旧数据），
+    返回旧文件路径以保持兼容
+    """
+    if not os.path.exists(filepath):
+        for alternate in _alternate_paths(filepath):
+            if os.path.exists(alternate):
+                return alternate
+    return filepath
+
+
+def exists(filepath: str) -> bool:
+    return os.path.exists(resolve_path(filepath))
+
+
+def file_state(filepath: str) -> Dict[str, Any]:
+    """文件的路径、大小和修改时间，用于判断由它生成的结果是否过期"""
+    stat = os.stat(filepath)
+    return {'path': os.path.abspath(filepath), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def iter_records(filepath: str) -> Iterator[Dict[str, Any]]:
+    """逐条读取数据文件中的记录"""
+    filepath = resolve_path(filepath)
+
+    if is_sqlite(filepath):
+        if os.path.exists(filepath):
+            with BookStore(filepath) as store:
+                yield from store.iter_books()
+        return
+
+    if not os.path.exists(filepath):
+        return
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        if not is_jsonl(filepath):
+            yield from json.load(f)
+            return
+
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _write_lines(f, records: Iterable[Dict[str, Any]]) -> int:
+    """逐条写入JSONL记录，返回写入的记录数"""
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False, default=dict) + '\n')
+        count += 1
+    return count
+
+
+def write_records(filepath: str, records: Iterable[Dict[str, Any]]) -> int:
+    """
+    将记录完整写入数据文件（覆盖已有文件），返回写入的记录数
+
+    JSONL格式逐条写入临时文件后原子替换，不需要把全部记录保存在内存中；
+    SQLite格式在单个事务中分批写入
+    """
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+
+    # 记录可以是dict或Book（default=dict把Book转换为只含其字段的dict）
+    if is_sqlite(filepath):
+        with BookStore(filepath) as store:
+            return store.write(records)
+
+    if not is_jsonl(filepath):
+        records = list(records)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2, default=dict)
+        return len(records)
+
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        count = _write_lines(f, records)
+    os.replace(tmp_path, filepath)
+    return count
+
+
+def append_records(filepath: str, records: Iterable[Dict[str, Any]]) -> int:
+    """向JSONL文件追加记录（SQLite数据库中新增或更新记录），返回写入的记录数"""
+    if is_sqlite(filepath):
+        with BookStore(filepath) as store:
+            return store.upsert(records)
+
+    if not is_jsonl(filepath):
+        raise ValueError(f"只有JSONL格式支持追加写入: {filepath}")
+
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    with open(filepath, 'a', encoding='utf-8') as f:
+        return _write_lines(f, records)
+
+
+def convert_records(src: str, fmt: str = None, project: bool = False) -> str:
+    """
+    将数据文件转换为指定格式（jsonl、json或db），返回新文件路径
+
+    project=True时只保留Book记录的字段，不指定格式时在原文件上精简
+    """
+    dst = f"{os.path.splitext(src)[0]}.{fmt}" if fmt else src
+    if dst == src and not project:
+        raise ValueError(f"源文件已经是{fmt}格式: {src}")
+
+    records = iter_records(src)
+    if project:
+        records = map(project_record, records)
+    if dst == src:
+        # 在原文件上精简时先读入全部记录
+        records = list(records)
+
+    count = write_records(dst, records)
+    print(f"已转换 {count} 条记录: {src} -> {dst}")
+    return dst
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='转换图书数据文件的存储格式')
+    parser.add_argument('files', nargs='+', help='要转换的数据文件，例如 data/books/books_data.json')
+    parser.add_argument('--to', choices=FORMATS, default=None, help='目标格式 (默认: jsonl，指定--project时为原格式)')
+    parser.add_argument('--project', action='store_true', help='只保留Book记录的字段，丢弃接口返回的其他字段')
+    args = parser.parse_args()
+
+    for path in args.files:
+        convert_records(path, args.to or (None if args.project else 'jsonl'), project=args.project)
@@ -34,6 +34,9 @@ def test_ai_service(service_name):
         
         # 进行分类测试
         result = classifier.classify_book(test_book)
+        if result is None:
+            print("✗ AI服务调用失败，未能分配标签")
+            return False
         print(f"✓ 分类结果: {result}")
         
         return True
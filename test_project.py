@@ -8,9 +8,31 @@ import os
 import sys
 import json
 import argparse
+import subprocess
+import tempfile
+import threading
+import time
+import pandas as pd
 from data_scraper import IturingScraper
-from book_classifier import BookClassifier
-from data_analyzer import DataAnalyzer
+from book_classifier import BookClassifier, build_classification_text
+from data_analyzer import DataAnalyzer, SOURCE_COLUMNS, ANALYSIS_COLUMNS
+from aggregate_store import AggregateStore
+from analysis_stats import AnalysisStats
+from book_record import Book, FIELDS
+from book_store import BookStore
+from chart_renderer import render_charts
+from pipeline_manifest import PipelineManifest
+from pipeline import StreamingPipeline
+from metrics import metrics
+from classification_cache import ClassificationCache
+from mock_server import MockIturingServer
+from rate_limiter import AIMDRateLimiter
+from rule_classifier import AhoCorasick, RuleClassifier
+from local_classifier import LocalClassifier
+from benchmark import (generate_synthetic_books, legacy_prepare_data, isolated_config, unclassified,
+                       compare_to_baseline, bench_book_memory)
+from mock_llm import MockLLM
+import storage
 import config
 
 def test_scraper():
@@ -32,6 +54,243 @@ def test_scraper():
         print(f"✗ 数据抓取测试失败: {e}")
         return False
 
+def test_concurrent_scraper():
+    """测试并发抓取功能（使用本地模拟服务器）"""
+    print("测试并发抓取功能...")
+    
+    try:
+        # 断点和数据文件写入临时目录，不影响正在进行的真实抓取
+        with MockIturingServer(total_books=40, page_size=10, latency=0.05) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, workers=8, use_cache=False)
+            books = scraper.scrape_all_books(resume=False)
+            stats = scraper.last_run_stats
+            scraper.clear_checkpoint()
+        
+        if len(books) == 40 and all('publishDate' in book for book in books):
+            print(f"✓ 成功并发抓取 {len(books)} 本图书，"
+                  f"{stats['requests']} 个请求，{stats['requests_per_second']:.1f} 请求/秒")
+            return True
+        else:
+            print(f"✗ 并发抓取结果不完整: {len(books)} 本图书")
+            return False
+    except Exception as e:
+        print(f"✗ 并发抓取测试失败: {e}")
+        return False
+
+def test_page_prefetch():
+    """测试先并发获取全部列表页、再并发获取详情的两阶段抓取"""
+    print("测试列表页预取...")
+
+    try:
+        with MockIturingServer(total_books=45, page_size=10) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            # 模拟抓取期间新书上架：每页开头重复上一页的最后一本
+            search_page = server.search_page
+            def shifted_page(page):
+                data = search_page(page)
+                if page > 1:
+                    data["bookItems"].insert(0, search_page(page - 1)["bookItems"][-1])
+                return data
+            server.search_page = shifted_page
+
+            scraper = IturingScraper(base_url=server.base_url, workers=4, use_cache=False)
+            books = scraper.scrape_all_books(resume=False)
+            requests_made = server.request_count
+
+        # 每个列表页只请求一次（第一页复用），重复出现的图书不再获取详情
+        if [book["id"] for book in books] == server.book_ids() and requests_made == server.page_count + 45:
+            print(f"✓ 列表页预取正常，{server.page_count} 页、{len(books)} 本图书共 {requests_made} 个请求")
+            return True
+        else:
+            print(f"✗ 列表页预取异常: {len(books)} 本图书，{requests_made} 个请求")
+            return False
+    except Exception as e:
+        print(f"✗ 列表页预取测试失败: {e}")
+        return False
+
+def test_scrape_abort():
+    """测试下游处理出错时取消尚未开始的详情请求"""
+    print("测试抓取中止...")
+    
+    class Aborted(Exception):
+        pass
+    
+    def abort(book):
+        raise Aborted()
+    
+    try:
+        with MockIturingServer(total_books=200, page_size=10, latency=0.02) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            scraper = IturingScraper(base_url=server.base_url, workers=4, use_cache=False)
+            try:
+                scraper.scrape_all_books(resume=False, on_book=abort)
+                aborted = False
+            except Aborted:
+                aborted = True
+            requests_made = server.request_count
+        
+        # 20个列表页之后，只有中止时正在进行的少数详情请求会发出，其余请求已取消
+        if aborted and requests_made < server.page_count + 20:
+            print(f"✓ 中止后取消了排队中的请求，共发送 {requests_made} 个请求（完整抓取需 {server.page_count + 200} 个）")
+            return True
+        else:
+            print(f"✗ 抓取中止异常: aborted={aborted}，{requests_made} 个请求")
+            return False
+    except Exception as e:
+        print(f"✗ 抓取中止测试失败: {e}")
+        return False
+
+def test_resume_scraper():
+    """测试断点续抓功能（使用本地模拟服务器）"""
+    print("测试断点续抓功能...")
+    
+    try:
+        with MockIturingServer(total_books=40, page_size=10) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            # 模拟只完成了前两页就中断的抓取
+            IturingScraper(base_url=server.base_url, request_rate=100, use_cache=False).scrape_all_books(
+                max_pages=2, resume=False)
+            
+            before = server.request_count
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=False)
+            books = scraper.scrape_all_books(resume=True)
+            resumed_requests = server.request_count - before
+            scraper.clear_checkpoint()
+        
+        # 续抓只需请求第1页（确定总页数）、第3-4页列表和20本新书详情
+        if len(books) == 40 and resumed_requests == 23:
+            print(f"✓ 成功从断点续抓，共 {len(books)} 本图书，续抓仅发送 {resumed_requests} 个请求")
+            return True
+        else:
+            print(f"✗ 断点续抓异常: {len(books)} 本图书，{resumed_requests} 个请求")
+            return False
+    except Exception as e:
+        print(f"✗ 断点续抓测试失败: {e}")
+        return False
+
+def test_failed_book_retry():
+    """测试获取失败的图书不记入断点，重新运行时只请求失败的部分"""
+    print("测试失败图书重试...")
+    
+    try:
+        with MockIturingServer(total_books=40, page_size=10) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            failed_id = server.book_ids()[12]
+            server.failing_books.add(failed_id)
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=False, retries=0)
+            first = scraper.scrape_all_books(resume=False)
+            incomplete = not scraper.last_run_complete and not scraper.checkpoint.is_page_done(2)
+            
+            server.failing_books.clear()
+            before = server.request_count
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=False, retries=0)
+            books = scraper.scrape_all_books(resume=True)
+            resumed_requests = server.request_count - before
+            complete = scraper.last_run_complete
+        
+        # 续抓只需请求第1页（确定总页数）、第2页列表和失败的那本图书
+        if (len(first) == 39 and incomplete and complete and resumed_requests == 3
+                and [book["id"] for book in books] == server.book_ids()):
+            print(f"✓ 失败的图书在续抓时重新获取，共 {len(books)} 本图书，续抓仅发送 {resumed_requests} 个请求")
+            return True
+        else:
+            print(f"✗ 失败图书重试异常: 首次 {len(first)} 本，续抓 {len(books)} 本，{resumed_requests} 个请求")
+            return False
+    except Exception as e:
+        print(f"✗ 失败图书重试测试失败: {e}")
+        return False
+
+def test_failed_page_retry():
+    """测试获取失败（或响应中没有图书列表）的列表页不记入断点，重新运行时再次获取"""
+    print("测试失败列表页重试...")
+    
+    try:
+        with MockIturingServer(total_books=40, page_size=10) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            server.failing_pages.add(3)
+            # 第4页返回200但没有bookItems
+            search_page = server.search_page
+            server.search_page = lambda page: ({"pagination": {"pageCount": server.page_count}} if page == 4
+                                               else search_page(page))
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=False, retries=0)
+            first = scraper.scrape_all_books(resume=False)
+            incomplete = (scraper.last_run_stats["failed_pages"] == [3, 4] and scraper.checkpoint.is_page_done(2)
+                          and not scraper.checkpoint.is_page_done(3) and not scraper.checkpoint.is_page_done(4))
+            
+            server.failing_pages.clear()
+            server.search_page = search_page
+            before = server.request_count
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=False, retries=0)
+            books = scraper.scrape_all_books(resume=True)
+            resumed_requests = server.request_count - before
+            complete = scraper.last_run_complete
+        
+        # 续抓只需请求第1页（确定总页数）、第3-4页列表和这两页的20本图书
+        if (len(first) == 20 and incomplete and complete and resumed_requests == 23
+                and [book["id"] for book in books] == server.book_ids()):
+            print(f"✓ 失败的列表页在续抓时重新获取，共 {len(books)} 本图书，续抓仅发送 {resumed_requests} 个请求")
+            return True
+        else:
+            print(f"✗ 失败列表页重试异常: 首次 {len(first)} 本，续抓 {len(books)} 本，{resumed_requests} 个请求")
+            return False
+    except Exception as e:
+        print(f"✗ 失败列表页重试测试失败: {e}")
+        return False
+
+def test_delta_scraper():
+    """测试增量抓取功能（使用本地模拟服务器）"""
+    print("测试增量抓取功能...")
+    
+    try:
+        with MockIturingServer(total_books=40, page_size=10) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            # 已有最早上架的35本，新上架的5本都在第1页
+            known_ids = set(range(1, 36))
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=False)
+            new_books = scraper.scrape_new_books(known_ids)
+            requests_made = server.request_count
+        
+        # 只需翻阅前两页并获取5本新书的详情
+        if sorted(book["id"] for book in new_books) == list(range(36, 41)) and requests_made == 7:
+            print(f"✓ 成功增量抓取 {len(new_books)} 本新书，仅发送 {requests_made} 个请求")
+            return True
+        else:
+            print(f"✗ 增量抓取异常: {len(new_books)} 本新书，{requests_made} 个请求")
+            return False
+    except Exception as e:
+        print(f"✗ 增量抓取测试失败: {e}")
+        return False
+
+def test_http_cache():
+    """测试HTTP缓存功能（使用本地模拟服务器）"""
+    print("测试HTTP缓存功能...")
+    
+    try:
+        with MockIturingServer(total_books=10) as server, tempfile.TemporaryDirectory() as cache_dir:
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=True, cache_dir=cache_dir)
+            first = scraper.get_book_detail(1)
+            second = scraper.get_book_detail(1)
+            cached_requests = server.request_count
+            
+            # 缓存过期后通过ETag重新验证
+            scraper.cache_adapter.cache.ttl = 0
+            third = scraper.get_book_detail(1)
+            stats = scraper.cache_adapter.stats()
+            # 命中缓存的请求不计入网络请求，重新验证的计入
+            counted = scraper.request_count == 2 and scraper.cache_hit_count == 1
+        
+        if (first == second == third and cached_requests == 1 and stats['hits'] == 1 and stats['revalidated'] == 1
+                and counted):
+            print(f"✓ HTTP缓存工作正常: {stats}")
+            return True
+        else:
+            print(f"✗ HTTP缓存异常: 请求数 {cached_requests}，统计 {stats}")
+            return False
+    except Exception as e:
+        print(f"✗ HTTP缓存测试失败: {e}")
+        return False
+
 def test_classifier(ai_service=None):
     """测试图书分类功能"""
     print(f"测试图书分类功能 (使用 {ai_service or config.DEFAULT_AI_SERVICE} API)...")
@@ -56,12 +315,212 @@ def test_classifier(ai_service=None):
     
     try:
         tag = classifier.classify_book(test_book)
+        if tag is None:
+            print("✗ AI服务调用失败，未能分配标签")
+            return False
         print(f"✓ 成功为测试图书分配标签: {tag}")
         return True
     except Exception as e:
         print(f"✗ 图书分类测试失败: {e}")
         return False
 
+def test_classification_cache():
+    """测试分类结果缓存（不调用真实AI服务）"""
+    print("测试分类结果缓存...")
+    
+    book = {
+        "name": "Redis设计与实现",
+        "abstract": "本书全面介绍Redis的内部机制",
+        "tags": [{"name": "Redis"}],
+        "categories": [[{"name": "数据库"}]]
+    }
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            classifier = BookClassifier(ai_service='openai', use_cache=False, use_rules=False)
+            classifier.cache = ClassificationCache(os.path.join(tmp_dir, "cache.db"))
+            
+            calls = []
+            classifier._call_llm = lambda prompt, max_tokens=50: calls.append(prompt) or "Redis"
+            
+            first = classifier.classify_book(book)
+            second = classifier.classify_book(book)
+            
+            # 图书内容变化后需要重新分类
+            edited = dict(book, abstract="本书介绍Redis集群")
+            third = classifier.classify_book(edited)
+            classifier.cache.close()
+        
+        if first == second == third == "Redis" and len(calls) == 2:
+            print(f"✓ 分类缓存工作正常，3次分类只调用 {len(calls)} 次API")
+            return True
+        else:
+            print(f"✗ 分类缓存异常: 调用API {len(calls)} 次")
+            return False
+    except Exception as e:
+        print(f"✗ 分类缓存测试失败: {e}")
+        return False
+
+def test_batch_classification():
+    """测试多本图书打包分类（不调用真实AI服务）"""
+    print("测试批量分类功能...")
+    
+    books = [{"name": f"Go语言实战 第{i}版", "tags": [{"name": "Go"}]} for i in range(1, 8)]
+    
+    # 模拟AI服务：批量请求返回JSON但漏掉第3本，单本请求直接返回标签
+    calls = []
+    def fake_llm(prompt, max_tokens=50):
+        calls.append(prompt)
+        if '[1]' in prompt:
+            count = prompt.count('书名:')
+            return json.dumps({str(i): "Go" for i in range(1, count + 1) if i != 3})
+        return "Go"
+    
+    try:
+        classifier = BookClassifier(ai_service='openai', use_cache=False, use_rules=False)
+        classifier._call_llm = fake_llm
+        classifier.rate_limiter = AIMDRateLimiter(100, 1, 100)
+        
+        classified = classifier.classify_books_batch(books, batch_size=4)
+        stats = classifier.last_run_stats
+        
+        # 7本书: 4本+3本两个批次，各漏掉1本退回单本分类，共4次请求
+        if all(book['tech_tag'] == "Go" for book in classified) and len(calls) == 4 \
+                and stats['fallback_books'] == 2 and stats['requests_saved'] == 3:
+            print(f"✓ 批量分类工作正常，7本书共 {len(calls)} 次请求，节省约 {stats['tokens_saved']} 个token")
+            return True
+        else:
+            print(f"✗ 批量分类异常: {len(calls)} 次请求，统计 {stats}")
+            return False
+    except Exception as e:
+        print(f"✗ 批量分类测试失败: {e}")
+        return False
+
+def test_classification_retry():
+    """测试限流重试和失败标记（不调用真实AI服务）"""
+    print("测试分类重试功能...")
+    
+    class RateLimitError(Exception):
+        status_code = 429
+    
+    class AuthenticationError(Exception):
+        status_code = 401
+    
+    books = [{"name": f"Rust编程之道 {i}"} for i in range(6)] + [{"name": "无效图书"}]
+    
+    # 模拟AI服务：前3次调用触发限流，"无效图书"始终返回不可重试的错误
+    calls = []
+    lock = threading.Lock()
+    def fake_llm(prompt, max_tokens=50):
+        with lock:
+            calls.append(prompt)
+            if len(calls) <= 3:
+                raise RateLimitError("429 Too Many Requests")
+        if "无效图书" in prompt:
+            raise AuthenticationError("invalid api key")
+        return "Rust"
+    
+    original_backoff = config.CLASSIFY_RETRY_BACKOFF
+    config.CLASSIFY_RETRY_BACKOFF = 0.01
+    try:
+        classifier = BookClassifier(ai_service='openai', use_cache=False, workers=4, use_rules=False)
+        classifier._call_llm = fake_llm
+        classifier.rate_limiter = AIMDRateLimiter(50, 1, 100)
+        
+        classified = classifier.classify_books_batch(books, batch_size=1)
+        stats = classifier.last_run_stats
+        failed = [book for book in classified if book['tech_tag'] is None]
+        
+        if len(failed) == 1 and failed[0]['name'] == "无效图书" and 'classify_error' in failed[0] \
+                and all(book['tech_tag'] == "Rust" for book in classified if book is not failed[0]) \
+                and stats['final_rate'] < 50:
+            print(f"✓ 限流后自动退避重试，{stats['requests']} 次调用，失败图书已标记")
+            return True
+        else:
+            print(f"✗ 分类重试异常: {stats}")
+            return False
+    except Exception as e:
+        print(f"✗ 分类重试测试失败: {e}")
+        return False
+    finally:
+        config.CLASSIFY_RETRY_BACKOFF = original_backoff
+
+def test_rule_classifier():
+    """测试关键词规则预分类"""
+    print("测试规则预分类功能...")
+    
+    books = [
+        {"name": "高性能MySQL", "tags": [{"name": "MySQL"}, {"name": "数据库"}], "tech_tag": "MySQL"},
+        {"name": "Go语言实战", "tags": [{"name": "Go"}], "tech_tag": "Go"},
+        {"name": "Google工程实践", "tags": [{"name": "软件工程"}], "tech_tag": "系统设计"},
+        {"name": "Python深度学习", "tags": [{"name": "Python"}, {"name": "深度学习"}], "tech_tag": "深度学习"}
+    ]
+    
+    try:
+        matches = list(AhoCorasick(["he", "she", "his", "hers"]).iter_matches("ushers"))
+        rules = RuleClassifier()
+        tags = [rules.classify(book) for book in books]
+        evaluation = rules.evaluate(books)
+        
+        # 只有明确的书交给规则，"Google"不会误匹配Go，Python深度学习两者得分相同交给AI服务
+        classifier = BookClassifier(ai_service='openai', use_cache=False)
+        calls = []
+        classifier._call_llm = lambda prompt, max_tokens=50: calls.append(prompt) or "系统设计"
+        classifier.classify_books_batch([dict(book) for book in books], batch_size=1)
+        stats = classifier.last_run_stats
+        
+        if sorted(matches) == [(1, "she"), (2, "he"), (2, "hers")] and tags == ["MySQL", "Go", None, None] \
+                and evaluation['hits'] == 2 and evaluation['agreement'] == 1.0 \
+                and stats['rule_hits'] == 2 and len(calls) == 2:
+            print(f"✓ 规则预分类命中率 {evaluation['hit_rate']:.0%}，与AI标签一致率 {evaluation['agreement']:.0%}")
+            return True
+        else:
+            print(f"✗ 规则预分类异常: {tags}，{evaluation}，{stats}")
+            return False
+    except Exception as e:
+        print(f"✗ 规则预分类测试失败: {e}")
+        return False
+
+def test_local_classifier():
+    """测试离线分类模型"""
+    print("测试离线分类模型...")
+    
+    topics = {
+        "Python": ["Python", "Django", "爬虫", "数据分析"],
+        "Redis": ["Redis", "缓存", "键值存储", "持久化"],
+        "前端开发": ["React", "CSS", "浏览器", "网页布局"]
+    }
+    
+    def make_book(tag, i):
+        words = topics[tag]
+        return {"name": f"{words[i % 4]}实战", "abstract": f"本书深入讲解{words[(i + 1) % 4]}和{words[(i + 2) % 4]}"}
+    
+    try:
+        train_books = [(tag, make_book(tag, i)) for tag in topics for i in range(30)]
+        test_books = [(tag, make_book(tag, i + 1)) for tag in topics for i in range(300)]
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model = LocalClassifier(n_features=2 ** 14)
+            model.fit([build_classification_text(book) for _, book in train_books], [tag for tag, _ in train_books])
+            model_path = os.path.join(tmp_dir, "model.npz")
+            model.save(model_path)
+            model = LocalClassifier.load(model_path)
+            
+            start = time.perf_counter()
+            predicted = model.predict([build_classification_text(book) for _, book in test_books])
+            elapsed = time.perf_counter() - start
+        
+        accuracy = sum(p == tag for p, (tag, _) in zip(predicted, test_books)) / len(test_books)
+        if accuracy >= 0.9:
+            print(f"✓ 离线模型准确率 {accuracy:.0%}，{len(test_books) / elapsed:.0f} 本/秒")
+            return True
+        else:
+            print(f"✗ 离线模型准确率过低: {accuracy:.0%}")
+            return False
+    except Exception as e:
+        print(f"✗ 离线模型测试失败: {e}")
+        return False
+
 def test_analyzer():
     """测试数据分析功能"""
     print("测试数据分析功能...")
@@ -117,6 +576,753 @@ def test_analyzer():
         print(f"✗ 数据分析测试失败: {e}")
         return False
 
+def test_prepare_data():
+    """测试按列解析的数据准备与逐行解析结果一致"""
+    print("测试数据准备结果一致性...")
+
+    try:
+        books = generate_synthetic_books(2000)
+        # 补充缺失字段、空标签和非补零日期等边界情况
+        books += [
+            {"name": "无日期", "tech_tag": "Python"},
+            {"name": "空标签", "tech_tag": "", "publishDate": "2020-01-01T00:00:00"},
+            {"name": "无标签", "publishDate": "2020-01-01T00:00:00"},
+            {"name": "日期为空值", "tech_tag": "Go", "publishDate": None},
+            {"name": "非补零日期", "tech_tag": "Go", "publishDate": "2021-3-5T00:00:00"},
+            {"name": "无效日期", "tech_tag": "Go", "publishDate": "2021-02-30"}
+        ]
+        expected = legacy_prepare_data(books)
+        actual = DataAnalyzer().prepare_data(books)
+
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+        print(f"✓ 按列解析与逐行解析结果一致，共 {len(actual)} 条记录")
+        return True
+    except Exception as e:
+        print(f"✗ 数据准备一致性测试失败: {e}")
+        return False
+
+def test_analysis_dataset():
+    """测试Parquet分析数据集（按年份分区读取）"""
+    print("测试分析数据集...")
+
+    saved = (config.BOOKS_DIR, config.ANALYSIS_DIR, config.ANALYSIS_DATASET_DIR)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.BOOKS_DIR = os.path.join(tmp_dir, "books")
+            config.ANALYSIS_DIR = os.path.join(tmp_dir, "analysis")
+            config.ANALYSIS_DATASET_DIR = os.path.join(config.ANALYSIS_DIR, "books_dataset")
+            storage.write_records(os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE),
+                                  generate_synthetic_books(1000))
+
+            analyzer = DataAnalyzer()
+            full = analyzer.load_analysis_data()
+            # 分类数据未变化，第二次直接读取数据集中的部分列和年份
+            if not analyzer.dataset_is_current(
+                    os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE)):
+                print("✗ 分析数据集未生成")
+                return False
+            subset = analyzer.load_analysis_data(columns=['tech_tag', 'publish_year'],
+                                                 start_year=2010, end_year=2015)
+
+        expected = full[(full['publish_year'] >= 2010) & (full['publish_year'] <= 2015)]
+        if (list(subset.columns) == ['tech_tag', 'publish_year'] and len(subset) == len(expected)
+                and subset.groupby(['publish_year', 'tech_tag']).size().equals(
+                    expected.groupby(['publish_year', 'tech_tag']).size())):
+            print(f"✓ 分析数据集工作正常，{len(full)} 条记录中按年份读取 {len(subset)} 条")
+            return True
+        else:
+            print(f"✗ 分析数据集读取结果不一致: {len(subset)} / {len(expected)}")
+            return False
+    except Exception as e:
+        print(f"✗ 分析数据集测试失败: {e}")
+        return False
+    finally:
+        config.BOOKS_DIR, config.ANALYSIS_DIR, config.ANALYSIS_DATASET_DIR = saved
+
+def test_dataset_update():
+    """测试分类数据变化后只重写有变化的年份分区"""
+    print("测试分析数据集增量更新...")
+
+    def partition_files():
+        files = {}
+        for root, _, names in os.walk(config.ANALYSIS_DATASET_DIR):
+            for name in names:
+                if name.endswith('.parquet'):
+                    files[os.path.relpath(root, config.ANALYSIS_DATASET_DIR)] = name
+        return files
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            filepath = os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE)
+            books = generate_synthetic_books(1000, seed=2)
+            storage.write_records(filepath, books)
+            analyzer = DataAnalyzer()
+            # 更新统计结果时不写入数据集，数据集只在导出时生成
+            analyzer.update_aggregates(filepath)
+            written_by_update = bool(partition_files())
+            analyzer.export_analysis_data()
+            before = partition_files()
+
+            # 只修改一本图书的书名（不影响统计），数据集也要随之更新
+            book = next(book for book in books if book.get('tech_tag') not in (None, '', '其他')
+                        and analyzer.parse_publish_date(book.get('publishDate')))
+            book['name'] = "修改后的书名"
+            storage.write_records(filepath, books)
+            analyzer.export_analysis_data()
+            after = partition_files()
+
+            current = analyzer.dataset_is_current(filepath)
+            dataset = analyzer.load_dataset()
+            expected = analyzer.prepare_data(books)
+
+        changed = {key for key in after if before.get(key) != after[key]}
+        year = analyzer.parse_publish_date(book['publishDate'])
+        if (not written_by_update and current and changed == {f"publish_year={year}"} and set(after) == set(before)
+                and dataset.sort_values(ANALYSIS_COLUMNS).reset_index(drop=True).equals(
+                    expected.sort_values(ANALYSIS_COLUMNS).reset_index(drop=True))):
+            print(f"✓ 数据集增量更新正常，{len(after)} 个年份分区中只重写了 {len(changed)} 个")
+            return True
+        else:
+            print(f"✗ 数据集增量更新异常: 重写分区 {sorted(changed)}，当前={current}，"
+                  f"更新统计时写入={written_by_update}")
+            return False
+    except Exception as e:
+        print(f"✗ 数据集增量更新测试失败: {e}")
+        return False
+
+def test_aggregate_store():
+    """测试增量统计结果与全量分组统计一致"""
+    print("测试增量统计结果...")
+
+    try:
+        analyzer = DataAnalyzer()
+        books = generate_synthetic_books(2000)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store_path = os.path.join(tmp_dir, "aggregates.db")
+            store = AggregateStore(store_path)
+            store.sync(books)
+            store.save()
+
+            # 修改2本、删除1本、新增3本后重新同步，并从磁盘重新加载
+            books = [dict(book) for book in books[1:]]
+            books[0]['tech_tag'] = 'Rust'
+            books[1]['publishDate'] = '1999-01-01T00:00:00'
+            books += generate_synthetic_books(2003, seed=1)[2000:]
+            store = AggregateStore(store_path)
+            changed = store.sync(books)
+            store.save()
+            store.close()
+
+            # 只合并有变化的图书：修改1本、删除1本，未给出的图书保持不变
+            removed_book = books.pop(5)
+            books[2] = dict(books[2], tech_tag='Go' if books[2].get('tech_tag') != 'Go' else 'Rust')
+            with AggregateStore(store_path) as store:
+                merged = store.merge([books[2]]) + store.remove([removed_book])
+                store.save()
+            store = AggregateStore(store_path)
+            store.close()
+
+        expected = analyzer.analyze_publications_by_year(analyzer.prepare_data(books))
+        actual = store.pivot()
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_names=False)
+        if changed != 6 or merged != 2:
+            print(f"✗ 增量统计变化数量错误: 同步 {changed}，合并 {merged}")
+            return False
+
+        report = analyzer.generate_statistics_report(actual)
+        print(f"✓ 增量统计结果与全量统计一致，同步 {changed} 本有变化的图书，报告 {len(report.splitlines())} 行")
+        return True
+    except Exception as e:
+        print(f"✗ 增量统计测试失败: {e}")
+        return False
+
+def test_incremental_classify_aggregates():
+    """测试增量分类只把新分类和下架的图书合并进统计结果，分析时不再读取全部分类数据"""
+    print("测试增量分类统计...")
+
+    import main as pipeline
+    reads = []
+    iter_records = storage.iter_records
+
+    def counting_iter_records(filepath):
+        reads.append(filepath)
+        return iter_records(filepath)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            books = unclassified(generate_synthetic_books(60, seed=4))
+            storage.write_records(pipeline._books_data_path(), books[10:])
+            pipeline.classify_books(books[10:], 'mock', policy=pipeline.POLICY_REFRESH)
+            analyzer = DataAnalyzer()
+            analyzer.update_aggregates(pipeline._classified_books_path())
+
+            # 新上架10本、下架1本图书后增量分类
+            books = books[:10] + books[11:]
+            storage.write_records(pipeline._books_data_path(), books)
+            pipeline.classify_books(books, 'mock', policy=pipeline.POLICY_INCREMENTAL)
+
+            storage.iter_records = counting_iter_records
+            try:
+                store = analyzer.update_aggregates(pipeline._classified_books_path())
+            finally:
+                storage.iter_records = iter_records
+            classified = list(storage.iter_records(pipeline._classified_books_path()))
+            store.close()
+
+        expected = analyzer.analyze_publications_by_year(analyzer.prepare_data(classified))
+        pd.testing.assert_frame_equal(expected, store.pivot(), check_dtype=False, check_names=False)
+        if not reads and len(classified) == 59:
+            print(f"✓ 增量分类后统计结果已是最新（共 {len(classified)} 本），分析时未读取分类数据")
+            return True
+        else:
+            print(f"✗ 增量分类后分析时重新读取了分类数据: {reads}，共 {len(classified)} 本")
+            return False
+    except Exception as e:
+        print(f"✗ 增量分类统计测试失败: {e}")
+        return False
+
+def test_analysis_stats():
+    """测试汇总统计与逐标签筛选统计的结果一致"""
+    print("测试汇总统计...")
+
+    try:
+        analyzer = DataAnalyzer()
+        df = analyzer.prepare_data(generate_synthetic_books(3000, seed=5))
+        pivot_table = analyzer.analyze_publications_by_year(df)
+        stats = AnalysisStats(pivot_table, top_n=5)
+
+        # 对照：逐个标签筛选原始数据后分组
+        expected_counts = df['tech_tag'].value_counts()
+        mismatched = []
+        for tag in stats.top_tags:
+            yearly = df[df['tech_tag'] == tag].groupby('publish_year').size()
+            if (stats.tag_counts[tag] != expected_counts[tag] or stats.peak_years[tag] != yearly.idxmax()
+                    or stats.peak_counts[tag] != yearly.max()):
+                mismatched.append(tag)
+
+        report = analyzer.generate_statistics_report(pivot_table, stats)
+        ranked = [line for line in report.splitlines() if line.endswith('%)')]
+
+        if (not mismatched and len(stats.top_tags) == 5 and stats.total == len(df)
+                and stats.yearly_totals.equals(df.groupby('publish_year').size()) and len(ranked) == 5):
+            print(f"✓ 汇总统计与逐标签统计一致，报告显示前 {stats.top_n} 名")
+            return True
+        else:
+            print(f"✗ 汇总统计不一致: {mismatched}，报告排名 {len(ranked)} 行")
+            return False
+    except Exception as e:
+        print(f"✗ 汇总统计测试失败: {e}")
+        return False
+
+def test_chart_renderer():
+    """测试图表渲染及跳过未变化的图表"""
+    print("测试图表渲染...")
+
+    try:
+        analyzer = DataAnalyzer()
+        pivot_table = analyzer.analyze_publications_by_year(analyzer.prepare_data(generate_synthetic_books(500)))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first = render_charts(pivot_table, tmp_dir, dpi=20, workers=2)
+            second = render_charts(pivot_table, tmp_dir, dpi=20, workers=2)
+
+            # 同一年内一本图书换了标签，年度总量图的输入不变
+            changed = pivot_table.copy()
+            tags = list(changed.columns)
+            changed.loc[changed.index[0], tags[0]] -= 1
+            changed.loc[changed.index[0], tags[1]] += 1
+            third = render_charts(changed, tmp_dir, dpi=20, workers=2)
+            files = [name for name in os.listdir(tmp_dir) if name.endswith('.png')]
+
+        if (len(first['rendered']) == 4 and len(second['skipped']) == 4 and len(files) == 4
+                and third['skipped'] == ['yearly_total_publications']
+                and 'tech_tag_year_heatmap' in third['rendered']):
+            print(f"✓ 图表渲染正常，数据未变化时跳过 {len(second['skipped'])} 张，"
+                  f"部分变化时重绘 {len(third['rendered'])} 张")
+            return True
+        else:
+            print(f"✗ 图表渲染异常: {first} {second} {third}")
+            return False
+    except Exception as e:
+        print(f"✗ 图表渲染测试失败: {e}")
+        return False
+
+def test_http_transport():
+    """测试连接池复用、失败重试和超时（使用本地模拟服务器）"""
+    print("测试HTTP连接池...")
+
+    try:
+        metrics.reset()
+        with MockIturingServer(total_books=40, error_rate=0.2, seed=3) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            scraper = IturingScraper(base_url=server.base_url, workers=4, use_cache=False)
+            books = scraper.scrape_all_books(resume=False)
+            connections = list(scraper.last_run_stats['connections'].values())[0]
+            server_errors = server.error_count
+
+        # 响应超过读取超时时不再无限等待
+        saved = config.HTTP_READ_TIMEOUT
+        config.HTTP_READ_TIMEOUT = 0.2
+        try:
+            with MockIturingServer(total_books=1, latency=1.0) as server:
+                scraper = IturingScraper(base_url=server.base_url, request_rate=1000, use_cache=False, retries=0)
+                start = time.monotonic()
+                detail = scraper.get_book_detail(1)
+                elapsed = time.monotonic() - start
+        finally:
+            config.HTTP_READ_TIMEOUT = saved
+
+        retries = metrics.counters.get('http.retries', 0)
+        if (len(books) == 40 and server_errors > 0 and retries == server_errors
+                and connections['connections'] <= 4 and connections['reused'] > 0
+                and detail == {} and elapsed < 0.9):
+            print(f"✓ HTTP连接池工作正常，{connections['requests']} 次请求新建 {connections['connections']} 个连接，"
+                  f"重试 {retries} 次")
+            return True
+        else:
+            print(f"✗ HTTP连接池异常: 图书 {len(books)}，服务器错误 {server_errors}，重试 {retries}，"
+                  f"连接 {connections}，超时 {elapsed:.1f}s")
+            return False
+    except Exception as e:
+        print(f"✗ HTTP连接池测试失败: {e}")
+        return False
+    finally:
+        metrics.reset()
+
+def test_pipeline_manifest():
+    """测试流水线清单跳过输入未变化的阶段（使用本地模拟服务器）"""
+    print("测试流水线清单...")
+
+    import main as pipeline
+    names = ['ITURING_BASE_URL', 'REQUEST_RATE', 'HTTP_CACHE_ENABLED', 'BOOKS_DIR', 'CHECKPOINT_FILE', 'REPORT_TOP_N']
+    saved = {name: getattr(config, name) for name in names}
+    try:
+        with MockIturingServer(total_books=20) as server, tempfile.TemporaryDirectory() as tmp_dir:
+            config.ITURING_BASE_URL = server.base_url
+            config.REQUEST_RATE = 100
+            config.HTTP_CACHE_ENABLED = False
+            config.BOOKS_DIR = tmp_dir
+            config.CHECKPOINT_FILE = os.path.join(tmp_dir, "scrape_checkpoint.jsonl")
+            manifest_path = os.path.join(tmp_dir, "pipeline_manifest.json")
+
+            first = pipeline.scrape_data(manifest=PipelineManifest(manifest_path))
+            before = server.request_count
+            # 目录未变化，第二次只请求第一页就跳过抓取
+            second = pipeline.scrape_data(manifest=PipelineManifest(manifest_path))
+            skipped_requests = server.request_count - before
+
+            manifest = PipelineManifest(manifest_path)
+            inputs = manifest.stages['scrape']['inputs']
+            current = manifest.is_current('scrape', inputs)
+            forced = PipelineManifest(manifest_path, force=True).is_current('scrape', inputs)
+            # 输出文件被改动后不再跳过
+            storage.append_records(pipeline._books_data_path(), [{"id": 0}])
+            tampered = manifest.is_current('scrape', inputs)
+
+            # 报告显示的标签数量变化后分析阶段不再跳过
+            analysis_inputs = pipeline.analysis_inputs()
+            config.REPORT_TOP_N += 1
+            report_changed = pipeline.analysis_inputs() != analysis_inputs
+
+        if (len(first) == len(second) == 20 and skipped_requests == 1 and current and not forced and not tampered
+                and report_changed):
+            print(f"✓ 流水线清单工作正常，目录未变化时抓取阶段只发送 {skipped_requests} 个请求")
+            return True
+        else:
+            print(f"✗ 流水线清单异常: {len(first)}/{len(second)} 本图书，{skipped_requests} 个请求，"
+                  f"{current}/{forced}/{tampered}/{report_changed}")
+            return False
+    except Exception as e:
+        print(f"✗ 流水线清单测试失败: {e}")
+        return False
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+def test_classify_manifest():
+    """测试有分类失败的图书时不跳过分类阶段，--incremental重试失败的图书"""
+    print("测试分类阶段清单...")
+
+    import main as pipeline
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                isolated_config(tmp_dir, MOCK_LLM_ERROR_RATE=1.0, CLASSIFY_MAX_RETRIES=1, CLASSIFY_MIN_RATE=100,
+                                LOCAL_MODEL_FILE=config.LOCAL_MODEL_FILE):
+            books = unclassified(generate_synthetic_books(5, seed=3))
+            storage.write_records(pipeline._books_data_path(), books)
+            manifest_path = os.path.join(tmp_dir, "pipeline_manifest.json")
+
+            # AI服务始终出错，所有图书分类失败，阶段不记录为完成
+            failed = pipeline.classify_books(books, 'mock', PipelineManifest(manifest_path), pipeline.POLICY_REFRESH)
+            failed_count = sum(1 for book in failed if not book.get('tech_tag'))
+            not_recorded = 'classify' not in PipelineManifest(manifest_path).stages
+
+            config.MOCK_LLM_ERROR_RATE = 0.0
+            retried = pipeline.classify_books(books, 'mock', PipelineManifest(manifest_path),
+                                              pipeline.POLICY_INCREMENTAL)
+            # 全部分类成功后，输入未变化时跳过分类，直接读取已保存的结果
+            skipped = pipeline.classify_books(books, 'mock', PipelineManifest(manifest_path), pipeline.POLICY_REFRESH)
+
+            # 离线模型在首次分类时才训练生成，记录的输入应包含训练后的模型，第二次运行直接跳过
+            config.LOCAL_MODEL_FILE = os.path.join(tmp_dir, "local_model.npz")
+            pipeline.classify_books(books, 'local', PipelineManifest(manifest_path), pipeline.POLICY_REFRESH)
+            local_current = PipelineManifest(manifest_path).is_current('classify',
+                                                                      pipeline.classification_inputs('local'))
+
+        if (not_recorded and failed_count == len(books)
+                and all(book.get('tech_tag') for book in retried)
+                and [(book['id'], book['tech_tag']) for book in skipped]
+                == [(book['id'], book['tech_tag']) for book in retried] and local_current):
+            print(f"✓ 分类失败时阶段未记录，增量模式重新分类了 {len(retried)} 本图书")
+            return True
+        else:
+            print(f"✗ 分类阶段清单异常: 记录={not not_recorded}，重试后 "
+                  f"{sum(1 for book in retried if book.get('tech_tag'))}/{len(retried)} 本有分类结果，"
+                  f"离线模型跳过={local_current}")
+            return False
+    except Exception as e:
+        print(f"✗ 分类阶段清单测试失败: {e}")
+        return False
+
+def test_streaming_pipeline():
+    """测试流式流水线：分类在抓取结束前就开始（使用本地模拟服务器）"""
+    print("测试流式流水线...")
+
+    class RecordingClassifier:
+        """记录调用时间的分类器，不调用AI服务"""
+        workers = 1
+
+        def __init__(self):
+            self.first_call = None
+
+        def classify_books_batch(self, books):
+            self.first_call = self.first_call or time.monotonic()
+            for book in books:
+                book['tech_tag'] = 'Python'
+            return books
+
+        def save_classified_books(self, books):
+            storage.write_records(os.path.join(config.BOOKS_DIR, config.CLASSIFIED_BOOKS_FILE), books)
+
+    names = ['BOOKS_DIR', 'CHECKPOINT_FILE', 'ANALYSIS_DIR', 'ANALYSIS_DATASET_DIR',
+             'AGGREGATE_STORE_FILE', 'CHART_DPI']
+    saved = {name: getattr(config, name) for name in names}
+    try:
+        with MockIturingServer(total_books=30, page_size=10, latency=0.02) as server, \
+                tempfile.TemporaryDirectory() as tmp_dir:
+            config.BOOKS_DIR = os.path.join(tmp_dir, "books")
+            config.CHECKPOINT_FILE = os.path.join(config.BOOKS_DIR, "scrape_checkpoint.jsonl")
+            config.ANALYSIS_DIR = os.path.join(tmp_dir, "analysis")
+            config.ANALYSIS_DATASET_DIR = os.path.join(config.ANALYSIS_DIR, "books_dataset")
+            config.AGGREGATE_STORE_FILE = os.path.join(config.ANALYSIS_DIR, "aggregates.db")
+            config.CHART_DPI = 20
+
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=False)
+            classifier = RecordingClassifier()
+            pipeline = StreamingPipeline(scraper=scraper, classifier=classifier, analyzer=DataAnalyzer(),
+                                         queue_size=5)
+            start = time.monotonic()
+            books = pipeline.run()
+            scrape_end = start + pipeline.last_run_stats['scrape_seconds']
+
+            saved_books = list(storage.iter_records(os.path.join(config.BOOKS_DIR, config.BOOKS_DATA_FILE)))
+            store = AggregateStore(config.AGGREGATE_STORE_FILE)
+
+        if (len(books) == 30 and classifier.first_call < scrape_end
+                and [book["id"] for book in saved_books] == [book["id"] for book in books]
+                and all('tech_tag' not in book for book in saved_books)
+                and int(store.pivot().values.sum()) == 30):
+            print(f"✓ 流式流水线工作正常，抓取开始后 {classifier.first_call - start:.2f} 秒即开始分类，"
+                  f"抓取共耗时 {pipeline.last_run_stats['scrape_seconds']:.2f} 秒")
+            return True
+        else:
+            print(f"✗ 流式流水线异常: {len(books)} 本图书，{pipeline.last_run_stats}")
+            return False
+    except Exception as e:
+        print(f"✗ 流式流水线测试失败: {e}")
+        return False
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+def test_cli_policies():
+    """测试非交互运行策略和按ID、日期选定图书（使用本地模拟服务器）"""
+    print("测试命令行运行策略...")
+
+    import main as pipeline
+    from datetime import date
+    try:
+        with MockIturingServer(total_books=20) as server, tempfile.TemporaryDirectory() as tmp_dir, \
+                isolated_config(tmp_dir, ITURING_BASE_URL=server.base_url, CHART_DPI=20):
+            books = pipeline.scrape_data(policy=pipeline.POLICY_REFRESH)
+            # 已有数据时，reuse策略和非交互模式都不发送请求
+            before = server.request_count
+            reused = pipeline.scrape_data(policy=pipeline.POLICY_REUSE)
+            pipeline.scrape_data()
+            reuse_requests = server.request_count - before
+
+            # 只重新获取指定ID的图书详情
+            before = server.request_count
+            selected = pipeline.scrape_data(selection=pipeline.BookSelection(ids=[5]))
+            selection_requests = server.request_count - before
+
+            # 使用模拟AI服务，不访问网络
+            classified = pipeline.classify_books(books, 'mock', policy=pipeline.POLICY_REFRESH)
+            incremental = pipeline.classify_books(books, 'mock', policy=pipeline.POLICY_INCREMENTAL)
+
+            since = pipeline.BookSelection(since=date(2020, 1, 1))
+            pipeline.analyze_data(selection=since)
+            with open(os.path.join(config.ANALYSIS_DIR, "analysis_report.txt"), 'r', encoding='utf-8') as f:
+                report = f.read()
+
+        if (len(books) == len(reused) == len(selected) == 20 and reuse_requests == 0 and selection_requests == 1
+                and len(classified) == len(incremental) == 20 and all(book.get("tech_tag") for book in classified)
+                and [book["id"] for book in incremental] == [book["id"] for book in books]
+                and "总图书数量: 5" in report):
+            print(f"✓ 命令行运行策略工作正常，选定1本图书时只发送 {selection_requests} 个请求")
+            return True
+        else:
+            print(f"✗ 命令行运行策略异常: {len(books)}/{len(reused)}/{len(selected)} 本图书，"
+                  f"{reuse_requests}/{selection_requests} 个请求，分类 {len(classified)}/{len(incremental)} 本")
+            return False
+    except Exception as e:
+        print(f"✗ 命令行运行策略测试失败: {e}")
+        return False
+
+def test_startup_imports():
+    """测试主程序启动时不导入各阶段的重型依赖"""
+    print("测试启动导入...")
+
+    heavy = ['pandas', 'matplotlib', 'seaborn', 'openai', 'google.generativeai', 'requests', 'pyarrow']
+    try:
+        # 在新的解释器中导入，避免受本进程已导入模块的影响
+        code = ("import sys, main; "
+                f"print(','.join(m for m in {heavy!r} if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        loaded = [name for name in result.stdout.strip().split(',') if name]
+        # -X importtime 每行格式: import time: 自身耗时 | 累计耗时 | 模块名（微秒）
+        main_us = next(int(line.split('|')[1]) for line in result.stderr.splitlines()
+                       if line.split('|')[-1].strip() == 'main')
+
+        if not loaded:
+            print(f"✓ 启动导入正常，导入main耗时 {main_us / 1000:.1f}ms")
+            return True
+        else:
+            print(f"✗ 导入main时加载了重型依赖: {loaded}")
+            return False
+    except Exception as e:
+        print(f"✗ 启动导入测试失败: {e}")
+        return False
+
+def test_metrics():
+    """测试运行指标收集和性能分析（使用本地模拟服务器）"""
+    print("测试运行指标...")
+
+    import main as pipeline
+    saved = config.PROFILE_FILE
+    try:
+        metrics.reset()
+        with MockIturingServer(total_books=10) as server, tempfile.TemporaryDirectory() as tmp_dir:
+            config.PROFILE_FILE = os.path.join(tmp_dir, "profile.prof")
+            scraper = IturingScraper(base_url=server.base_url, request_rate=100, use_cache=True,
+                                     cache_dir=os.path.join(tmp_dir, "http_cache"))
+            with pipeline.profiling('cprofile'):
+                scraper.get_book_list(page=1)
+                for book_id in range(1, 11):
+                    scraper.get_book_detail(book_id)
+                # 第二次命中缓存，不计入网络请求
+                for book_id in range(1, 11):
+                    scraper.get_book_detail(book_id)
+
+            analyzer = DataAnalyzer()
+            pivot_table = analyzer.analyze_publications_by_year(analyzer.prepare_data(generate_synthetic_books(100)))
+            render_charts(pivot_table, tmp_dir, dpi=20, workers=1)
+
+            metrics_path = os.path.join(tmp_dir, "metrics.json")
+            metrics.write(metrics_path)
+            with open(metrics_path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+            profiled = os.path.exists(config.PROFILE_FILE)
+
+        detail = report['timings']['scraper.get_book_detail']
+        charts = [name for name in report['timings'] if name.startswith('chart.')]
+        if (detail['count'] == 20 and detail['p50_ms'] <= detail['p95_ms'] <= detail['p99_ms'] <= detail['max_ms']
+                and report['counters']['http.requests'] == 11 and report['counters']['http.bytes_received'] > 0
+                and report['counters']['http.body_bytes'] >= report['counters']['http.bytes_received']
+                and abs(report['cache_hit_rates']['http_cache'] - 10 / 21) < 1e-9 and len(charts) == 4 and profiled):
+            print(f"✓ 运行指标工作正常，图书详情 p50 {detail['p50_ms']:.1f}ms / p99 {detail['p99_ms']:.1f}ms，"
+                  f"传输 {report['counters']['http.bytes_received']} 字节")
+            return True
+        else:
+            print(f"✗ 运行指标异常: {report['counters']} {report['cache_hit_rates']} {detail}")
+            return False
+    except Exception as e:
+        print(f"✗ 运行指标测试失败: {e}")
+        return False
+    finally:
+        config.PROFILE_FILE = saved
+        metrics.reset()
+
+def test_offline_benchmark():
+    """测试模拟AI服务、模拟服务器错误注入和基准测试的回退检查"""
+    print("测试离线基准测试工具...")
+
+    try:
+        books = generate_synthetic_books(200)
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_config(tmp_dir):
+            # 模拟AI服务按图书标签分类，限流错误经退避重试后全部成功
+            llm = MockLLM(error_rate=0.2, seed=1)
+            classifier = BookClassifier(ai_service='mock', use_cache=False, use_rules=False)
+            classifier.mock_llm = llm
+            classifier.rate_limiter = AIMDRateLimiter(1000, 1, 1000)
+            classified = classifier.classify_books_batch(unclassified(books))
+            correct = sum(1 for book in classified if book['tech_tag'] == book['tags'][0]['name'])
+
+            with MockIturingServer(total_books=20, error_rate=0.3, seed=2) as server:
+                # 不重试，注入的错误都表现为获取失败
+                scraper = IturingScraper(base_url=server.base_url, request_rate=1000, use_cache=False, retries=0)
+                details = [scraper.get_book_detail(book_id) for book_id in range(1, 21)]
+                server_errors = server.error_count
+
+        result = {'stages': {'classify': {'books_per_second': 700.0}, 'analyze': {'books_per_second': 95.0}}}
+        baseline = {'stages': {'classify': {'books_per_second': 1000.0}, 'analyze': {'books_per_second': 100.0}}}
+        regressions = compare_to_baseline(result, baseline, tolerance=0.2)
+
+        if (correct == len(books) and llm.errors > 0 and server_errors == sum(1 for d in details if not d) > 0
+                and [item['stage'] for item in regressions] == ['classify']):
+            print(f"✓ 离线基准测试工具正常，模拟限流 {llm.errors} 次后全部分类正确，"
+                  f"模拟服务器错误 {server_errors} 次")
+            return True
+        else:
+            print(f"✗ 离线基准测试工具异常: 正确 {correct}/{len(books)}，限流 {llm.errors}，"
+                  f"服务器错误 {server_errors}，回退 {regressions}")
+            return False
+    except Exception as e:
+        print(f"✗ 离线基准测试工具测试失败: {e}")
+        return False
+
+def test_storage():
+    """测试JSONL流式存储功能"""
+    print("测试JSONL流式存储功能...")
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            records = [{"id": i, "name": f"图书{i}"} for i in range(5)]
+            
+            # 旧JSON文件转换为JSONL后逐条读取、追加写入
+            json_path = os.path.join(tmp_dir, "books.json")
+            storage.write_records(json_path, records)
+            jsonl_path = storage.convert_records(json_path, 'jsonl')
+            storage.append_records(jsonl_path, [{"id": 5, "name": "图书5"}])
+            converted = list(storage.iter_records(jsonl_path))
+            
+            # 追加写入时文件和目录不存在会自动创建
+            new_path = os.path.join(tmp_dir, "new", "books.jsonl")
+            appended = storage.append_records(new_path, records)
+            streamed = list(storage.iter_records(new_path))
+        
+        if [r["id"] for r in converted] == list(range(6)) and appended == len(records) and streamed == records:
+            print(f"✓ JSONL存储工作正常，转换 {len(converted)} 条，追加后逐条读取 {len(streamed)} 条")
+            return True
+        else:
+            print("✗ JSONL存储结果不一致")
+            return False
+    except Exception as e:
+        print(f"✗ JSONL存储测试失败: {e}")
+        return False
+
+def test_book_store():
+    """测试SQLite图书数据库"""
+    print("测试SQLite图书数据库...")
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            books = generate_synthetic_books(500, seed=3)
+            books[0]['tech_tag'] = '其他'
+
+            # 旧JSONL数据切换为SQLite格式后仍可读取，转换后顺序不变
+            jsonl_path = os.path.join(tmp_dir, "classified_books.jsonl")
+            storage.write_records(jsonl_path, books)
+            db_path = os.path.join(tmp_dir, "classified_books.db")
+            legacy = storage.resolve_path(db_path) == jsonl_path
+            storage.convert_records(jsonl_path, 'db')
+            converted = list(storage.iter_records(db_path))
+
+            # 单本更新和新增
+            store = BookStore(db_path)
+            updated = store.set_tech_tag(books[1]['id'], 'Go')
+            store.upsert([{"id": 10 ** 6, "name": "新书", "tech_tag": "Go", "publishDate": "2023-05-01T00:00:00"}])
+            go_2023 = list(store.iter_books(publish_year=2023, tech_tag='Go'))
+            # 逐条读取期间仍可通过同一对象读取
+            iterator = store.iter_books()
+            streamed = [next(iterator)]
+            during = store.get(books[2]['id'])
+            streamed += list(iterator)
+            store.close()
+
+            # SQL分组统计与逐本统计结果相同
+            analyzer = DataAnalyzer()
+            expected = analyzer.analyze_publications_by_year(analyzer.prepare_data(storage.iter_records(db_path)))
+            pivot_table = analyzer.query_pivot_table(db_path)
+            same = expected.astype('float64').equals(pivot_table)
+            expected_go = sum(1 for book in storage.iter_records(db_path)
+                              if book.get('tech_tag') == 'Go' and book.get('publishDate', '').startswith('2023-'))
+
+        if (legacy and converted == books and updated and same and len(go_2023) == expected_go
+                and go_2023[-1]['id'] == 10 ** 6 and len(streamed) == len(books) + 1 and during == books[2]):
+            print(f"✓ SQLite图书数据库工作正常，转换 {len(converted)} 本，SQL统计与逐本统计一致")
+            return True
+        else:
+            print(f"✗ SQLite图书数据库结果不一致: {legacy}/{converted == books}/{updated}/{same}/"
+                  f"{len(go_2023)}/{expected_go}")
+            return False
+    except Exception as e:
+        print(f"✗ SQLite图书数据库测试失败: {e}")
+        return False
+
+def test_book_record():
+    """测试紧凑的Book图书记录和字段投影"""
+    print("测试图书记录...")
+
+    try:
+        with MockIturingServer(total_books=10) as server, tempfile.TemporaryDirectory() as tmp_dir, \
+                isolated_config(tmp_dir):
+            # 模拟接口返回各阶段用不到的字段
+            book_detail = server.book_detail
+            server.book_detail = lambda book_id: dict(book_detail(book_id), coverKey="cover.jpg", price=59.0)
+            raw = server.book_detail(3)
+
+            scraper = IturingScraper(base_url=server.base_url, request_rate=1000, project_books=True)
+            books = scraper.scrape_all_books()
+            classifier = BookClassifier(ai_service='mock', use_cache=False, use_rules=False)
+            classifier.classify_books_batch(books)
+            scraper.save_books_data(books)
+            loaded = scraper.load_books_data()
+
+            # 已保存的完整数据在原文件上精简
+            full_path = os.path.join(tmp_dir, "full.jsonl")
+            storage.write_records(full_path, [raw])
+            storage.convert_records(full_path, project=True)
+            projected = next(storage.iter_records(full_path))
+
+        book = Book.from_payload(server.list_item(3), raw)
+        memory = bench_book_memory(2000)
+        if (all(isinstance(b, Book) for b in books + loaded) and [dict(b) for b in loaded] == [dict(b) for b in books]
+                and all(b['tech_tag'] == "Python" and 'coverKey' not in b for b in loaded)
+                and build_classification_text(book) == build_classification_text(raw)
+                and projected == dict(book) and 'price' not in projected
+                and set(SOURCE_COLUMNS) <= set(FIELDS) and memory['ratio'] < 0.6):
+            print(f"✓ 图书记录工作正常，每本图书 {memory['dict_bytes_per_book']:.0f} -> "
+                  f"{memory['book_bytes_per_book']:.0f} 字节")
+            return True
+        else:
+            print(f"✗ 图书记录异常: {loaded[:1]} {projected} {memory}")
+            return False
+    except Exception as e:
+        print(f"✗ 图书记录测试失败: {e}")
+        return False
+
 def test_config():
     """测试配置功能"""
     print("测试配置功能...")
@@ -148,7 +1354,7 @@ def test_config():
 def main():
     """运行所有测试"""
     parser = argparse.ArgumentParser(description='图灵图书数据抓取与分析系统 - 功能测试')
-    parser.add_argument('--ai-service', choices=['openai', 'gemini'], 
+    parser.add_argument('--ai-service', choices=['openai', 'gemini', 'local', 'mock'], 
                        default=config.DEFAULT_AI_SERVICE,
                        help=f'选择AI服务进行测试 (默认: {config.DEFAULT_AI_SERVICE})')
     
@@ -161,8 +1367,39 @@ def main():
     tests = [
         ("配置检查", test_config),
         ("数据抓取", test_scraper),
+        ("并发抓取", test_concurrent_scraper),
+        ("列表预取", test_page_prefetch),
+        ("抓取中止", test_scrape_abort),
+        ("断点续抓", test_resume_scraper),
+        ("失败重试", test_failed_book_retry),
+        ("列表失败重试", test_failed_page_retry),
+        ("增量抓取", test_delta_scraper),
+        ("HTTP缓存", test_http_cache),
+        ("HTTP连接池", test_http_transport),
+        ("流水线清单", test_pipeline_manifest),
+        ("分类阶段清单", test_classify_manifest),
+        ("流式流水线", test_streaming_pipeline),
+        ("命令行策略", test_cli_policies),
+        ("启动导入", test_startup_imports),
+        ("运行指标", test_metrics),
+        ("离线基准", test_offline_benchmark),
         ("图书分类", lambda: test_classifier(args.ai_service)),
-        ("数据分析", test_analyzer)
+        ("分类缓存", test_classification_cache),
+        ("批量分类", test_batch_classification),
+        ("分类重试", test_classification_retry),
+        ("规则预分类", test_rule_classifier),
+        ("离线分类", test_local_classifier),
+        ("数据分析", test_analyzer),
+        ("数据准备", test_prepare_data),
+        ("分析数据集", test_analysis_dataset),
+        ("数据集增量更新", test_dataset_update),
+        ("增量统计", test_aggregate_store),
+        ("增量分类统计", test_incremental_classify_aggregates),
+        ("汇总统计", test_analysis_stats),
+        ("图表渲染", test_chart_renderer),
+        ("流式存储", test_storage),
+        ("图书数据库", test_book_store),
+        ("图书记录", test_book_record)
     ]
     
     passed = 0